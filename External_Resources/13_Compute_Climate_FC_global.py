@@ -2,31 +2,47 @@ import sys
 import os
 from os.path import exists
 from datetime import datetime, timedelta
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import metview as mv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scripts", "Processed"))
+from Functions.subarea_store import subarea_ranges, chunk_year, file_fc, read_subarea, read_subarea_header
+from Functions.percentiles import percentiles_block, percentiles_system
+from Functions.calendar_index import season_index
+
 ################################################################################################################
 # CODE DESCRIPTION
 # Compute_Climatology_ERA5.py computes a rainfall climatology in the form of a distribution of percentiles from ERA5. 
 # Annual and seasonal (i.e. for Summer, Autumn, Winter, and Spring) climatologies are computed.
+# The realizations of each sub-area are read from the sub-areas chunked for each year by 12_Compute_Chunk_FC.py (one array on disk per sub-area and
+# year, with dimensions realizations x grid-boxes), joining the years in the considered period. The years that were not chunked yet are chunked
+# here with the same function (each grib file is read only once).
+# The sub-areas are processed in parallel, and the percentiles for each grid-box are computed with the same settings used for the climatologies at 
+# stations (i.e. the percentiles for the considered forecasting system, with linear interpolation, and adding the minimum and the maximum values to the 
+# realizations). A global field (in grib format) is then written for each percentile of the year and seasonal climatologies.
 
 # INPUT PARAMETERS
-BaseDateTimeS = datetime(2000,1,1,0)
-BaseDateTimeF = datetime(2019,12,31,0)
+YearS = 2000
+YearF = 2019
 StepS = 0
 StepF = 240
 Acc = 24
-PercYear_array = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995])])
-PercSeason_array = np.concatenate([np.arange(0,100), np.array([99.5, 99.8])])
 System_FC = "ERA5_EDA_LongRange"
+Chunk_Missing = True
+NumWorkers = 8
+MaxMemory_GB = 4
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN = "Data/Raw/FC"
+DirSA = "Data/Processed/FC_SA"
 DirOUT = "Data/Processed/Climate"
 #################################################################################################################
 
 # Setting main input/output directory
 MainDirIN = Git_repo + "/" + DirIN + "/" + System_FC
-MainDirOUT = Git_repo + "/" + DirOUT
+MainDirSA = Git_repo + "/" + DirSA + "/" + System_FC
+MainDirOUT = Git_repo + "/" + DirOUT + "/" + System_FC
 if not exists(MainDirOUT):
       os.makedirs(MainDirOUT)
 
@@ -37,51 +53,88 @@ if System_FC == "ERA5_EDA_LongRange":
 elif System_FC == "ERA5_LongRange":
       NumGB_G = 542080
       NumSA = 160
-NumGB_SA = int(NumGB_G/NumSA)
+
+# Indexing the sub-areas (i.e. the grid-boxes in each sub-area are tp_G[SA_start:SA_end], covering all the grid-boxes in the global fields)
+SA_ranges = subarea_ranges(NumGB_G, NumSA)
 
 # Setting the number of realizations for the considered period
-NumR = int( ( ( BaseDateTimeF - BaseDateTimeS ).days + 1 ) * ( (StepF - StepS) / Acc) )
-
-
-###############################################
-# Computing the annual rainfall climatologies for each sub-area #
-###############################################
-
-for ind_SA in range(1,NumSA+1):
-      
-      print(" ")
-      print("Considering sub-area n. " + str(ind_SA) + " over a total of " + str(NumSA))
-
-      # Initializing the variable that will store all the rainfall realizations over the considered period
-      tp = np.empty((NumR, NumGB_SA-1,)) 
-
-      # Indexing the considered sub_area
-      SA_end = (NumGB_SA * ind_SA) - 1
-      SA_start = SA_end - (NumGB_SA - 1)
-
-      # Computing the rainfall realizations over the considered period
-      indR = 0
-      BaseDateTime = BaseDateTimeS
-      while BaseDateTime <= BaseDateTimeF:
-            
-            BaseDateTimeSTR  = BaseDateTime.strftime("%Y%m%d%H")
-            BaseDateSTR  = BaseDateTime.strftime("%Y%m%d")
-            BaseTimeSTR  = BaseDateTime.strftime("%H")
-            YearSTR = BaseDateTime.strftime("%Y")
-            
-            print(" ")
-            print(" - " + BaseDateSTR)
-
-            for Step1 in range (StepS, StepF - Acc + 1, Acc):
-
-                  Step2 = Step1 + Acc
-                  Step1STR = f"{Step1:03d}"
-                  Step2STR = f"{Step2:03d}"
-
-                  FileIN1 = MainDirIN + "/" + YearSTR + "/" + BaseDateTimeSTR + "/tp_" + BaseDateSTR + "_" + BaseTimeSTR + "_" + Step1STR + ".grib"
-                  FileIN2 = MainDirIN + "/" + YearSTR + "/" + BaseDateTimeSTR + "/tp_" + BaseDateSTR + "_" + BaseTimeSTR + "_" + Step2STR + ".grib"
-                  tp[indR,:] = np.around(mv.values((mv.read(FileIN2) - mv.read(FileIN1)) * 1000), decimals=2)[SA_start:SA_end]
-                  
-                  indR += 1
-
-            BaseDateTime += timedelta(days=1)
+BaseDateTimeS = datetime(YearS,1,1,0)
+BaseDateTimeF = datetime(YearF,12,31,0)
+NumDays = ( BaseDateTimeF - BaseDateTimeS ).days + 1
+NumSteps = int( (StepF - StepS) / Acc )
+NumR = NumDays * NumSteps
+
+# Setting the percentiles to compute for the year/seasonal climatologies, and the realizations (i.e. rows in the sub-areas) to consider for each of them
+# Note: the realizations are stored day by day (and step by step within each day), and they are assigned to the seasons on the basis of their base date
+PercYear, PercSeason = percentiles_system(System_FC)
+Dataset_list = ["Year", "DJF", "MAM", "JJA", "SON"]
+Perc_dict = {Dataset: (PercYear if Dataset == "Year" else PercSeason) for Dataset in Dataset_list}
+dates_R = np.repeat(np.array([int((BaseDateTimeS + timedelta(days=ind_day)).strftime("%Y%m%d")) for ind_day in range(NumDays)]), NumSteps)
+indR_dict = {Dataset: season_index(dates_R, Dataset) for Dataset in Dataset_list}
+
+
+######################################################
+# Checking (or chunking) the sub-areas for each year #
+######################################################
+
+# Note: the sub-areas of each year must cover the same grid-boxes, and contain all the realizations of the year
+print(" ")
+print("Checking the sub-areas for each year in the considered period")
+for Year in range(YearS, YearF+1):
+      MainDirSA_Year = MainDirSA + "/" + str(Year)
+      NumR_Year = ((datetime(Year,12,31) - datetime(Year,1,1)).days + 1) * NumSteps
+      if (not exists(MainDirSA_Year + "/SA_header.json")) and Chunk_Missing:
+            print(" - " + str(Year) + ": chunking the global fields into " + str(NumSA) + " sub-areas")
+            chunk_year(Year, MainDirIN, MainDirSA_Year, SA_ranges, StepS, StepF, Acc, lambda FileIN: mv.values(mv.read(FileIN)))
+      SA_ranges_Year, NumR_SA = read_subarea_header(MainDirSA_Year)
+      if (SA_ranges_Year != SA_ranges) or (NumR_SA != NumR_Year):
+            raise ValueError("The sub-areas in " + MainDirSA_Year + " (" + str(len(SA_ranges_Year)) + " sub-areas, " + str(NumR_SA) + " realizations) do not match the ones expected for " + System_FC + " (" + str(NumSA) + " sub-areas, " + str(NumR_Year) + " realizations). Run 12_Compute_Chunk_FC.py again for " + str(Year) + ".")
+      print(" - " + str(Year) + ": OK")
+
+
+########################################################################
+# Computing the year/seasonal rainfall climatologies for each sub-area #
+########################################################################
+
+def climate_subarea(ind_SA):
+
+      # Note: the realizations of the sub-area are read in blocks of grid-boxes (joining the rows of all the years in the period), so each worker uses 
+      # about MaxMemory_GB (for the block, its seasonal subsets and their sorted copies). Each block is read only once for the year and the seasonal climatologies.
+      tp = [read_subarea(MainDirSA + "/" + str(Year), ind_SA) for Year in range(YearS, YearF+1)]
+      NumGB_SA = tp[0].shape[1]
+      NumGB_block = max(1, int((MaxMemory_GB * 1024**3) / (4 * (NumR + 2) * tp[0].dtype.itemsize)))
+      climate = {Dataset: np.empty((len(Perc_dict[Dataset]), NumGB_SA), dtype=np.float32) for Dataset in Dataset_list}
+      for ind_start in range(0, NumGB_SA, NumGB_block):
+            tp_block = np.transpose(np.concatenate([np.asarray(tp_Year[:, ind_start:(ind_start + NumGB_block)]) for tp_Year in tp], axis=0))
+            for Dataset in Dataset_list:
+                  climate[Dataset][:, ind_start:(ind_start + tp_block.shape[0])] = np.around(np.float32(percentiles_block(tp_block[:, indR_dict[Dataset]], Perc_dict[Dataset], AddMinMax=True)), decimals=1)
+      print(" - Sub-area n. " + str(ind_SA) + " over a total of " + str(NumSA) + " completed")
+      return climate
+
+# Computing the climatologies for the sub-areas in parallel, and combining them into global fields
+print(" ")
+print("Computing the year/seasonal climatologies for " + str(NumSA) + " sub-areas")
+climate_G = {Dataset: np.empty((len(Perc_dict[Dataset]), SA_ranges[-1][1]), dtype=np.float32) for Dataset in Dataset_list}
+with ProcessPoolExecutor(max_workers=NumWorkers, mp_context=multiprocessing.get_context("fork")) as pool:
+      for ind_SA, climate in zip(range(1,NumSA+1), pool.map(climate_subarea, range(1,NumSA+1))):
+            for Dataset in Dataset_list:
+                  climate_G[Dataset][:, SA_ranges[ind_SA-1][0]:SA_ranges[ind_SA-1][1]] = climate[Dataset]
+
+
+###########################################################
+# Saving the year/seasonal climatologies as global fields #
+###########################################################
+
+# Note: the grib metadata are taken from the first global field in the considered period (the values of the grid-boxes without valid realizations are set to missing)
+print(" ")
+print("Saving the year/seasonal climatologies")
+template = mv.read(file_fc(MainDirIN, BaseDateTimeS, StepS + Acc))[0]
+for Dataset in Dataset_list:
+      MainDirOUT_Dataset = MainDirOUT + "/" + Dataset
+      if not exists(MainDirOUT_Dataset):
+            os.makedirs(MainDirOUT_Dataset)
+      for ind_perc in range(len(Perc_dict[Dataset])):
+            FileOUT = MainDirOUT_Dataset + "/tp" + str(Acc) + "h_Climate_" + Dataset + "_Perc" + f"{Perc_dict[Dataset][ind_perc]:g}" + ".grib"
+            mv.write(FileOUT, mv.set_values(template, climate_G[Dataset][ind_perc].astype(float)))
+np.save(MainDirOUT + "/Percentiles_Year.npy", PercYear)
+np.save(MainDirOUT + "/Percentiles_Season.npy", PercSeason)
\ No newline at end of file
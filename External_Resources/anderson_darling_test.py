@@ -0,0 +1,56 @@
+import sys
+import os
+import warnings
+import numpy as np
+from scipy.stats import anderson_ksamp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scripts", "Processed"))
+from Functions.anderson_darling import anderson_ksamp_stations
+
+##########################################################################
+# CODE DESCRIPTION
+# anderson_darling_test.py checks the Anderson-Darling statistic for k-samples computed for all the stations at once
+# (Functions/anderson_darling.py) against scipy.stats.anderson_ksamp, computed station by station on random samples.
+# The samples are checked for 2 and 3 samples, with sizes that differ between the samples, with values rounded to 0.1 mm
+# (so there are many ties, as in the rainfall climatologies), and with stations with NaNs or with a single distinct value
+# (whose statistic must be NaN).
+
+# INPUT PARAMETERS
+NumStns = 200
+SampleSizes_list = [(103, 104), (50, 80), (103, 104, 102), (30, 45, 60)]
+Tolerance = 1e-10
+Seed = 0
+##########################################################################
+
+rng = np.random.default_rng(Seed)
+NumFailed = 0
+for SampleSizes in SampleSizes_list:
+
+      # Creating the random samples (rainfall-like values, rounded to 0.1 mm)
+      samples = [np.round(rng.gamma(0.5, 5, size=(NumStns, n)) * rng.uniform(0.5, 1.5, size=(NumStns, 1)), decimals=1) for n in SampleSizes]
+      samples[0][0, 3] = np.nan
+      for s in samples:
+            s[1,:] = 2.0
+
+      # Computing the statistic for all the stations at once and station by station with scipy
+      StatisticAD, critical = anderson_ksamp_stations(samples)
+      StatisticAD_scipy = np.full(NumStns, np.nan)
+      critical_scipy = None
+      with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for ind_stn in range(NumStns):
+                  samples_stn = [s[ind_stn] for s in samples]
+                  if np.any(np.isnan(np.concatenate(samples_stn))) or (len(np.unique(np.concatenate(samples_stn))) < 2):
+                        continue
+                  result = anderson_ksamp(samples_stn)
+                  StatisticAD_scipy[ind_stn] = result.statistic
+                  critical_scipy = result.critical_values
+
+      # Comparing the results
+      Diff = np.nanmax(np.abs(StatisticAD - StatisticAD_scipy))
+      Passed = np.array_equal(np.isnan(StatisticAD), np.isnan(StatisticAD_scipy)) and (Diff <= Tolerance) and np.allclose(critical, critical_scipy, rtol=0, atol=Tolerance)
+      print("k=" + str(len(SampleSizes)) + ", sample sizes " + str(SampleSizes) + ": max difference " + f"{Diff:.2e}" + (" - OK" if Passed else " - FAILED"))
+      NumFailed = NumFailed + (0 if Passed else 1)
+
+if NumFailed != 0:
+      sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,46 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scripts", "Processed"))
+from Functions.histograms import histograms_stations, merge_histograms, percentiles_histograms
+from Functions.percentiles import percentiles_stations
+
+##########################################################################
+# CODE DESCRIPTION
+# histograms_test.py checks that the percentiles computed by summing the histograms of single years (Functions/histograms.py)
+# are the same (bit by bit) as the ones computed by sorting all the values over the period (Functions/percentiles.py).
+# The years are checked with missing values, with stations with no valid values, with a year with no valid values at all
+# (e.g. a season with no forecasts) and with a year with no realizations.
+
+# INPUT PARAMETERS
+NumStns = 500
+NumR_list = [365, 366, 365, 0]
+Perc = np.concatenate((np.arange(1, 100), [99.5, 99.8, 99.9, 99.95]))
+NumStns_block = 128
+Seed = 0
+##########################################################################
+
+rng = np.random.default_rng(Seed)
+
+# Creating the rainfall values for each year (rounded to 0.1 mm and stored as float16, as in stage 10)
+data_list = []
+for NumR in NumR_list:
+      data = np.round(rng.gamma(0.3, 8, size=(NumStns, NumR)), decimals=1).astype(np.float16)
+      data[rng.uniform(size=data.shape) < 0.1] = np.nan
+      data[0:3,:] = np.nan
+      data_list.append(data)
+data_list[2][:] = np.nan
+
+# Comparing the percentiles from the summed histograms with the ones from the sorted values
+NumFailed = 0
+for ind_years in [[0, 1], [2], [3], [0, 1, 2, 3]]:
+      hist = merge_histograms([histograms_stations(data_list[i], NumStns_block=NumStns_block) for i in ind_years])
+      climate_hist = percentiles_histograms(hist, Perc, AddMinMax=True)
+      climate_sort = percentiles_stations([data_list[i] for i in ind_years], Perc, AddMinMax=True, Method="sort")
+      Passed = (hist["NumR"] == sum(NumR_list[i] for i in ind_years)) and np.array_equal(climate_hist, climate_sort, equal_nan=True)
+      print("Years " + str(ind_years) + ": " + ("OK" if Passed else "FAILED"))
+      NumFailed = NumFailed + (0 if Passed else 1)
+
+if NumFailed != 0:
+      sys.exit(1)
\ No newline at end of file
@@ -1,9 +1,13 @@
 import os
+import sys
 from os.path import exists
-from datetime import datetime
 import numpy as np
 import metview as mv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processed"))
+from Functions.clean_obs import read_obs
+from Functions.calendar_index import season_index
+
 ############################################################################################################################################################
 # CODE DESCRIPTION
 # Plot_MaxRainOBS.py plots the maximum rainfall value observed at each station.
@@ -63,20 +67,7 @@ def plot_MaxRainOBS(obs, lats, lons, dates, ClimateType, MinDays_Perc, Title_tex
       if ClimateType == "Year":
             obs_temp = obs
       else:
-            if ClimateType == "DJF":
-                  M1 = 12; M2 = 1; M3 = 2
-            if ClimateType == "MAM":
-                  M1 = 3; M2 = 4; M3 = 5
-            if ClimateType == "JJA":
-                  M1 = 6; M2 = 7; M3 = 8
-            if ClimateType == "SON":
-                  M1 = 9; M2 = 10; M3 = 11
-            ind_dates_season = []
-            for ind_dates in range(obs.shape[1]):
-                  month = (datetime.strptime(dates[ind_dates], "%Y%m%d")).month
-                  if (month == M1) or (month == M2) or (month == M3):
-                        ind_dates_season.append(ind_dates)
-            obs_temp = obs[:,ind_dates_season]
+            obs_temp = obs[:,season_index(dates, ClimateType)]
 
       # Selecting the stations with the considered minimum number of days with valid observations
       MinNumDays = round(obs_temp.shape[1] * MinDays_Perc)
@@ -158,10 +149,7 @@ for NameOBS in NameOBS_list:
                   os.makedirs(MainDirOUT)
 
             # Reading rainfall observations and their metadata (i.e. lats/lons/dates)
-            lats = np.load(MainDirIN + "/stn_lats.npy")
-            lons = np.load(MainDirIN + "/stn_lons.npy")
-            dates = np.load(MainDirIN + "/dates.npy")
-            align_obs = np.load(MainDirIN + "/obs.npy")
+            stnids, lats, lons, dates, align_obs = read_obs(MainDirIN)
             NumStns = align_obs.shape[0]
             NumDays = align_obs.shape[1]
 
@@ -185,16 +173,13 @@ for NameOBS in NameOBS_list:
                   print("Plotting the maximum rainfall value observed for "+ NameOBS + " (Coeff_Grid2Point=" + str(Coeff_Grid2Point) + ") at each station")
                               
                   # Setting main input/output directories
-                  MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
+                  MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF)
                   MainDirOUT = Git_repo + "/" + DirOUT + "/ " + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
                   if not exists(MainDirOUT):
                         os.makedirs(MainDirOUT)
 
                   # Reading rainfall observations and their metadata (i.e. lats/lons/dates)
-                  lats = np.load(MainDirIN + "/stn_lats.npy")
-                  lons = np.load(MainDirIN + "/stn_lons.npy")
-                  dates = np.load(MainDirIN + "/dates.npy")
-                  align_obs = np.load(MainDirIN + "/obs.npy")
+                  stnids, lats, lons, dates, align_obs = read_obs(MainDirIN, Coeff_Grid2Point)
                   NumStns = align_obs.shape[0]
                   NumDays = align_obs.shape[1]
 
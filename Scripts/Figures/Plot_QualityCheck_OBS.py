@@ -1,9 +1,13 @@
 import os
+import sys
 from os.path import exists
 import numpy as np
 import matplotlib.pyplot as plt
 import metview as mv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processed"))
+from Functions.clean_obs import read_obs
+
 #########################################################################################################################################
 # CODE DESCRIPTION
 # Plot_QualityCheck_OBS.py plots the results of the quality checks carried out on STVL's point rainfall observations over a given period of interest.
@@ -36,16 +40,12 @@ DirOUT= "Data/Figures/QualityCheck_OBS"
 
 # Costum function for quality checks
 
-def quality_check(DirIN, DirOUT):
+def quality_check(DirIN, DirOUT, Coeff_Grid2Point=None):
       
       # Reading the rainfall observations over the period of interest and the correspondent metadata (i.e., ids/lats/lons/dates)
       print(" ")
       print("Reading the rainfall observations over the period of interest and the correspondent metadata (i.e., ids/lats/lons/dates)")
-      stnids_unique = np.load(DirIN + "/stn_ids.npy")
-      lats_unique = np.load(DirIN + "/stn_lats.npy")
-      lons_unique = np.load(DirIN + "/stn_lons.npy")
-      dates = np.load(DirIN + "/dates.npy")
-      align_obs = np.load(DirIN + "/obs.npy")
+      stnids_unique, lats_unique, lons_unique, dates, align_obs = read_obs(DirIN, Coeff_Grid2Point)
       NumStns = align_obs.shape[0]
       NumDays = align_obs.shape[1]
       print(" - Considering " + str(NumStns) + " rainfall stations each day over the period of interest.")
@@ -961,13 +961,13 @@ for NameOBS in NameOBS_list:
                   print("Running quality checks for "+ NameOBS + " considering a Coeff_Grid2Point=" + str(Coeff_Grid2Point))
                   
                   # Setting main input/output directories
-                  MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
+                  MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF)
                   MainDirOUT = Git_repo + "/" + DirOUT + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
                   if not exists(MainDirOUT):
                         os.makedirs(MainDirOUT)
 
                   # Running the quality checks
-                  quality_check(MainDirIN, MainDirOUT)
+                  quality_check(MainDirIN, MainDirOUT, Coeff_Grid2Point)
 
 
 ##############################################################
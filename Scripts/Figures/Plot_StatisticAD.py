@@ -1,8 +1,12 @@
 import os
+import sys
 from os.path import exists
 import numpy as np
 import metview as mv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processed"))
+from Functions.spatial_index import spatial_index, select_area
+
 ########################################################################################################################################################################
 # CODE DESCRIPTION
 # Plot_StatisticAD.py plots the Anderson-Darling statistic at the points where rainfall climatologies were computed. The script generates the map plots as static svg figures or in a Metview interactive window.
@@ -92,6 +96,17 @@ def plot_statisticAD(RunType, ClimateType, Title_text_line_1, Title_text_line_2,
         map_area_definition = "corners",
         area                = [23.12,-9.55,56.31,87.75]
         )
+      
+      # Selecting the stations in the zoom for Europe, to plot only them
+      # Note: the lat/lon box contains the whole Lambert view (whose edges are curved in lat/lon), and the stations are selected with a spatial 
+      # index built only once for all the climatologies (since they refer to the same stations).
+      ind_Europe = select_area(spatial_index(lats, lons), [15.0,-45.0,90.0,135.0])
+      not_reject_geo_Europe = mv.create_geo(
+            type = 'xyv',
+            latitudes =  lats[ind_Europe],
+            longitudes = lons[ind_Europe],
+            values = not_reject_array[ind_Europe]
+            )
 
       if RunType == "Static":
             symbol_height = 0.1
@@ -140,7 +155,7 @@ def plot_statisticAD(RunType, ClimateType, Title_text_line_1, Title_text_line_2,
             # Zoom for Europe
             svg = mv.png_output(output_name = DirOUT + "/" + ClimateType + "_Europe")
             mv.setoutput(svg)
-            mv.plot(not_reject_geo, Europe, coastlines, markers, legend, title)
+            mv.plot(not_reject_geo_Europe, Europe, coastlines, markers, legend, title)
 
 #######################################################################################################################
 
@@ -1,8 +1,11 @@
 import os
+import sys
 from os.path import exists
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
-import metview as mv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processed"))
+from Functions.obs_archive import read_obs_slot
 
 #########################################################################################################################################
 # CODE DESCRIPTION
@@ -44,9 +47,6 @@ for Dataset in Dataset_list:
       
       print("Considering:", Dataset)
 
-      # Setting main input directory
-      MainDirIN = Git_repo + "/" + DirIN + "/" + Dataset
-      
       # Considering different years
       av_count_obs = [] 
       for Year in Year_list:
@@ -60,14 +60,10 @@ for Dataset in Dataset_list:
             TheDateTime = DateTime1
             while TheDateTime <= DateTime2:
       
-                  TheDateSTR = TheDateTime.strftime("%Y%m%d")
-                  TheTimeSTR = TheDateTime.strftime("%H")
-
                   # Reading the rainfall observations and counting how many observation are in each single day, in a given year
-                  FileIN_temp = MainDirIN + "/" + TheDateSTR + "/tp" + str(Acc) + "_obs_" + TheDateSTR + TheTimeSTR + ".geo"
-                  if exists(FileIN_temp):
-                        geo = mv.read(FileIN_temp)
-                        count_obs = count_obs + mv.count(geo)
+                  geo = read_obs_slot(Git_repo + "/" + DirIN, Dataset, TheDateTime, Acc)
+                  if geo is not None:
+                        count_obs = count_obs + len(geo)
 
                   TheDateTime += timedelta(hours=1)
 
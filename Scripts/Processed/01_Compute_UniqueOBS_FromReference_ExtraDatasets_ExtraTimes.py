@@ -1,8 +1,10 @@
+import sys
 import os
 from os.path import exists
 from datetime import datetime, timedelta
-import numpy as np
-import metview as mv
+from Functions.geopoints import write_geo
+from Functions.obs_archive import file_archive, file_geo, read_obs_slot, write_archive
+from Functions.unique_obs import select_unique_stations
 
 ######################################################################################################################
 # CODE DESCRIPTION
@@ -15,12 +17,16 @@ import metview as mv
 # Acc (number, in hours): rainfall accumulation period.
 # DateTimeS (date, in YYYYMMDDHHMM format): start date/time to retrieve. The time values correspond to the considered reference time.
 # DateTimeF (date, in YYYYMMDDHHMM format): final date/time to retrieve. The time values correspond to the considered reference time.
+#                                                     If a year is given as argument (e.g. when running the script with Run_Years.py), only the dates/times in that year are considered.
+#                                                     When DateTimeF is the first day of a year (e.g. 2020-01-01 for the period 2000-2019), such day is considered with the 
+#                                                     previous year, so running the years of the period (e.g. Run_Years.py 01_... 2000 2019) covers all the dates/times up to DateTimeF.
 # Disc_time (number, in hours): discretization to determine the extra times to consider compared to the reference time.
 # Dataset_ref (string): name of the reference dataset.
 # Dataset_extra_list (list of strings): names of the considered extra datasets compared to the reference dataset.
 # Git_repo (string): path of local github repository
 # DirIN (string): relative path for the input directory
 # DirOUT (string): relative path for the output directory
+# Write_Archive (boolean): if True, the unique observations are saved in one archive file per dataset and year (see Functions/obs_archive.py) instead of one geopoint file per date/time.
 
 # INPUT PARAMETERS
 Acc = 24
@@ -32,8 +38,22 @@ Dataset_extra_list = ["hdobs", "bom", "india", "efas", "vnm", "ukceda"]
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN = "Data/Raw/OBS"
 DirOUT = "Data/Processed/01_UniqueOBS"
+Write_Archive = True
 ######################################################################################################################
 
+# Restricting the considered dates/times to a single year (when given as argument)
+# Note: when DateTimeF is the first day of a year, it is considered with the previous year (and nothing is considered for the year of DateTimeF).
+if len(sys.argv) > 1:
+      Year = int(sys.argv[1])
+      DateTimeS_year = max(DateTimeS, datetime(Year,1,1,DateTimeS.hour,DateTimeS.minute))
+      DateTimeF_year = min(DateTimeF, datetime(Year,12,31,DateTimeS.hour,DateTimeS.minute))
+      if DateTimeF == datetime(Year+1,1,1,DateTimeS.hour,DateTimeS.minute):
+            DateTimeF_year = DateTimeF
+      elif (DateTimeF == datetime(Year,1,1,DateTimeS.hour,DateTimeS.minute)) and (DateTimeS < DateTimeF):
+            DateTimeF_year = DateTimeS_year - timedelta(days=1)
+      DateTimeS = DateTimeS_year
+      DateTimeF = DateTimeF_year
+
 # Adding the reference dataset to the list of the considered extra datasets
 Dataset_extra_list.insert(0, Dataset_ref)
 
@@ -41,44 +61,58 @@ Dataset_extra_list.insert(0, Dataset_ref)
 MainDirIN = Git_repo + "/" + DirIN
 MainDirOUT = Git_repo + "/" + DirOUT + "_" + str(Acc) + "h_" + Dataset_ref + "_" + DateTimeS.strftime("%H") + "UTC"
 
+# Saving the observations for a given dataset and date/time
+# Note: when the observations are saved in archives, they are collected for each dataset and year, and saved once the year is completed.
+# The valid dates/times covered by the considered reference dates/times (i.e. up to the last extra time after DateTimeF) replace the ones
+# already in the archives, so the observations that are no longer unique (e.g. after changing the extra datasets) are removed, while the
+# ones outside them (e.g. saved when running the script for other years) are kept. An archive is saved for every dataset and year in such 
+# window, even when there are no new observations in it, so the existing ones are cleared as well.
+Archive_window = [int(DateTimeS.strftime("%Y%m%d%H")), int((DateTimeF + timedelta(hours=23)).strftime("%Y%m%d%H"))]
+Archive_slots = {}
+if Write_Archive:
+      for Dataset in Dataset_extra_list:
+            for Year in range(DateTimeS.year, (DateTimeF + timedelta(hours=23)).year + 1):
+                  Archive_slots[(Dataset, Year)] = ([], [])
+def save_obs(geo, Dataset, TheDateTime):
+      if Write_Archive:
+            key = (Dataset, TheDateTime.year)
+            if key not in Archive_slots:
+                  Archive_slots[key] = ([], [])
+            Archive_slots[key][0].append(int(TheDateTime.strftime("%Y%m%d%H")))
+            Archive_slots[key][1].append(geo)
+      else:
+            FileOUT = file_geo(MainDirOUT, Dataset, TheDateTime, Acc)
+            if not exists(os.path.dirname(FileOUT)):
+                  os.makedirs(os.path.dirname(FileOUT))
+            write_geo(FileOUT, geo)
+
+def save_archives(YearF=None):
+      for key in [key for key in Archive_slots if (YearF is None) or (key[1] < YearF)]:
+            FileOUT = file_archive(MainDirOUT, key[0], key[1], Acc)
+            if (len(Archive_slots[key][0]) != 0) or exists(FileOUT):
+                  print("Saving the archive for " + key[0] + " in " + str(key[1]))
+                  write_archive(FileOUT, Archive_slots[key][0], Archive_slots[key][1], Window=Archive_window)
+            del Archive_slots[key]
+
 # Adding unique stations over extra times and datasets respect to the reference date/time and dataset
 TheDateTime_ref = DateTimeS
 while TheDateTime_ref <= DateTimeF:
       
+      # Saving the archives for the completed years
+      save_archives(TheDateTime_ref.year)
+
       # Reading the observations for the reference date/time and dataset
-      TheDateSTR_ref = TheDateTime_ref.strftime("%Y%m%d")
-      TheTimeSTR_ref = TheDateTime_ref.strftime("%H")
-      FileIN_ref_temp = MainDirIN + "/" + Dataset_ref + "/" + TheDateSTR_ref + "/tp" + str(Acc) + "_obs_" + TheDateSTR_ref + TheTimeSTR_ref + ".geo"
-      if exists(FileIN_ref_temp):
+      geo_ref = read_obs_slot(MainDirIN, Dataset_ref, TheDateTime_ref, Acc, RemoveMissing=True)
+      if geo_ref is not None:
             print("Considering reference date/time:", TheDateTime_ref)
-            geo_ref = mv.read(FileIN_ref_temp)
-            geo_ref = mv.remove_missing_values(geo_ref)
-            stnids_ref = mv.stnids(geo_ref) # list
-            lats_ref = mv.latitudes(geo_ref) # array
-            lons_ref = mv.longitudes(geo_ref) # array
-            elevation_ref = mv.levels(geo_ref) # array
-            date_ref = mv.dates(geo_ref) # list
-            time_ref = mv.times(geo_ref) # array
-            vals_ref = mv.values(geo_ref) # array
+            stnids_ref = geo_ref["stnid"]
             
             # Saving the observations for the reference date/time and dataset
-            MainDirOUT_ref_temp = MainDirOUT + "/" + Dataset_ref + "/" + TheDateSTR_ref
-            if not exists(MainDirOUT_ref_temp):
-                  os.makedirs(MainDirOUT_ref_temp)
-            FileOUT_ref_temp = MainDirOUT_ref_temp + "/tp" + str(Acc) + "_obs_" + TheDateSTR_ref + TheTimeSTR_ref + ".geo"
-            geo_ref = mv.create_geo( # To match the format in which the extra geopoints are going to be saved
-                                    type = 'ncols',
-                                    latitudes = lats_ref,
-                                    longitudes = lons_ref,
-                                    stnids = stnids_ref,
-                                    levels = elevation_ref,
-                                    dates = date_ref,
-                                    times = time_ref, 
-                                    values = vals_ref,
-                                    )
-            mv.write(FileOUT_ref_temp, geo_ref)
+            save_obs(geo_ref, Dataset_ref, TheDateTime_ref)
             
             # Creating geopoint files containing unique stations over extra datasets respect to the reference dataset
+            # Note: the ids of the stations already considered (starting from the reference stations) are kept in a set, and updated with the unique stations of each extra dataset/time
+            stnids_seen = set(stnids_ref.tolist())
             for Dataset in Dataset_extra_list:
                   
                   # Defining the starting extra times to consider
@@ -92,60 +126,17 @@ while TheDateTime_ref <= DateTimeF:
                         
                         # Reading the observations for the extra stations
                         TheDateTime_extra = TheDateTime_ref + timedelta(hours=hours_extra)
-                        TheDateSTR_extra = TheDateTime_extra.strftime("%Y%m%d")
-                        TheTimeSTR_extra = TheDateTime_extra.strftime("%H")
-                        FileIN_extra_temp = MainDirIN + "/" + Dataset + "/" + TheDateSTR_extra + "/tp" + str(Acc) + "_obs_" + TheDateSTR_extra + TheTimeSTR_extra + ".geo"
-                        if exists(FileIN_extra_temp):
-                              geo_extra = mv.read(FileIN_extra_temp)
-                              geo_extra = mv.remove_missing_values(geo_extra)
-                              stnids_extra = mv.stnids(geo_extra)
-                              lats_extra = mv.latitudes(geo_extra)
-                              lons_extra = mv.longitudes(geo_extra)
-                              elevation_extra = mv.levels(geo_extra)
-                              date_extra = mv.dates(geo_extra)
-                              time_extra = mv.times(geo_extra)
-                              vals_extra = mv.values(geo_extra)
+                        geo_extra = read_obs_slot(MainDirIN, Dataset, TheDateTime_extra, Acc, RemoveMissing=True)
+                        if geo_extra is not None:
 
-                              # Defining the ids in stnids_extra that are not included in stnids_ref
-                              stnids_unique = list(np.setdiff1d(stnids_extra,stnids_ref))
-                              if len(stnids_unique) != 0:
-                                    
-                                    # Extracting different values for the unique stations
-                                    lats_unique = np.array([])
-                                    lons_unique = np.array([])
-                                    elevation_unique = np.array([])
-                                    date_unique = []
-                                    time_unique = np.array([])
-                                    vals_unique = np.array([])
-                                    for item in stnids_unique:
-                                          ind = stnids_extra.index(item)
-                                          lats_unique = np.append(lats_unique, lats_extra[ind])
-                                          lons_unique = np.append(lons_unique, lons_extra[ind])
-                                          elevation_unique = np.append(elevation_unique, elevation_extra[ind])
-                                          date_unique.append(date_extra[ind])
-                                          time_unique = np.append(time_unique, time_extra[ind])
-                                          vals_unique = np.append(vals_unique, vals_extra[ind])
-                                    
-                                    # Creating the geopoint file containing only the unique stations 
-                                    geo_unique = mv.create_geo(
-                                          type = 'ncols',
-                                          latitudes = lats_unique,
-                                          longitudes = lons_unique,
-                                          stnids = stnids_unique,
-                                          levels = elevation_unique,
-                                          dates = date_unique,
-                                          times = time_unique, 
-                                          values = vals_unique,
-                                          )
+                              # Selecting the stations in the extra dataset/time that are not included in the reference (or in the previous extra) stations
+                              ind_unique = select_unique_stations(geo_extra["stnid"], stnids_seen)
+                              if len(ind_unique) != 0:
                                     
-                                    # Saving the geopoint file containing only the unique stations 
-                                    MainDirOUT_extra_temp = MainDirOUT + "/" + Dataset + "/" + TheDateSTR_extra
-                                    if not exists(MainDirOUT_extra_temp):
-                                          os.makedirs(MainDirOUT_extra_temp)
-                                    FileOUT_extra_temp = MainDirOUT_extra_temp + "/tp" + str(Acc) + "_obs_" + TheDateSTR_extra + TheTimeSTR_extra + ".geo"
-                                    mv.write(FileOUT_extra_temp, geo_unique)
+                                    # Saving the observations containing only the unique stations 
+                                    save_obs(geo_extra[ind_unique], Dataset, TheDateTime_extra)
 
-                                    # Adding the ids of the unique stations to the ids of the reference stations
-                                    stnids_ref.extend(stnids_unique)
+      TheDateTime_ref += timedelta(days=1)
 
-      TheDateTime_ref += timedelta(days=1)
\ No newline at end of file
+# Saving the archives for the remaining years
+save_archives()
\ No newline at end of file
@@ -1,21 +1,28 @@
+import sys
 import os
 from os.path import exists
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
-import metview as mv
+from Functions.geopoints import merge_geo, write_geo
+from Functions.obs_archive import read_obs_day
 
 #################################################################################################################################################
 # CODE DESCRIPTION
 # 02_Compute_Combine_UniqueOBS.py combines, into a single geopoint file for a given day, all rainfall observations from different datasets and times in a day.
 # The combined observations group measurements valid for the end of the accumulation period. Therefore, observations saved as day X refer to measurements valid for day (X-1).
+# The observations of each dataset are read once per day (all times together), and the days are combined in parallel.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # YearS (number, in YYYY format): start year to consider.
 # YearF (number, in YYYY format): final year to consider.
+#                                                     If a year is given as argument (e.g. when running the script with Run_Years.py), only that year is considered.
 # Acc (number, in hours): rainfall accumulation period.
 # Dataset_list (string): name of datasets to consider.
 # Git_repo (string): path of local github repository
 # DirIN (string): relative path for the input directory
 # DirOUT (string): relative path for the output directory
+# NumWorkers (integer number): number of processes combining the days in parallel (None to consider all the local cores).
 
 # INPUT PARAMETERS
 YearS = 2000
@@ -25,12 +32,31 @@ Dataset_list = ["synop", "bom", "india", "vnm"]
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN = "Data/Processed/01_UniqueOBS_synop_00UTC"
 DirOUT = "Data/Processed/02_Combined_UniqueOBS"
+NumWorkers = None
 #################################################################################################################################################
 
+# Considering a single year (when given as argument)
+if len(sys.argv) > 1:
+      YearS = int(sys.argv[1])
+      YearF = YearS
+
 # Setting main input directory
 MainDirIN = Git_repo + "/" + DirIN
 
-# Combining, into a single geopoint file for a given day, all rainfall observations from different datasets and times in a day
+# Combining, into a single geopoint file for a given day, all rainfall observations from different datasets and times in the day
+# Note: the observations are combined in the same order as they were read one file at a time (i.e. for each time, for each dataset).
+def combine_day(TheDate):
+      
+      TheDateSTR  = TheDate.strftime("%Y%m%d")
+      obs_day = {Dataset: read_obs_day(MainDirIN, Dataset, TheDate, Acc) for Dataset in Dataset_list}
+      obs_combined = merge_geo([obs_day[Dataset].get(TheTime) for TheTime in range(0,24) for Dataset in Dataset_list])
+
+      # Saving the combined observations into a single geopoint file
+      if len(obs_combined) != 0:
+            FileOUT_temp = Git_repo + "/" + DirOUT + "_" + str(Acc) + "h/" + str(TheDate.year) + "/tp" + str(Acc) + "_obs_" + TheDateSTR + ".geo"
+            write_geo(FileOUT_temp, obs_combined)
+      return TheDateSTR, len(obs_combined)
+
 for Year in range(YearS,YearF+1):
 
       # Setting main output directory for the given year
@@ -38,31 +64,14 @@ for Year in range(YearS,YearF+1):
       if not exists(MainDirOUT):
             os.makedirs(MainDirOUT)
 
-      # Reading and combining all the rainfall observations for the given year (for all considered datasets and for all times in a day)
-      TheDateS = date(Year,1,1)
-      TheDateF = date(Year,12,31)
-      TheDate = TheDateS
-      while TheDate <= TheDateF:
-            
-            TheDateSTR  = TheDate.strftime("%Y%m%d")
-            print(" ")
-            print("Reading the rainfall observations for " + TheDateSTR + "...")
-
-            print("  - Combining the observations for all considered datasets and times in the day into a single geopoint file...")
-            obs_combined = None
-            for TheTime in range(0,24):
-                  TheTimeSTR = f"{TheTime:02d}"
-                  for Dataset in Dataset_list:
-                        FileIN_temp = MainDirIN + "/" + Dataset + "/" + TheDateSTR + "/tp" + str(Acc) + "_obs_" + TheDateSTR + TheTimeSTR + ".geo"
-                        if exists(FileIN_temp):
-                              obs_combined = mv.merge(obs_combined, mv.read(FileIN_temp))
-
-            # Saving the combined observations into a single geopoint file
-            if mv.count(obs_combined) != 0:
-                  print("  - Saving the single geopoint file for the combined observations ...")
-                  FileOUT_temp = MainDirOUT + "/tp" + str(Acc) + "_obs_" + TheDateSTR + ".geo"
-                  mv.write(FileOUT_temp, obs_combined)
-            else:
-                  print("  - Empty geopoint. Nothing to save.")
-            
-            TheDate += timedelta(days=1)
\ No newline at end of file
+      # Combining the days in the given year in parallel
+      # Note: the days are sent to the processes in chunks of consecutive days, so each process reads the archive of each dataset only once.
+      print(" ")
+      print("Combining the rainfall observations for all considered datasets and times in the days of " + str(Year) + "...")
+      TheDates = [date(Year,1,1) + timedelta(days=i) for i in range((date(Year,12,31) - date(Year,1,1)).days + 1)]
+      with ProcessPoolExecutor(max_workers=NumWorkers, mp_context=multiprocessing.get_context("fork")) as pool:
+            for TheDateSTR, NumObs in pool.map(combine_day, TheDates, chunksize=31):
+                  if NumObs != 0:
+                        print(" - " + TheDateSTR + ": " + str(NumObs) + " observations saved")
+                  else:
+                        print(" - " + TheDateSTR + ": empty geopoint. Nothing to save.")
\ No newline at end of file
@@ -2,12 +2,15 @@ import sys
 import os
 from os.path import exists
 from datetime import date, timedelta
-import numpy as np
-import metview as mv
+from Functions.geopoints import read_geo
+from Functions.station_registry import create_registry, update_registry, save_registry
 
 ######################################################################################
 # CODE DESCRIPTION
 # 03_Compute_UniqueStnids_Year.py determines the values of the unique stnids present in a given year.
+# The registry of the unique stnids is updated day by day (see Functions/station_registry.py). Besides the lat/lon/level where each station
+# is first seen, it contains the lat/lon where the station is last seen, the first/last day in which it is seen, the number of days in which
+# it is seen, and a flag for the stations whose coordinates changed over the year.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # Year (number, in YYYY format): year to consider.
@@ -31,9 +34,7 @@ if not exists(MainDirOUT):
 
 # Identify unique stnids over the considered period
 print("Extracting the stnids for rainfall observations on...")
-stnids_year = np.array([])
-lats_year = np.array([])
-lons_year = np.array([])
+registry_year = create_registry()
 
 TheDateS = date(Year,1,2)
 TheDateF = date(Year+1,1,1)
@@ -44,20 +45,13 @@ while TheDate <= TheDateF:
       TheYearSTR = TheDate.strftime("%Y")
       print(" - " + TheDateSTR)
       FileIN = Git_repo + "/" + DirIN + "/" + TheYearSTR + "/tp" + str(Acc) + "_obs_" + TheDateSTR + ".geo"
-      geo = mv.read(FileIN)
-      stnids_year = np.append(stnids_year, np.array(mv.stnids(geo)))
-      lats_year = np.append(lats_year, mv.latitudes(geo))
-      lons_year = np.append(lons_year, mv.longitudes(geo))
+      if exists(FileIN):
+            geo = read_geo(FileIN)
+            registry_year = update_registry(registry_year, {"stnids": geo["stnid"], "lats": geo["latitude"], "lons": geo["longitude"], "levels": geo["level"], "dates": int(TheDateSTR)})
+      else:
+            print("     - WARNING! File not found: " + FileIN)
       TheDate += timedelta(days=1)
-
-# Extracting the unique stnids
-print("Extracting the unique stnids...")
-stnids_unique_year, ind_stnids_unique = np.unique(stnids_year, return_index=True)
-lats_unique_year = lats_year[ind_stnids_unique]
-lons_unique_year = lons_year[ind_stnids_unique]
-print(str(len(stnids_unique_year)) + " unique stnids found for " + str(Year))
+print(str(len(registry_year["stnids"])) + " unique stnids found for " + str(Year) + " (" + str(sum(registry_year["moved"])) + " with changing coordinates)")
 
 # Saving the unique stnids
-np.save(MainDirOUT + "/stnids_unique_" + str(Year), stnids_unique_year)
-np.save(MainDirOUT + "/lats_unique_" + str(Year), lats_unique_year)
-np.save(MainDirOUT + "/lons_unique_" + str(Year), lons_unique_year)
\ No newline at end of file
+save_registry(MainDirOUT, registry_year, "_" + str(Year))
\ No newline at end of file
@@ -1,8 +1,13 @@
-import numpy as np
+import os
+from os.path import exists
+from Functions.station_registry import read_registry, merge_registries, save_registry
 
 #####################################################################################################
 # CODE DESCRIPTION
 # 04_Compute_CombineYears_UniqueStnids.py combines the unique stnids for each year over a considered period of time.
+# The registries of the single years are merged in chronological order, so the lat/lon of each station are the ones where it was first
+# seen in the period, the last lat/lon are the ones where it was last seen, the counts are summed over the years, and the stations whose
+# coordinates changed over the period are flagged as moved.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # YearS (number, in YYYY format): start year to consider.
@@ -25,19 +30,10 @@ MainDirIN = Git_repo + "/" + DirIN
 MainDirOUT = Git_repo + "/" + DirOUT  + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF)
 
 # Defining the unique stnids for the considered period of time
-stnids_all = np.array([])
-lats_all = np.array([])
-lons_all = np.array([])
-for Year in range(YearS,YearF+1):
-      stnids_all = np.append(stnids_all, np.load(MainDirIN +  "/stnids_unique_" + str(Year) + ".npy"))
-      lats_all = np.append(lats_all, np.load(MainDirIN +  "/lats_unique_" + str(Year) + ".npy"))
-      lons_all = np.append(lons_all, np.load(MainDirIN +  "/lons_unique_" + str(Year) + ".npy"))
-stnids_unique, ind_stnids_unique = np.unique(stnids_all, return_index=True)
-lats_unique = lats_all[ind_stnids_unique]
-lons_unique = lons_all[ind_stnids_unique]
-print(str(len(stnids_unique)) + " unique stnids found for the period between " + str(YearS) + " and " + str(YearF))
+registry = merge_registries(read_registry(MainDirIN, "_" + str(Year)) for Year in range(YearS,YearF+1))
+print(str(len(registry["stnids"])) + " unique stnids found for the period between " + str(YearS) + " and " + str(YearF) + " (" + str(sum(registry["moved"])) + " with changing coordinates)")
 
 # Saving the unique stnids for the period considered
-np.save(MainDirOUT +  "/stnids_unique.npy", stnids_unique)
-np.save(MainDirOUT +  "/lats_unique.npy", lats_unique)
-np.save(MainDirOUT +  "/lons_unique.npy", lons_unique)
\ No newline at end of file
+if not exists(MainDirOUT):
+      os.makedirs(MainDirOUT)
+save_registry(MainDirOUT, registry)
\ No newline at end of file
@@ -4,11 +4,17 @@ from os.path import exists
 from datetime import date, timedelta
 import numpy as np
 import pandas as pd
-import metview as mv
+from Functions.geopoints import read_geo
+from Functions.align_obs import align_obs
+from Functions.obs_store import open_obs_array
+from Functions.calendar_index import season_index
+from Functions.histograms import histograms_stations, write_histograms
 
 #######################################################################################################################
 # CODE DESCRIPTION
 # 05_Compute_AlignOBS_Year.py aligns the observations over a considered year so there are the same number of stations per day over such year.
+# The histograms of the aligned observations of each station over the year and over each season are also saved, so the observational 
+# climatologies over any period can be computed by summing the histograms of the years it covers (without reading again the observations).
 
 # DESCRIPTION OF INPUT PARAMETERS
 # Year (number, in YYYY format): start year to consider.
@@ -18,6 +24,7 @@ import metview as mv
 # DirIN_UniqueStnids (string): relative path for the input directory containing the ids/lats/lons of the unique station over the period of interest
 # DirIN (string): relative path for the input directory containing the rainfall observations of interest
 # DirOUT (string): relative path for the output directory that will contain the aligned observations for the given year
+# Save_Hist (boolean): if True, the histograms of the aligned observations for the given year (and for each season) are also saved.
 
 # INPUT PARAMETERS
 Year = int(sys.argv[1])
@@ -27,6 +34,7 @@ Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN_UniqueStnids = "Data/Processed/04_UniqueStnids"
 DirIN = "Data/Processed/02_Combined_UniqueOBS"
 DirOUT = "Data/Processed/05_AlignedOBS_Year"
+Save_Hist = True
 #######################################################################################################################
 
 
@@ -50,32 +58,49 @@ Dates_range = np.array((pd.date_range(DateS.strftime("%Y%m%d"), DateF.strftime("
 NumDays = len(Dates_range) 
 
 # Aligning the observations for the considered year
-aligned_obs = np.empty((NumStns,NumDays,)) * np.nan # initialize the variable that will contain the aligned observations with NaNs, so there won't be any need to deal with stations with no observations on a given day
+def read_day(ind_day):
 
-TheDate = DateS
-while TheDate <= DateF:
-      
+      TheDate = DateS + timedelta(days=ind_day)
       TheDateSTR  = TheDate.strftime("%Y%m%d")
       TheYearSTR = TheDate.strftime("%Y")
-      ind_dates = np.where(Dates_range == TheDateSTR)[0][0]
       print(" - " + TheDateSTR)
 
       # Reading the rainfall observations as geopoints 
       FileIN_temp = MainDirIN + "/" + TheYearSTR + "/tp" + str(Acc) + "_obs_" + TheDateSTR + ".geo"
-      geo = mv.read(FileIN_temp)
-      geo_stnids = np.array(mv.stnids(geo))
-      geo_obs = mv.values(geo)
-      m = len(geo_stnids)
-      
-      # Assigning observations to the correspondent unique stations and dates
-      for i in range(m):
-            stnids_temp = geo_stnids[i]
-            obs_temp = geo_obs[i]
-            ind_stnids = np.where(stnids_unique == stnids_temp)[0][0]
-            aligned_obs[ind_stnids,ind_dates] = obs_temp
+      if not exists(FileIN_temp):
+            print("     - WARNING! File not found: " + FileIN_temp)
+            return None
+      geo = read_geo(FileIN_temp)
+      return geo["stnid"], geo["value"]
 
-      TheDate += timedelta(days=1)
+# Note: the aligned observations are written directly into a float32 memory-mapped file (NaN for missing observations), so they can be
+# combined over the whole period in stage 06 without loading all the years in memory.
+FileOUT = MainDirOUT + "/" + str(Year) + ".npy"
+aligned_obs = open_obs_array(FileOUT, (NumStns, NumDays))
+aligned_obs, stnids_missing = align_obs(stnids_unique, NumDays, read_day, aligned_obs)
+
+# Reporting the stations that could not be matched with the unique stations over the period of interest
+if len(stnids_missing) != 0:
+      print(" ")
+      print("WARNING! Some observations could not be matched with the unique stations over the period of interest. They were not aligned.")
+      for ind_day in stnids_missing:
+            print(" - " + Dates_range[ind_day] + ": " + str(len(stnids_missing[ind_day])) + " stations not found (e.g. " + ", ".join(stnids_missing[ind_day][0:5]) + ")")
 
 # Saving the aligned rainfall observations for the given year as a 2-d numpy array
-FileOUT = MainDirOUT + "/" + str(Year) + ".npy"
-np.save(FileOUT,aligned_obs)
\ No newline at end of file
+aligned_obs.flush()
+del aligned_obs
+aligned_obs = np.load(FileOUT, mmap_mode="r")
+
+# Saving the histograms of the aligned rainfall observations of each station for the given year and for each season
+# Note: the histograms contain the ids of the stations, so they can be summed with the histograms of years aligned over a different period.
+# They also contain the signature (size and modification time) of the file with the aligned observations, so they are not used once such file is saved again.
+if Save_Hist:
+      print(" ")
+      print("Saving the histograms of the aligned observations for the year and for each season")
+      for ClimateType in ["Year", "DJF", "MAM", "JJA", "SON"]:
+            print(" - " + ClimateType)
+            if ClimateType == "Year":
+                  hist = histograms_stations(aligned_obs)
+            else:
+                  hist = histograms_stations(aligned_obs[:,season_index(Dates_range, ClimateType)])
+            write_histograms(MainDirOUT + "/hist_" + ClimateType + "_" + str(Year) + ".npz", hist, stnids=stnids_unique, FileSource=FileOUT)
\ No newline at end of file
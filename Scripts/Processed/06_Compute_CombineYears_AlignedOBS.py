@@ -3,6 +3,7 @@ from os.path import exists
 from datetime import date
 import numpy as np
 import pandas as pd
+from Functions.obs_store import create_obs_store
 
 ####################################################################################################################
 # CODE DESCRIPTION
@@ -16,6 +17,7 @@ import pandas as pd
 # DirIN_UniqueStnids (string): relative path for the input directory containing the ids/lats/lons of the unique station over the period of interest
 # DirIN (string): relative path for the input directory containing the aligned rainfall observations on a given year
 # DirOUT (string): relative path for the output directory that will contain the aligned observations for the whole period of interest
+# NumStns_block (integer number): number of stations copied at a time from the aligned observations of each year
 
 # INPUT PARAMETERS
 YearS = 2000
@@ -25,6 +27,7 @@ Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN_UniqueStnids = "Data/Processed/04_UniqueStnids"
 DirIN = "Data/Processed/05_AlignedOBS_Year"
 DirOUT = "Data/Processed/06_AlignedOBS_rawSTVL"
+NumStns_block = 10000
 ####################################################################################################################
 
 # Setting main input/output directory
@@ -46,36 +49,44 @@ lats_unique = np.load(MainDirIN_UniqueStnids+ "/lats_unique.npy")
 lons_unique = np.load(MainDirIN_UniqueStnids+ "/lons_unique.npy")
 NumStns_period = len(stnids_unique)
 
+# Creating the store for the aligned observations over the whole considered period
+# Note: the store is preallocated on disk (float32, NaN for missing observations), and the aligned observations for each year are copied in 
+# their columns one year at a time, so the observations over the whole period are never loaded in memory.
+print(" ")
+print("Creating the store for the aligned observations over the whole considered period")
+align_obs = create_obs_store(MainDirOUT, stnids_unique, lats_unique, lons_unique, Dates_range)
+
 # Merging the aligned observations for each year over the period of interest
 print(" ")
 print("Merging aligned observations over the period of interest for year ...")
-print(" - " + str(YearS))
-FileIN_temp = MainDirIN + "/" + str(YearS) + ".npy"
-align_obs = np.load(FileIN_temp)
-for Year in range(YearS+1,YearF+1):
+ind_day_start = 0
+for Year in range(YearS,YearF+1):
       print(" - " + str(Year))
       FileIN_temp = MainDirIN + "/" + str(Year) + ".npy"
-      align_obs = np.concatenate((align_obs, np.load(FileIN_temp)), axis=1)
-NumStns = align_obs.shape[0]
-NumDays = align_obs.shape[1]
+      align_obs_year = np.load(FileIN_temp, mmap_mode="r")
+      NumStns = align_obs_year.shape[0]
+      NumDays = align_obs_year.shape[1]
+      
+      # Checking that the number of unique stations and number of days over the considered period matches the total number of stations and days for the single imported files
+      if (NumStns != NumStns_period):
+            print("ERROR! The number of the unique stations over the considered period does not match the number of the stations in the single imported files.")
+            exit()
+      elif (ind_day_start + NumDays > NumDays_period):
+            print("ERROR! The number of days over the considered period does not match the number of the days in the single imported files.")
+            exit()
+      for ind_stn_start in range(0, NumStns, NumStns_block):
+            ind_stn_end = ind_stn_start + NumStns_block
+            align_obs[ind_stn_start:ind_stn_end, ind_day_start:ind_day_start+NumDays] = align_obs_year[ind_stn_start:ind_stn_end,:]
+      ind_day_start = ind_day_start + NumDays
 
-# Checking that the number of unique stations and number of days over the considered period matches the total number of stations and days for the single imported files
 print(" ")
-if (NumStns == NumStns_period) and (NumDays == NumDays_period):
-      print("Considering " + str(NumStns) + " rainfall stations each day over the period of interest.")
-      print("There are " + str(NumDays) + " days over the period of interest.")
-elif (NumStns != NumStns_period):
-      print("ERROR! The number of the unique stations over the considered period does not match the number of the stations in the single imported files.")
-      exit()
-elif (NumDays != NumDays_period):
+if (ind_day_start != NumDays_period):
       print("ERROR! The number of days over the considered period does not match the number of the days in the single imported files.")
       exit()
+print("Considering " + str(NumStns_period) + " rainfall stations each day over the period of interest.")
+print("There are " + str(NumDays_period) + " days over the period of interest.")
 
 # Saving the aligned observations over the whole considered period
 print(" ")
 print("Saving the aligned observations over the whole considered period")
-np.save(MainDirOUT + "/stn_ids.npy", stnids_unique)
-np.save(MainDirOUT + "/stn_lats.npy", lats_unique)
-np.save(MainDirOUT + "/stn_lons.npy", lons_unique)
-np.save(MainDirOUT + "/dates.npy", Dates_range)
-np.save(MainDirOUT + "/stvl_obs.npy", align_obs)
\ No newline at end of file
+align_obs.flush()
\ No newline at end of file
@@ -1,11 +1,17 @@
 import os
 from os.path import exists
-from datetime import datetime
 import numpy as np
+from Functions.percentiles import percentiles_stations
+from Functions.clean_obs import read_obs_flags, read_obs_block
+from Functions.calendar_index import season_index
+from Functions.histograms import read_histograms, histogram_rows, merge_histograms, histogram_totals, percentiles_histograms, histograms_current
 
 ##########################################################################################################################################################
 # CODE DESCRIPTION
 # 09_Compute_Climate_OBS.py computes rainfall climatologies from point observations.
+# For the raw STVL observations, the climatologies can be computed by summing the histograms of the aligned observations saved for each year 
+# in stage 05, so a period can be extended (or changed) without reading again the observations. The results are the same as the ones computed 
+# from the observations over the whole period.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # YearS (number, in YYYY format): start year to consider.
@@ -17,8 +23,12 @@ import numpy as np
 # MinDays_Perc_list (list of number, from 0 to 1): list of percentages for the minimum number of days over the considered period with valid observations to compute the climatologies.
 # Perc_year (array of float numbers): percentiles to compute for the year climatology.
 # Perc_season (array of float numbers): percentiles to compute for the seasonal climatologies.
+# MaxMemory_GB (number, in GB): approximate maximum memory used to compute the percentiles for each block of stations.
+# Hist_OBS (boolean): if True, the climatologies for the raw STVL observations are computed from the histograms of each year in the period (when they exist for all years, and were built from the aligned observations currently saved).
 # Git_repo (string): path of local github repository.
 # DirIN (string): relative path for the input directory.
+# DirIN_UniqueStnids (string): relative path for the input directory containing the ids/lats/lons of the unique stations over the period of interest.
+# DirIN_Hist (string): relative path for the input directory containing the histograms of the aligned observations for each year.
 # DirOUT (string): relative path for the output directory.
 
 # INPUT PARAMETERS
@@ -30,24 +40,27 @@ Coeff_Grid2Point_list = [2,5,10,20,50,100]
 MinDays_Perc_list = [0.5, 0.75]
 Perc_year = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95])], axis=0)
 Perc_season = np.concatenate([np.arange(0,100), np.array([99.5, 99.8])], axis=0)
+MaxMemory_GB = 4
+Hist_OBS = True
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN = "Data/Processed"
+DirIN_UniqueStnids = "Data/Processed/04_UniqueStnids"
+DirIN_Hist = "Data/Processed/05_AlignedOBS_Year"
 DirOUT = "Data/Processed/09_Climate_OBS"
 ##########################################################################################################################################################
 
 
 # Costum functions
 
-def compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, DirIN, DirOUT):
+def compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, DirIN, DirOUT, Coeff_Grid2Point=None):
 
       # Reading the rainfall observations over the period of interest and the correspondent metadata (i.e., ids/lats/lons/dates)
+      # Note: the observations (and the flags for the rejected observations, for the clean STVL observations) are memory-mapped, and they are
+      # read (and cleaned) one block of stations at a time, so the observations over the whole period are never loaded in memory.
       print(" ")
       print(" - Reading the rainfall observations over the period of interest and the correspondent metadata (i.e., ids/lats/lons/dates)")
-      stnids = np.load(DirIN + "/stn_ids.npy")
-      lats = np.load(DirIN + "/stn_lats.npy")
-      lons = np.load(DirIN + "/stn_lons.npy")
-      dates = np.load(DirIN + "/dates.npy")
-      obs = np.load(DirIN + "/obs.npy")
+      stnids, lats, lons, dates, obs, reject, RejectFlag = read_obs_flags(DirIN, Coeff_Grid2Point)
+      NumStns = obs.shape[0]
       
       # Computing the climatologies
       ClimateType_list = ["Year", "DJF", "MAM", "JJA", "SON"]
@@ -56,52 +69,82 @@ def compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, DirIN, DirOUT):
             # Selecting the year or the seasonal subset with the observational dataset
             print(" ")
             print("     - Selecting the " + ClimateType + "  subset with the observational dataset")
+            ind_days = season_index(dates, ClimateType)
             if ClimateType == "Year":
-                  obs_temp = obs
                   percs = Perc_year
                   NamePercs = "Percentiles_Year"
             else:
-                  if ClimateType == "DJF":
-                        M1 = 12; M2 = 1; M3 = 2
-                  if ClimateType == "MAM":
-                        M1 = 3; M2 = 4; M3 = 5
-                  if ClimateType == "JJA":
-                        M1 = 6; M2 = 7; M3 = 8
-                  if ClimateType == "SON":
-                        M1 = 9; M2 = 10; M3 = 11
-                  ind_dates_season = []
-                  for ind_dates in range(obs.shape[1]):
-                        month = (datetime.strptime(dates[ind_dates], "%Y%m%d")).month
-                        if (month == M1) or (month == M2) or (month == M3):
-                              ind_dates_season.append(ind_dates)
-                  obs_temp = obs[:,ind_dates_season]
                   percs = Perc_season
                   NamePercs = "Percentiles_Season"
             
+            # Selecting, for each block of stations, the stations with the considered minimum number of days with valid observations, and computing their climatologies
+            # Note: the minimum and the maximum values in the observational dataset are added to the observations of each station to not have them assigned to the 0th and 100th percentile
+            print("     - Selecting the stations with the considered minimum number of days with valid observations, and computing their climatologies")
+            MinNumDays = round(len(ind_days) * MinDays_Perc)
+            NumStns_block = max(1, int((MaxMemory_GB * 1024**3) / (3 * (len(ind_days) + 2) * obs.dtype.itemsize)))
+            climate_list = []
+            ind_stns_list = []
+            for ind_start in range(0, NumStns, NumStns_block):
+                  obs_block = read_obs_block(obs, reject, RejectFlag, slice(ind_start, ind_start + NumStns_block), ind_days)
+                  NumDays_NotNaN = np.sum(~np.isnan(obs_block), axis=1)
+                  ind_stns_block = np.where(NumDays_NotNaN >= MinNumDays)[0]
+                  climate_list.append(percentiles_stations([obs_block], percs, ind_stns=ind_stns_block, AddMinMax=True, MaxMemory_GB=MaxMemory_GB))
+                  ind_stns_list.append(ind_start + ind_stns_block)
+            ind_stns_MinNumDays = np.concatenate(ind_stns_list) if len(ind_stns_list) != 0 else np.array([], dtype=np.int64)
+            climate = np.concatenate(climate_list, axis=-1) if len(climate_list) != 0 else np.empty((len(percs), 0))
+
+            # Saving the climatologies and their metadata
+            print("     - Saving the climatologies and their metadata")
+            climate = np.transpose(np.round(np.float32(climate.astype(float)), decimals=1))
+            save_climate_obs(DirOUT, ClimateType, NamePercs, percs, climate, stnids[ind_stns_MinNumDays], lats[ind_stns_MinNumDays], lons[ind_stns_MinNumDays])
+
+
+def compute_climate_obs_hist(MinDays_Perc, Perc_year, Perc_season, YearS, YearF, DirIN_UniqueStnids, DirIN_Hist, DirOUT):
+
+      # Reading the metadata (i.e., ids/lats/lons) of the unique stations over the period of interest
+      # Note: the histograms of each year are mapped onto these stations with their station ids, so the histograms of years aligned over a 
+      # different period can be summed as well.
+      print(" ")
+      print(" - Reading the ids/lats/lons of the unique stations over the period of interest")
+      stnids = np.load(DirIN_UniqueStnids + "/stnids_unique.npy")
+      lats = np.load(DirIN_UniqueStnids + "/lats_unique.npy")
+      lons = np.load(DirIN_UniqueStnids + "/lons_unique.npy")
+
+      # Computing the climatologies
+      ClimateType_list = ["Year", "DJF", "MAM", "JJA", "SON"]
+      for ClimateType in ClimateType_list:
+
+            # Summing the histograms of the observations for each year in the period
+            print(" ")
+            print("     - Summing the histograms of the " + ClimateType + " observations for each year in the period")
+            hist_list = [read_histograms(DirIN_Hist + "/hist_" + ClimateType + "_" + str(Year) + ".npz") for Year in range(YearS, YearF+1)]
+            hist = merge_histograms(hist_list, [histogram_rows(hist_year["stnids"], stnids) for hist_year in hist_list], len(stnids))
+            if ClimateType == "Year":
+                  percs = Perc_year
+                  NamePercs = "Percentiles_Year"
+            else:
+                  percs = Perc_season
+                  NamePercs = "Percentiles_Season"
+
             # Selecting the stations with the considered minimum number of days with valid observations
             print("     - Selecting the stations with the considered minimum number of days with valid observations")
-            MinNumDays = round(obs_temp.shape[1] * MinDays_Perc)
-            NumDays_NotNaN = np.sum(~np.isnan(obs_temp), axis=1)
+            MinNumDays = round(hist["NumR"] * MinDays_Perc)
+            NumDays_NotNaN = histogram_totals(hist)
             ind_stns_MinNumDays = np.where(NumDays_NotNaN >= MinNumDays)[0]
-            obs_temp_MinNumDays = obs_temp[ind_stns_MinNumDays,:]
-            lats_MinNumDays = lats[ind_stns_MinNumDays]
-            lons_MinNumDays = lons[ind_stns_MinNumDays]
-            stnids_MinNumDays = stnids[ind_stns_MinNumDays]
-
-            # Adjusting the dataset to not have the minimum and the maximum values assigned to the 0th and 100th percentile
-            print("     - Adjusting the dataset to not have the minimum and the maximum values in the observational dataset assigned to the 0th and 100th percentile...")
-            min_obs = np.nanmin(obs_temp_MinNumDays, axis=1)
-            max_obs = np.nanmax(obs_temp_MinNumDays, axis=1)
-            obs_temp_MinNumDays_new = np.column_stack((min_obs, obs_temp_MinNumDays, max_obs))
 
             # Computing and saving the climatologies and their metadata
+            # Note: the minimum and the maximum values in the observational dataset are added to the observations of each station to not have them assigned to the 0th and 100th percentile
             print("     - Computing and saving the climatologies and their metadata")
-            climate = np.transpose(np.round(np.float32(np.nanpercentile(obs_temp_MinNumDays_new, percs, axis=1, interpolation="linear").astype(float)), decimals=1))
-            np.save(DirOUT + "/" + NamePercs + ".npy", percs)
-            np.save(DirOUT + "/Climate_" + ClimateType + ".npy", climate)
-            np.save(DirOUT + "/" + "Stn_ids.npy", stnids_MinNumDays)
-            np.save(DirOUT + "/" + "Stn_lats.npy", lats_MinNumDays)
-            np.save(DirOUT + "/" + "Stn_lons.npy", lons_MinNumDays)
+            climate = np.transpose(np.round(np.float32(percentiles_histograms(hist, percs, ind_stns=ind_stns_MinNumDays, AddMinMax=True).astype(float)), decimals=1))
+            save_climate_obs(DirOUT, ClimateType, NamePercs, percs, climate, stnids[ind_stns_MinNumDays], lats[ind_stns_MinNumDays], lons[ind_stns_MinNumDays])
+
+
+def save_climate_obs(DirOUT, ClimateType, NamePercs, percs, climate, stnids, lats, lons):
+      np.save(DirOUT + "/" + NamePercs + ".npy", percs)
+      np.save(DirOUT + "/Climate_" + ClimateType + ".npy", climate)
+      np.save(DirOUT + "/" + "Stn_ids.npy", stnids)
+      np.save(DirOUT + "/" + "Stn_lats.npy", lats)
+      np.save(DirOUT + "/" + "Stn_lons.npy", lons)
 ###############################################################################################################
 
 # Computing the observational climatologies
@@ -122,7 +165,15 @@ for MinDays_Perc in MinDays_Perc_list:
                         os.makedirs(MainDirOUT)
                   
                   # Computing the observational climatologies
-                  compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, MainDirIN, MainDirOUT)
+                  # Note: for the raw STVL observations, the histograms of each year are summed when they exist for all the years in the period, and 
+                  # they were built from the aligned observations currently saved for each year
+                  MainDirIN_UniqueStnids = Git_repo + "/" + DirIN_UniqueStnids + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF)
+                  MainDirIN_Hist = Git_repo + "/" + DirIN_Hist + "_" + str(Acc) + "h"
+                  Hist_available = all([histograms_current(MainDirIN_Hist + "/hist_" + ClimateType + "_" + str(Year) + ".npz", MainDirIN_Hist + "/" + str(Year) + ".npy") for ClimateType in ["Year", "DJF", "MAM", "JJA", "SON"] for Year in range(YearS, YearF+1)])
+                  if Hist_OBS and (NameOBS == "06_AlignedOBS_rawSTVL") and Hist_available and exists(MainDirIN_UniqueStnids):
+                        compute_climate_obs_hist(MinDays_Perc, Perc_year, Perc_season, YearS, YearF, MainDirIN_UniqueStnids, MainDirIN_Hist, MainDirOUT)
+                  else:
+                        compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, MainDirIN, MainDirOUT)
 
             elif NameOBS == "08_AlignedOBS_cleanSTVL":
 
@@ -132,10 +183,10 @@ for MinDays_Perc in MinDays_Perc_list:
                         print("Computing the observational climatologies for "+ NameOBS + " (Coeff_Grid2Point=" + str(Coeff_Grid2Point) + ") with a minimum of " + str(int(MinDays_Perc*100)) + "% of days over the considered period with valid observations to compute the climatologies")
                         
                         # Setting main input/output directories
-                        MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
+                        MainDirIN = Git_repo + "/" + DirIN + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF)
                         MainDirOUT = Git_repo + "/" + DirOUT + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + str(YearS) + "_" + str(YearF) + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
                         if not exists(MainDirOUT):
                               os.makedirs(MainDirOUT)
 
                         # Computing the observational climatologies
-                        compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, MainDirIN, MainDirOUT)
\ No newline at end of file
+                        compute_climate_obs(MinDays_Perc, Perc_year, Perc_season, MainDirIN, MainDirOUT, Coeff_Grid2Point)
\ No newline at end of file
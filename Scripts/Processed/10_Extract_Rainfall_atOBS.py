@@ -4,11 +4,14 @@ from os.path import exists
 from datetime import date, timedelta
 from calendar import monthrange
 import numpy as np
-import metview as mv
+from Functions.grib_decode import read_grib_stations
+from Functions.step_accumulator import accumulate_steps, difference_steps
+from Functions.histograms import histograms_stations, write_histograms
 
 ##########################################################################################################################################
 # CODE DESCRIPTION
 # 10_Extract_Rainfall_atOBS.py extracts rainfall realizations from different forecasting systems, at the location of available point rainfall climatologies on a given year.
+# The histograms of the realizations of each station are also saved, so the modelled climatologies over any period can be computed by summing the histograms of the years it covers.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # Year (number, in YYYY format): year to consider.
@@ -18,6 +21,10 @@ import metview as mv
 # MinDays_Perc_list (list of number, from 0 to 1): list of percentages for the minimum number of days over the considered period with valid observations to compute the climatologies.
 # NameOBS_list (list of strings): list of the names of the observations to quality check.
 # Coeff_Grid2Point_list (list of integer number): list of cosefficients used to make comparable CPC's gridded rainfall values with  STVL's point rainfall observations. Used only when running the quality check on the clean STVL observations.
+# Extract_Shared (boolean): if True, the raw analysis/forecasts are read only once, the rainfall realizations are extracted at the union of the stations over all the 
+#                                         observational configurations, and then split into each configuration. If False, the raw analysis/forecasts are read separately for each configuration.
+# DecodeBackend_dict (dictionary): backend used to decode the grib files of each forecasting system ("metview" or "eccodes"). The systems not in the dictionary are decoded with Metview.
+# Save_Hist (boolean): if True, the histograms of the year/seasonal rainfall realizations of each station are also saved.
 # Git_repo (string): path of local github repository.
 # DirIN_Climate_OBS (string): relative path for the input directory containing the point observational climatologies.
 # DirIN_FC (string): relative path for the input directory containing the raw analysis/forecasts.
@@ -31,6 +38,9 @@ Climate_OBS_Period = "2000_2019"
 MinDays_Perc_list = [0.5,0.75]
 NameOBS_list = ["06_AlignedOBS_rawSTVL", "07_AlignedOBS_gridCPC", "08_AlignedOBS_cleanSTVL"]
 Coeff_Grid2Point_list = [2,5,10,20,50,100]
+Extract_Shared = True
+DecodeBackend_dict = {"ERA5_ShortRange": "eccodes", "ERA5_EDA_ShortRange": "eccodes", "ERA5_LongRange": "eccodes", "ERA5_EDA_LongRange": "eccodes", "ERA5_ecPoint/Grid_BC_VALS": "eccodes", "ERA5_ecPoint/Pt_BC_PERC": "eccodes"}
+Save_Hist = True
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN_Climate_OBS = "Data/Processed/09_Climate_OBS"
 DirIN_FC = "Data/Raw/FC"
@@ -42,7 +52,7 @@ DirOUT_FC = "Data/Processed/10_Rainfall"
 ##############################################
 # Compute independent rainfall realizations from HRES # 
 ##############################################
-def rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       BaseTime = 0
@@ -93,13 +103,11 @@ def rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
 
                   if exists(FileIN_1) and exists(FileIN_2):
                         
-                        # Reading the forecasts for the considered day
-                        tp1 = mv.read(FileIN_1)
-                        tp2 = mv.read(FileIN_2)
-                        tp = (tp2 - tp1) * 1000
+                        # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                        tp = difference_steps(FileIN_1, FileIN_2, stn_lats, stn_lons, DirCache_GP, Backend) * 1000
                         
-                        # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                        tp_obs = np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1)
+                        # Extracting the tp values for the considered day
+                        tp_obs = np.round(np.float16(tp), decimals =1)
 
                         # Populating the variable that contains the independent rainfall realizations for the year climatology
                         tp_year[:, ind_year] = tp_obs
@@ -121,18 +129,13 @@ def rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
                         
             BaseDate += timedelta(days=1)
       
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 ####################################################
 # Compute independent rainfall realizations from Reforecasts  # 
 ####################################################
-def rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       BaseTime = 0
@@ -183,13 +186,11 @@ def rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Di
 
                   if exists(FileIN_1) and exists(FileIN_2):
                         
-                        # Reading the forecasts for the considered day
-                        tp1 = mv.read(FileIN_1)
-                        tp2 = mv.read(FileIN_2)
-                        tp = (tp2 - tp1) * 1000
+                        # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                        tp = difference_steps(FileIN_1, FileIN_2, stn_lats, stn_lons, DirCache_GP, Backend) * 1000
                         
-                        # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                        tp_obs = np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1)
+                        # Extracting the tp values for the considered day
+                        tp_obs = np.round(np.float16(tp), decimals =1)
 
                         # Populating the variable that contains the independent rainfall realizations for the year climatology
                         tp_year[:, ind_year] = tp_obs
@@ -211,18 +212,13 @@ def rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Di
                         
             BaseDate += timedelta(days=1)
       
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 ########################################################
 # Compute independent rainfall realizations from short-range ERA5 # 
 ########################################################
-def rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       NumEM = 1
@@ -264,21 +260,16 @@ def rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT
             BaseTime_1 = BaseDate
             DirIN_temp0 = DirIN + "/" + BaseTime_0.strftime("%Y") + "/" + BaseTime_0.strftime("%Y%m%d") + "18"
             DirIN_temp1 = DirIN + "/" + BaseTime_1.strftime("%Y") + "/" + BaseTime_1.strftime("%Y%m%d") + "06"
-            tp = 0
             
             if exists(DirIN_temp0) and exists(DirIN_temp1): 
                   
                   print("     ", BaseDate) 
-                  for Step in range(7,(12+1)):
-                        FileIN_0 =  DirIN_temp0 + "/tp_" + BaseTime_0.strftime("%Y%m%d") + "_18_" + f'{Step:03d}' + ".grib"
-                        tp = tp + mv.read(FileIN_0)
-                  for Step in range(1,(18+1)):
-                        FileIN_1 =  DirIN_temp1 + "/tp_" + BaseTime_1.strftime("%Y%m%d") + "_06_" + f'{Step:03d}' + ".grib"
-                        tp = tp + mv.read(FileIN_1)
-                  tp = tp *1000
+                  Files = [DirIN_temp0 + "/tp_" + BaseTime_0.strftime("%Y%m%d") + "_18_" + f'{Step:03d}' + ".grib" for Step in range(7,(12+1))]
+                  Files = Files + [DirIN_temp1 + "/tp_" + BaseTime_1.strftime("%Y%m%d") + "_06_" + f'{Step:03d}' + ".grib" for Step in range(1,(18+1))]
 
                   # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                  tp_obs = np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1)
+                  # Note: the hourly steps are summed only at the locations of the stations (each step file is decoded only once).
+                  tp_obs = np.round(np.float16(accumulate_steps(Files, stn_lats, stn_lons, DirCache_GP, Backend) * 1000), decimals =1)
 
                   # Populating the variable that contains the independent rainfall realizations for the year climatology
                   tp_year[:, ind_year] = tp_obs
@@ -300,18 +291,13 @@ def rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT
 
             BaseDate += timedelta(days=1)
 
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 #############################################################
 # Compute independent rainfall realizations from short-range ERA5_EDA  # 
 #############################################################
-def rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       NumEM = 10
@@ -358,21 +344,16 @@ def rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Di
             BaseTime_1 = BaseDate
             DirIN_temp0 = DirIN + "/" + BaseTime_0.strftime("%Y") + "/" + BaseTime_0.strftime("%Y%m%d") + "18"
             DirIN_temp1 = DirIN + "/" + BaseTime_1.strftime("%Y") + "/" + BaseTime_1.strftime("%Y%m%d") + "06"
-            tp = 0
             
             if exists(DirIN_temp0) and exists(DirIN_temp1): 
                   
                   print("     ", BaseDate) 
-                  for Step in range(9, (12+1), 3):
-                        FileIN_0 =  DirIN_temp0 + "/tp_" + BaseTime_0.strftime("%Y%m%d") + "_18_" + f'{Step:03d}' + ".grib"
-                        tp = tp + mv.read(FileIN_0)
-                  for Step in range(3,(18+1),3):
-                        FileIN_1 =  DirIN_temp1 + "/tp_" + BaseTime_1.strftime("%Y%m%d") + "_06_" + f'{Step:03d}' + ".grib"
-                        tp = tp + mv.read(FileIN_1)
-                  tp = tp *1000
+                  Files = [DirIN_temp0 + "/tp_" + BaseTime_0.strftime("%Y%m%d") + "_18_" + f'{Step:03d}' + ".grib" for Step in range(9, (12+1), 3)]
+                  Files = Files + [DirIN_temp1 + "/tp_" + BaseTime_1.strftime("%Y%m%d") + "_06_" + f'{Step:03d}' + ".grib" for Step in range(3,(18+1),3)]
 
                   # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                  tp_obs = np.transpose(np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1))
+                  # Note: the 3-hourly steps are summed only at the locations of the stations (each step file is decoded only once).
+                  tp_obs = np.transpose(np.round(np.float16(accumulate_steps(Files, stn_lats, stn_lons, DirCache_GP, Backend) * 1000), decimals =1))
 
                   # Populating the variable that contains the independent rainfall realizations for the year climatology
                   tp_year[:, ind1_year:ind2_year] = tp_obs
@@ -399,18 +380,13 @@ def rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Di
 
             BaseDate += timedelta(days=1)
 
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 #######################################################
 # Compute independent rainfall realizations from long-range ERA5 # 
 #######################################################
-def rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       BaseTime = 0
@@ -461,13 +437,11 @@ def rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOU
 
                   if exists(FileIN_1) and exists(FileIN_2):
                         
-                        # Reading the forecasts for the considered day
-                        tp1 = mv.read(FileIN_1)
-                        tp2 = mv.read(FileIN_2)
-                        tp = (tp2 - tp1) * 1000
+                        # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                        tp = difference_steps(FileIN_1, FileIN_2, stn_lats, stn_lons, DirCache_GP, Backend) * 1000
                         
-                        # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                        tp_obs = np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1)
+                        # Extracting the tp values for the considered day
+                        tp_obs = np.round(np.float16(tp), decimals =1)
 
                         # Populating the variable that contains the independent rainfall realizations for the year climatology
                         tp_year[:, ind_year] = tp_obs
@@ -489,18 +463,13 @@ def rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOU
                         
             BaseDate += timedelta(days=1)
 
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 ############################################################
 # Compute independent rainfall realizations from long-range ERA5_EDA  # 
 ############################################################
-def rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       BaseTime = 0
@@ -551,13 +520,11 @@ def rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, D
 
                   if exists(FileIN_1) and exists(FileIN_2):
                         
-                        # Reading the forecasts for the considered day
-                        tp1 = mv.read(FileIN_1)
-                        tp2 = mv.read(FileIN_2)
-                        tp = (tp2 - tp1) * 1000
+                        # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                        tp = difference_steps(FileIN_1, FileIN_2, stn_lats, stn_lons, DirCache_GP, Backend) * 1000
                         
-                        # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                        tp_obs = np.round(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals =1)
+                        # Extracting the tp values for the considered day
+                        tp_obs = np.round(np.float16(tp), decimals =1)
 
                         # Populating the variable that contains the independent rainfall realizations for the year climatology
                         tp_year[:, ind_year] = tp_obs
@@ -579,18 +546,13 @@ def rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, D
                         
             BaseDate += timedelta(days=1)
 
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 ############################################################################
 # Compute independent rainfall realizations from ERA5_ecPoint (grid-scale, bias corrected)   # 
 ############################################################################
-def rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       ecPoint_Dataset = DirIN.split("/")[-1]
@@ -633,11 +595,11 @@ def rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, D
 
             if exists(FileIN_temp):
                   
-                  # Reading the forecasts for the considered day
-                  tp = mv.read(FileIN_temp)
+                  # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                  tp = read_grib_stations(FileIN_temp, stn_lats, stn_lons, DirCache_GP, Backend)
                   
-                  # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                  tp_obs = np.around(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals=1)
+                  # Extracting the tp values for the considered day
+                  tp_obs = np.around(np.float16(tp), decimals=1)
 
                   # Populating the variable that contains the independent rainfall realizations for the year climatology
                   tp_year[:, ind_year] = tp_obs
@@ -659,18 +621,13 @@ def rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, D
 
             BaseDate += timedelta(days=1)
 
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
 
 #############################################################################
 # Compute independent rainfall realizations from ERA5_ecPoint (point-scale, bias corrected)   # 
 #############################################################################
-def rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, DirOUT):
+def rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend):
 
       # Specific parameters for the considered forecasting system
       ecPoint_Dataset = DirIN.split("/")[-1]
@@ -718,11 +675,11 @@ def rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons,
 
             if exists(FileIN_temp):
                   
-                  # Reading the forecasts for the considered day
-                  tp = mv.read(FileIN_temp)
+                  # Reading the forecasts for the considered day at the locations where point observational climatologies were computed
+                  tp = read_grib_stations(FileIN_temp, stn_lats, stn_lons, DirCache_GP, Backend)
                   
-                  # Extracting the tp values for the considered day at the locations where point observational climatologies were computed
-                  tp_obs = np.transpose(np.around(np.float16(mv.nearest_gridpoint(tp, stn_lats, stn_lons)), decimals=1))
+                  # Extracting the tp values for the considered day
+                  tp_obs = np.transpose(np.around(np.float16(tp), decimals=1))
 
                   # Populating the variable that contains the independent rainfall realizations for the year climatology
                   tp_year[:, ind1_year:ind2_year] = tp_obs
@@ -749,93 +706,124 @@ def rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons,
 
             BaseDate += timedelta(days=1)
  
-      # Saving the year/seasonal climatologies and their correspondent metadata
-      print(" - Saving the year/seasonal rainfall realizations")
-      np.save(DirOUT + "/tp_Year_" + str(Year) + ".npy", tp_year)
-      np.save(DirOUT + "/tp_DJF_" + str(Year) + ".npy", tp_DJF)
-      np.save(DirOUT + "/tp_MAM_" + str(Year) + ".npy", tp_MAM)
-      np.save(DirOUT + "/tp_JJA_" + str(Year) + ".npy", tp_JJA)
-      np.save(DirOUT + "/tp_SON_" + str(Year) + ".npy", tp_SON)
+      # Returning the year/seasonal rainfall realizations
+      return {"Year": tp_year, "DJF": tp_DJF, "MAM": tp_MAM, "JJA": tp_JJA, "SON": tp_SON}
+
+##########################################################################
+# Compute independent rainfall realizations for a given forecasting system # 
+##########################################################################
+def rainfall(SystemFC, BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN):
+
+      # Note: the grib files are decoded with the backend set for the considered forecasting system in DecodeBackend_dict (Metview by default)
+      Backend = DecodeBackend_dict.get(SystemFC, "metview")
+
+      if SystemFC == "HRES_46r1":
+            tp = rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "Reforecasts_46r1":
+            tp = rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_ShortRange":
+            tp = rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_EDA_ShortRange":
+            tp = rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_LongRange":
+            tp = rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_EDA_LongRange":
+            tp = rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_ecPoint/Grid_BC_VALS":
+            tp = rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend)
+      elif SystemFC == "ERA5_ecPoint/Pt_BC_PERC":
+            tp = rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons, DirIN, Backend)
+      return tp
+
+##########################################################
+# Save the year/seasonal independent rainfall realizations # 
+##########################################################
+def save_rainfall(Year, tp, ind_stns, DirOUT, SaveHist=False):
+
+      # Note: ind_stns indicates the rows (i.e. the stations) of the extracted realizations to save in the considered output directory.
+      # If SaveHist is True, the histograms of the realizations of each station are saved as well (hist_<Dataset>_<Year>.npz), together with the
+      # signature of the file with the realizations, so they are not used once such file is saved again (e.g. without the histograms).
+      if not exists(DirOUT):
+            os.makedirs(DirOUT)
+      for Dataset in ["Year", "DJF", "MAM", "JJA", "SON"]:
+            tp_stns = tp[Dataset][ind_stns,:]
+            FileOUT = DirOUT + "/tp_" + Dataset + "_" + str(Year) + ".npy"
+            np.save(FileOUT, tp_stns)
+            if SaveHist:
+                  write_histograms(DirOUT + "/hist_" + Dataset + "_" + str(Year) + ".npz", histograms_stations(tp_stns), FileSource=FileOUT)
 
 #############################################################################################################################################
 
+# Setting the directory containing the cache of the indices of the nearest grid-points to the stations
+DirCache_GP = Git_repo + "/" + DirOUT_FC + "/NearestGP"
+
 # Defining the dates for the given year
 BaseDateS = date(Year,1,1)
 BaseDateF = date(Year,12,31)
 
-# Extracting the rainfall realizations
+# Defining the observational configurations (i.e. where the point observational climatologies were computed) for which to extract the rainfall realizations
+Config_list = []
 for MinDays_Perc in MinDays_Perc_list:
-
       for NameOBS in NameOBS_list:
-
             if (NameOBS == "06_AlignedOBS_rawSTVL") or (NameOBS == "07_AlignedOBS_gridCPC"):
+                  Config_temp = "MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
+                  Config_list.append(Config_temp)
+            elif NameOBS == "08_AlignedOBS_cleanSTVL":
+                  for Coeff_Grid2Point in Coeff_Grid2Point_list:
+                        Config_temp = "MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
+                        Config_list.append(Config_temp)
 
-                  # Reading where the point observational climatologies were computed (i.e. stations lat/lon) 
-                  MainDirIN_Climate_OBS = Git_repo + "/" + DirIN_Climate_OBS + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
-                  stn_lats = np.load(MainDirIN_Climate_OBS + "/Stn_lats.npy")
-                  stn_lons = np.load(MainDirIN_Climate_OBS + "/Stn_lons.npy")
-                  
-                  for SystemFC in SystemFC_list:
-                        
-                        print(" ")
-                        print("Computing modelled (" + SystemFC + ") climatologies at stations for "+ NameOBS + " with a minimum of " + str(int(MinDays_Perc*100)) + "% of days over the considered period with valid observations")
-
-                        # Computing the independent rainfall realizations for the considering forecasting system
-                        MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC
-                        MainDirOUT_FC = Git_repo + "/" + DirOUT_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
-                        if not exists(MainDirOUT_FC):
-                                    os.makedirs(MainDirOUT_FC)
-
-                        if SystemFC == "HRES_46r1":
-                              rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "Reforecasts_46r1":
-                              rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_ShortRange":
-                              rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_EDA_ShortRange":
-                              rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_LongRange":
-                              rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_EDA_LongRange":
-                              rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_ecPoint/Grid_BC_VALS":
-                              rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                        elif SystemFC == "ERA5_ecPoint/Pt_BC_PERC":
-                              rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
+# Reading where the point observational climatologies were computed (i.e. stations lat/lon) 
+stn_lats_list = []
+stn_lons_list = []
+for Config in Config_list:
+      MainDirIN_Climate_OBS = Git_repo + "/" + DirIN_Climate_OBS + "/" + Config
+      stn_lats_list.append(np.load(MainDirIN_Climate_OBS + "/Stn_lats.npy"))
+      stn_lons_list.append(np.load(MainDirIN_Climate_OBS + "/Stn_lons.npy"))
 
-            elif NameOBS == "08_AlignedOBS_cleanSTVL":
+# Extracting the rainfall realizations
+if Extract_Shared:
+
+      # Defining the union of the locations over all the observational configurations, and the index of each configuration's station in such union
+      stn_coords = np.unique(np.column_stack((np.concatenate(stn_lats_list), np.concatenate(stn_lons_list))), axis=0, return_inverse=True)
+      stn_lats_union = stn_coords[0][:,0]
+      stn_lons_union = stn_coords[0][:,1]
+      ind_union = np.ravel(stn_coords[1])
+      ind_stns_list = []
+      ind_start = 0
+      for stn_lats in stn_lats_list:
+            ind_stns_list.append(ind_union[ind_start:ind_start+len(stn_lats)])
+            ind_start += len(stn_lats)
+
+      for SystemFC in SystemFC_list:
+
+            print(" ")
+            print("Extracting modelled (" + SystemFC + ") rainfall realizations at the union of the stations over all the observational configurations (" + str(len(stn_lats_union)) + " locations)")
+            
+            # Computing the independent rainfall realizations for the considering forecasting system, reading the raw forecasts only once
+            MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC
+            tp = rainfall(SystemFC, BaseDateS, BaseDateF, Acc, stn_lats_union, stn_lons_union, MainDirIN_FC)
 
-                  for Coeff_Grid2Point in Coeff_Grid2Point_list:
-                        
-                        # Reading where the point observational climatologies were computed (i.e. stations lat/lon) 
-                        MainDirIN_Climate_OBS = Git_repo + "/" + DirIN_Climate_OBS + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
-                        stn_lats = np.load(MainDirIN_Climate_OBS + "/Stn_lats.npy")
-                        stn_lons = np.load(MainDirIN_Climate_OBS + "/Stn_lons.npy")
-                        
-                        for SystemFC in SystemFC_list:
-                              
-                              print(" ")
-                              print("Computing modelled (" + SystemFC + ") climatologies at stations for "+ NameOBS + " (Coeff_Grid2Point=" + str(Coeff_Grid2Point) + ") with a minimum of " + str(int(MinDays_Perc*100)) + "% of days over the considered period with valid observations")
-
-                              # Computing the independent rainfall realizations for the considering forecasting system
-                              MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC
-                              MainDirOUT_FC = Git_repo + "/" + DirOUT_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
-                              if not exists(MainDirOUT_FC):
-                                    os.makedirs(MainDirOUT_FC)
-                              
-                              if SystemFC == "HRES_46r1":
-                                    rainfall_HRES(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "Reforecasts_46r1":
-                                    rainfall_REFORECAST(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_ShortRange":
-                                    rainfall_24h_ERA5_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_EDA_ShortRange":
-                                    rainfall_24h_ERA5_EDA_SR(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_LongRange":
-                                    rainfall_ERA5_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_EDA_LongRange":
-                                    rainfall_ERA5_EDA_LR(BaseDateS, BaseDateF, Acc, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_ecPoint/Grid_BC_VALS":
-                                    rainfall_24h_ERA5_ecPoint_gridBC(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
-                              elif SystemFC == "ERA5_ecPoint/Pt_BC_PERC":
-                                    rainfall_24h_ERA5_ecPoint_pointBC(BaseDateS, BaseDateF, stn_lats, stn_lons, MainDirIN_FC, MainDirOUT_FC)
\ No newline at end of file
+            # Saving the independent rainfall realizations for each observational configuration
+            print(" - Saving the year/seasonal rainfall realizations for each observational configuration")
+            for ind_Config in range(len(Config_list)):
+                  MainDirOUT_FC = Git_repo + "/" + DirOUT_FC + "/" + SystemFC + "/" + Config_list[ind_Config]
+                  save_rainfall(Year, tp, ind_stns_list[ind_Config], MainDirOUT_FC, Save_Hist)
+
+else:
+
+      for ind_Config in range(len(Config_list)):
+
+            for SystemFC in SystemFC_list:
+                  
+                  print(" ")
+                  print("Extracting modelled (" + SystemFC + ") rainfall realizations at stations for " + Config_list[ind_Config])
+
+                  # Computing the independent rainfall realizations for the considering forecasting system
+                  MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC
+                  MainDirOUT_FC = Git_repo + "/" + DirOUT_FC + "/" + SystemFC + "/" + Config_list[ind_Config]
+                  tp = rainfall(SystemFC, BaseDateS, BaseDateF, Acc, stn_lats_list[ind_Config], stn_lons_list[ind_Config], MainDirIN_FC)
+                  
+                  # Saving the independent rainfall realizations
+                  print(" - Saving the year/seasonal rainfall realizations")
+                  save_rainfall(Year, tp, slice(None), MainDirOUT_FC, Save_Hist)
\ No newline at end of file
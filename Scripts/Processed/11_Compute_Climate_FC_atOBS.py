@@ -1,12 +1,16 @@
 import os
 from os.path import exists
 import numpy as np
+from Functions.percentiles import percentiles_stations, percentiles_system
+from Functions.histograms import read_histograms, merge_histograms, percentiles_histograms, histograms_current
 
 ######################################################################################################################################################
 # CODE DESCRIPTION
 # 11_Compute_Climate_FC_atOBS.py computes rainfall climatologies from different forecasting systems, at the location of available point rainfall climatologies over a given period.
 # The climatologies are computed in the form of a distribution of percentiles (using the method of linear interpolation), with the highest percentiles computed on the basis of how many realizations are provided by 
 # the modelled analysis/forecasts. Separate climatologies are computed for year and seasonal (i.e. DJF, MAM, JJA, SON) climatologies. 
+# When the histograms of the realizations of each year (saved in stage 10) are available, the climatologies are computed by summing them, so a period can be extended 
+# (or changed) without reading again the realizations. The results are the same as the ones computed from the realizations.
 
 # DESCRIPTION OF INPUT PARAMETERS
 # YearS (number, in YYYY format): start year to consider.
@@ -17,6 +21,9 @@ import numpy as np
 # MinDays_Perc_list (list of number, from 0 to 1): list of percentages for the minimum number of days over the considered period with valid observations to compute the climatologies.
 # NameOBS_list (list of strings): list of the names of the observations to quality check
 # Coeff_Grid2Point_list (list of integer number): list of cosefficients used to make comparable CPC's gridded rainfall values with  STVL's point rainfall observations. Used only when running the quality check on the clean STVL observations.
+# MaxMemory_GB (number, in GB): approximate maximum memory used to compute the percentiles for each block of stations.
+# PercMethod (string): method used to compute the percentiles ("sort" to sort the realizations of each station, or "counts" to count the realizations rounded to 0.1 mm). Both methods give the same results.
+# Hist_FC (boolean): if True, the percentiles are computed from the histograms of the realizations of each year in the period (when they exist for all years, and were built from the realizations currently saved).
 # Git_repo (string): path of local github repository.
 # DirIN_Climate_OBS (string): relative path for the input directory containing the observational climatologies.
 # DirIN_FC (string): relative path for the input directory containing the raw analysis/forecasts.
@@ -31,6 +38,9 @@ Climate_OBS_Period = "2000_2019"
 MinDays_Perc_list = [0.5,0.75]
 NameOBS_list = ["06_AlignedOBS_rawSTVL", "07_AlignedOBS_gridCPC", "08_AlignedOBS_cleanSTVL"]
 Coeff_Grid2Point_list = [2,5,10,20,50,100]
+MaxMemory_GB = 4
+PercMethod = "counts"
+Hist_FC = True
 Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
 DirIN_Climate_OBS = "Data/Processed/09_Climate_OBS"
 DirIN_FC = "Data/Processed/10_Rainfall"
@@ -42,37 +52,44 @@ DirOUT_Climate_FC = "Data/Processed/11_Climate_FC"
 ########################################
 # Compute and save distribution of percentiles  # 
 ########################################
-def distribution_percentiles(YearS, YearF, PercYear, PercSeason, DirIN_FC, DirOUT_Climate_FC):
+def distribution_percentiles(YearS, YearF, PercYear, PercSeason, MaxMemory_GB, PercMethod, Hist_FC, DirIN_FC, DirOUT_Climate_FC):
       
       Dataset_list = ["Year", "DJF", "MAM", "JJA", "SON"]
       
       for Dataset in Dataset_list:
             
             print(" - Computing percentiles for " + Dataset)
+            FileHist = lambda Year: DirIN_FC + "/hist_" + Dataset + "_" + str(Year) + ".npz"
+            FileTP = lambda Year: DirIN_FC + "/tp_" + Dataset + "_" + str(Year) + ".npy"
+            UseHist = Hist_FC and all([histograms_current(FileHist(Year), FileTP(Year)) for Year in range(YearS,YearF+1)])
             
-            # Reading the indipendent rainfall realizations for the period under consideration
-            print("     - Reading the indipendent rainfall realizations for year: " + str(YearS))
-            tp = np.load(DirIN_FC + "/tp_" + Dataset + "_" + str(YearS) + ".npy")
-            for Year in range (YearS+1,YearF+1):
+            # Reading the indipendent rainfall realizations (or their histograms) for the period under consideration
+            # Note: the realizations are memory-mapped, so only the stations being processed are read into memory when computing the percentiles
+            tp = []
+            hist_list = []
+            for Year in range (YearS,YearF+1):
+                  if UseHist:
+                        print("     - Reading the histograms of the indipendent rainfall realizations for year: " + str(Year))
+                        hist_list.append(read_histograms(FileHist(Year)))
+                  else:
                         print("     - Reading the indipendent rainfall realizations for year: " + str(Year))
-                        tp_raw = np.hstack((tp, np.load(DirIN_FC + "/tp_" + Dataset + "_" + str(Year) + ".npy")))
-
-            # Adjusting the dataset to not have the minimum and the maximum values in "align_obs" assigned to the 0th and 100th percentile
-            # Note: If the whole dataset for a station contains only nan, a warning message will appear on the screen, and the minimum or maximum
-            # value that will be associated to that station will be a nan. This issue does not stop the computations or compromise the results. This 
-            # happens mainly for the CPC dataset where a point station on the coast my be seen by CPC in the sea where there is no data available.
-            print("     - Adjusting the dataset to not have the minimum and the maximum values in the observational dataset assigned to the 0th and 100th percentile...")
-            min_tp = np.nanmin(tp_raw, axis=1)
-            max_tp = np.nanmax(tp_raw, axis=1)
-            tp = np.column_stack((min_tp, tp_raw, max_tp))
+                        tp.append(np.load(FileTP(Year), mmap_mode="r"))
 
             # Computing the percentiles for the year/seasonal climatologies
+            # Note: the minimum and the maximum values for each station are added to the realizations to not have them assigned to the 0th and 100th percentile.
+            # If the whole dataset for a station contains only nan, the percentiles associated to that station will be nan. This issue does not stop the 
+            # computations or compromise the results. This happens mainly for the CPC dataset where a point station on the coast my be seen by CPC in the sea 
+            # where there is no data available.
             print("     - Computing the percentiles for the year/seasonal climatologies")
             if Dataset == "Year":
                   Perc = PercYear
             else:
                   Perc = PercSeason
-            climate = np.transpose(np.around(np.float32(np.nanpercentile(tp, Perc, axis=1, interpolation="linear").astype(float)), decimals=1))
+            if UseHist:
+                  climate = percentiles_histograms(merge_histograms(hist_list), Perc, AddMinMax=True)
+            else:
+                  climate = percentiles_stations(tp, Perc, AddMinMax=True, MaxMemory_GB=MaxMemory_GB, Method=PercMethod)
+            climate = np.transpose(np.around(np.float32(climate.astype(float)), decimals=1))
 
             # Saving the year/seasonal climatologies and their correspondent metadata
             print("     - Saving the year/seasonal climatologies and their correspondent metadata")
@@ -97,37 +114,14 @@ for MinDays_Perc in MinDays_Perc_list:
                         print("Computing modelled (" + SystemFC + ") climatologies at stations for "+ NameOBS + " with a minimum of " + str(int(MinDays_Perc*100)) + "% of days over the considered period with valid observations")
 
                         # Definition of the percentiles to compute for different forecasting system
-                        if SystemFC == "HRES_46r1":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8])])
-                        elif SystemFC == "Reforecasts_46r1":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                        elif SystemFC == "ERA5_ShortRange":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9])])
-                        elif SystemFC == "ERA5_EDA_ShortRange":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                        elif SystemFC == "ERA5_LongRange":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                        elif SystemFC == "ERA5_EDA_LongRange":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                        elif SystemFC == "ERA5_ecPoint/Grid_BC_VALS":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9])])
-                        elif SystemFC == "ERA5_ecPoint/Pt_BC_PERC":
-                              PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999, 99.9995, 99.9998])])
-                              PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999])])
+                        PercYear, PercSeason = percentiles_system(SystemFC)
 
                         # Computing and saving the modelled rainfall climatologies (i.e. the distribution of percentiles computed from the independent rainfall realizations)
                         MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
                         MainDirOUT_Climate_FC = Git_repo + "/" + DirOUT_Climate_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
                         if not exists(MainDirOUT_Climate_FC):
                               os.makedirs(MainDirOUT_Climate_FC)
-                        distribution_percentiles(YearS, YearF, PercYear, PercSeason, MainDirIN_FC, MainDirOUT_Climate_FC)
+                        distribution_percentiles(YearS, YearF, PercYear, PercSeason, MaxMemory_GB, PercMethod, Hist_FC, MainDirIN_FC, MainDirOUT_Climate_FC)
 
                        # Reading and saving the metadata (i.e. station id/lat/lon) for the considered point observational climatologies
                         MainDirIN_Climate_OBS = Git_repo + "/" + DirIN_Climate_OBS + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period
@@ -148,37 +142,14 @@ for MinDays_Perc in MinDays_Perc_list:
                               print("Computing modelled (" + SystemFC + ") climatologies at stations for "+ NameOBS + " (Coeff_Grid2Point=" + str(Coeff_Grid2Point) + ") with a minimum of " + str(int(MinDays_Perc*100)) + "% of days over the considered period with valid observations")
 
                               # Definition of the percentiles to compute for different forecasting system
-                              if SystemFC == "HRES_46r1":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8])])
-                              elif SystemFC == "Reforecasts_46r1":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                              elif SystemFC == "ERA5_ShortRange":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9])])
-                              elif SystemFC == "ERA5_EDA_ShortRange":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                              elif SystemFC == "ERA5_LongRange":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                              elif SystemFC == "ERA5_EDA_LongRange":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99])])
-                              elif SystemFC == "ERA5_ecPoint/Grid_BC_VALS":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9])])
-                              elif SystemFC == "ERA5_ecPoint/Pt_BC_PERC":
-                                    PercYear = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999, 99.9995, 99.9998])])
-                                    PercSeason = np.concatenate([np.arange(0,100), np.array([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999])])
+                              PercYear, PercSeason = percentiles_system(SystemFC)
 
                               # Computing and saving the modelled rainfall climatologies (i.e. the distribution of percentiles computed from the independent rainfall realizations)
                               MainDirIN_FC = Git_repo + "/" + DirIN_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
                               MainDirOUT_Climate_FC = Git_repo + "/" + DirOUT_Climate_FC + "/" + SystemFC + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
                               if not exists(MainDirOUT_Climate_FC):
                                     os.makedirs(MainDirOUT_Climate_FC)
-                              distribution_percentiles(YearS, YearF, PercYear, PercSeason, MainDirIN_FC, MainDirOUT_Climate_FC)
+                              distribution_percentiles(YearS, YearF, PercYear, PercSeason, MaxMemory_GB, PercMethod, Hist_FC, MainDirIN_FC, MainDirOUT_Climate_FC)
 
                               # Reading and saving the metadata (i.e. station id/lat/lon) for the considered point observational climatologies
                               MainDirIN_Climate_OBS = Git_repo + "/" + DirIN_Climate_OBS + "/MinDays_Perc" + str(int(MinDays_Perc*100)) + "/" + NameOBS + "_" + str(Acc) + "h_" + Climate_OBS_Period + "/Coeff_Grid2Point_" + str(Coeff_Grid2Point)
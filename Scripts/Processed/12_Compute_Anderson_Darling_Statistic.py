@@ -1,7 +1,7 @@
 import os
 from os.path import exists
 import numpy as np
-from scipy.stats import anderson_ksamp
+from Functions.anderson_darling import anderson_ksamp_stations
 
 ################################################################################################################################
 # CODE DESCRIPTION
@@ -58,9 +58,6 @@ def statisticAD(DirIN_OBS, DirIN_FC, DirOUT):
             # Reading the climatologies and their locations
             climate_obs = np.load(DirIN_OBS + "/Climate_" + Dataset + ".npy")
             climate_fc = np.load(DirIN_FC + "/Climate_" + Dataset + ".npy")
-            print(climate_obs.shape)
-            print(climate_fc.shape)
-            gfhfhfgh
 
             lats = np.load(DirIN_OBS + "/Stn_lats.npy")
             lons = np.load(DirIN_OBS + "/Stn_lons.npy")
@@ -68,16 +65,13 @@ def statisticAD(DirIN_OBS, DirIN_FC, DirOUT):
             num_perc = climate_obs.shape[1]
             climate_fc = climate_fc[:,0:num_perc] # to match the number of percentiles between the observational and modelled climatologies
             
-            # Computing the Anderson-Darling statistic for k-samples
+            # Computing the Anderson-Darling statistic for k-samples (for all stations at once)
             StatisticAD = np.empty([num_stn,1]) * np.nan
             CriticalVal = np.empty([num_stn,1]) * np.nan
-            for ind_stn in range(num_stn):
-                  climate_obs_temp = climate_obs[ind_stn,:]
-                  climate_fc_temp = climate_fc[ind_stn,:]
-                  if np.sum(climate_obs_temp) != 0 and np.sum(climate_fc_temp) != 0:
-                        TestAD = anderson_ksamp([climate_obs_temp, climate_fc_temp])
-                        StatisticAD[ind_stn] = TestAD[0]
-                        CriticalVal[ind_stn] = TestAD[1][-1] # for significance level 0.1%.
+            ind_stns = np.where((np.sum(climate_obs, axis=1) != 0) & (np.sum(climate_fc, axis=1) != 0))[0]
+            TestAD = anderson_ksamp_stations([climate_obs[ind_stns,:], climate_fc[ind_stns,:]])
+            StatisticAD[ind_stns,0] = TestAD[0]
+            CriticalVal[ind_stns,0] = TestAD[1][-1] # for significance level 0.1%.
 
             # Saving the Anderson-Darling statistic for k-samples
             np.save(DirOUT + "/StatisticAD_" + Dataset + ".npy", StatisticAD)
@@ -0,0 +1,81 @@
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# align_obs.py contains the functions to align daily rainfall observations onto a fixed list of unique stations.
+# The station-id index is built only once (as a sorted array searched with "searchsorted"), and the observations for 
+# a given day are assigned to the aligned matrix in one vectorized step, instead of scanning the whole list of unique 
+# stations for every single observation.
+#######################################################################################################################
+
+
+############################################
+# Build the index for the unique station ids #
+############################################
+def build_stnids_index(stnids_unique):
+
+      # Sorting the unique station ids once, keeping track of the rows they correspond to in the aligned matrix
+      stnids_unique = np.asarray(stnids_unique)
+      ind_sort = np.argsort(stnids_unique, kind="stable")
+      stnids_sorted = stnids_unique[ind_sort]
+      return stnids_sorted, ind_sort
+
+
+#######################################################
+# Find the rows of the aligned matrix for given station ids #
+#######################################################
+def find_stnids(stnids, stnids_sorted, ind_sort):
+
+      # Locating the station ids in the sorted unique station ids. Ids not present in the unique station ids are flagged as not found.
+      stnids = np.asarray(stnids)
+      if stnids_sorted.size == 0:
+            return np.zeros(stnids.shape, dtype=int), np.zeros(stnids.shape, dtype=bool)
+      pos = np.searchsorted(stnids_sorted, stnids)
+      pos = np.minimum(pos, stnids_sorted.size - 1)
+      found = (stnids_sorted[pos] == stnids)
+      ind_rows = ind_sort[pos]
+      return ind_rows, found
+
+
+###########################################################
+# Assign the observations of a given day to the aligned matrix #
+###########################################################
+def align_obs_day(aligned_obs, ind_day, stnids_day, obs_day, stnids_sorted, ind_sort):
+
+      # Assigning all the observations that correspond to a unique station in one vectorized step
+      # Note: the stations that cannot be matched are returned (instead of stopping the computations) so they can be reported.
+      obs_day = np.asarray(obs_day)
+      ind_rows, found = find_stnids(stnids_day, stnids_sorted, ind_sort)
+      aligned_obs[ind_rows[found], ind_day] = obs_day[found]
+      stnids_missing = np.asarray(stnids_day)[~found]
+      return stnids_missing
+
+
+#######################################################
+# Create the aligned matrix for a given list of days #
+#######################################################
+def align_obs(stnids_unique, NumDays, read_day, aligned_obs=None):
+
+      # Notes:
+      # read_day is a function that, given the index of the day to consider (from 0 to NumDays-1), returns the tuple (stnids_day, obs_day) 
+      # with the ids of the stations and the observations for that day. It returns None when there are no observations for that day.
+      # The aligned matrix has dimensions (NumStns, NumDays) and it is initialized with NaNs, so there won't be any need to deal with
+      # stations with no observations on a given day. A preallocated aligned matrix (e.g. a memory-mapped array already initialized 
+      # with NaNs) can be passed with aligned_obs, and it is then filled in place.
+
+      stnids_sorted, ind_sort = build_stnids_index(stnids_unique)
+      NumStns = stnids_sorted.size
+      if aligned_obs is None:
+            aligned_obs = np.empty((NumStns,NumDays,)) * np.nan
+
+      stnids_missing = {}
+      for ind_day in range(NumDays):
+            day = read_day(ind_day)
+            if day is None:
+                  continue
+            stnids_day, obs_day = day
+            stnids_missing_day = align_obs_day(aligned_obs, ind_day, stnids_day, obs_day, stnids_sorted, ind_sort)
+            if stnids_missing_day.size != 0:
+                  stnids_missing[ind_day] = stnids_missing_day
+
+      return aligned_obs, stnids_missing
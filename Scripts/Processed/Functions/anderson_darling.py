@@ -0,0 +1,109 @@
+import math
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# anderson_darling.py contains the functions to compute the Anderson-Darling statistic for k-samples (midrank version, as in 
+# scipy.stats.anderson_ksamp) for all the stations at once. The statistic is computed on arrays with dimensions 
+# (stations x values), and the normalization of the statistic and the critical values are computed only once for 
+# each combination of sample sizes, since they do not depend on the values of the samples.
+#######################################################################################################################
+
+# Interpolation coefficients from Table 2 of Scholz and Stephens (1987), as in scipy.stats.anderson_ksamp
+b0 = np.array([0.675, 1.281, 1.645, 1.96, 2.326, 2.573, 3.085])
+b1 = np.array([-0.245, 0.25, 0.678, 1.149, 1.822, 2.364, 3.615])
+b2 = np.array([-0.105, -0.305, -0.362, -0.391, -0.396, -0.345, -0.154])
+SignificanceLevels = np.array([0.25, 0.1, 0.05, 0.025, 0.01, 0.005, 0.001])
+
+# Normalization parameters already computed in the current run, for each combination of sample sizes
+SigmaSq_memory = {}
+
+
+##################################################################################
+# Compute the variance of the statistic and the critical values for given sample sizes #
+##################################################################################
+def sigmasq_critical_ksamp(n):
+
+      # Note: n (tuple of integers) contains the size of each of the k samples.
+      n = tuple(int(ni) for ni in n)
+      if n in SigmaSq_memory:
+            return SigmaSq_memory[n]
+
+      k = len(n)
+      n_array = np.array(n)
+      N = n_array.sum()
+      H = (1. / n_array).sum()
+      hs_cs = (1. / np.arange(N - 1, 1, -1)).cumsum()
+      h = hs_cs[-1] + 1
+      g = (hs_cs / np.arange(2, N)).sum()
+
+      a = (4*g - 6) * (k - 1) + (10 - 6*g)*H
+      b = (2*g - 4)*k**2 + 8*h*k + (2*g - 14*h - 4)*H - 8*h + 4*g - 6
+      c = (6*h + 2*g - 2)*k**2 + (4*h - 4*g + 6)*k + (2*h - 6)*H + 4*h
+      d = (2*h + 6)*k**2 - 4*h*k
+      sigmasq = (a*N**3 + b*N**2 + c*N + d) / ((N - 1.) * (N - 2.) * (N - 3.))
+      m = k - 1
+      critical = b0 + b1 / math.sqrt(m) + b2 / m
+
+      SigmaSq_memory[n] = (sigmasq, critical)
+      return sigmasq, critical
+
+
+######################################################################
+# Compute the Anderson-Darling statistic for k-samples for all stations #
+######################################################################
+def anderson_ksamp_stations(samples):
+
+      # Notes:
+      # samples (list of k 2-d arrays, stations x values) contains the k samples to compare for each station. All arrays must have the same 
+      # number of stations (rows), while the number of values (columns) can be different for each sample.
+      # The function returns the standardized Anderson-Darling statistic for each station (as the statistic returned by scipy.stats.anderson_ksamp) 
+      # and the critical values for the significance levels 25%, 10%, 5%, 2.5%, 1%, 0.5%, 0.1%.
+      # Stations with NaNs, or with less than two distinct values over all the samples, get a NaN statistic (scipy.stats.anderson_ksamp 
+      # cannot be computed for them).
+
+      k = len(samples)
+      samples = [np.asarray(s, dtype=np.float64) for s in samples]
+      n = np.array([s.shape[1] for s in samples])
+      N = n.sum()
+      NumStns = samples[0].shape[0]
+      sigmasq, critical = sigmasq_critical_ksamp(n)
+
+      # Sorting the pooled samples for each station, keeping track of the sample each value belongs to
+      Z = np.concatenate(samples, axis=1)
+      labels = np.concatenate([np.full(n[i], i) for i in range(k)])
+      ind_sort = np.argsort(Z, axis=1, kind="stable")
+      Z = np.take_along_axis(Z, ind_sort, axis=1)
+      labels = labels[ind_sort]
+
+      # Defining the runs of equal values (i.e. the distinct values in the pooled samples)
+      # Note: for each distinct value, lj is the number of times it appears in the pooled samples and Bj is the midrank of the value. 
+      pos = np.broadcast_to(np.arange(N), Z.shape)
+      run_start = np.ones(Z.shape, dtype=bool)
+      run_start[:, 1:] = (Z[:, 1:] != Z[:, :-1])
+      run_end = np.ones(Z.shape, dtype=bool)
+      run_end[:, :-1] = run_start[:, 1:]
+      left = np.maximum.accumulate(np.where(run_start, pos, 0), axis=1)
+      lj = pos - left + 1
+      Bj = left + lj / 2.
+
+      # Computing the statistic (summing only over the last position of each run, i.e. once for each distinct value)
+      A2kN = np.zeros(NumStns)
+      for i in range(k):
+            in_sample = (labels == i)
+            cum_right = np.cumsum(in_sample, axis=1)
+            cum_left = np.take_along_axis(cum_right - in_sample, left, axis=1)
+            fij = cum_right - cum_left
+            Mij = cum_right - fij / 2.
+            with np.errstate(divide="ignore", invalid="ignore"):
+                  inner = lj / float(N) * (N*Mij - Bj*n[i])**2 / (Bj*(N - Bj) - N*lj/4.)
+            A2kN += np.sum(np.where(run_end, inner, 0), axis=1) / n[i]
+      A2kN *= (N - 1.) / N
+      StatisticAD = (A2kN - (k - 1)) / math.sqrt(sigmasq)
+
+      # Excluding the stations for which the statistic cannot be computed
+      NumDistinct = np.sum(run_start, axis=1)
+      invalid = np.any(np.isnan(Z), axis=1) | (NumDistinct < 2)
+      StatisticAD[invalid] = np.nan
+
+      return StatisticAD, critical
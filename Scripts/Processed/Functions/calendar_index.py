@@ -0,0 +1,70 @@
+import hashlib
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# calendar_index.py contains the functions to select the year or the seasonal subsets (DJF, MAM, JJA, SON) of an array of
+# dates in the format YYYYMMDD (e.g. the "dates.npy" files of the aligned observations). The dates are parsed only once
+# into integer years/months/days-of-the-year, and the season masks and column indices are stored in memory so that they
+# can be re-used for every configuration that shares the same dates.
+#######################################################################################################################
+
+# Months in each season
+Season_Months = {
+      "DJF": (12, 1, 2),
+      "MAM": (3, 4, 5),
+      "JJA": (6, 7, 8),
+      "SON": (9, 10, 11)
+      }
+
+# Calendars and season indices already computed in the current run
+Calendar_memory = {}
+SeasonIndex_memory = {}
+
+
+#################################
+# Parse the dates (in YYYYMMDD) #
+#################################
+def parse_dates(dates):
+
+      # Notes:
+      # The dates are identified by the hash of their content, so the same array of dates read from different files is parsed only once.
+      dates = np.asarray(dates)
+      DatesID = hashlib.sha1(dates.astype("U8").tobytes()).hexdigest()
+      if DatesID not in Calendar_memory:
+            dates_int = dates.astype(np.int64)
+            year = dates_int // 10000
+            month = (dates_int // 100) % 100
+            day = dates_int % 100
+            first_day_year = (year - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+            days = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month - 1).astype("timedelta64[M]")
+            days = days.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+            doy = (days - first_day_year).astype(np.int64) + 1
+            Calendar_memory[DatesID] = {"ID": DatesID, "Year": year, "Month": month, "Day": day, "DayOfYear": doy}
+      return Calendar_memory[DatesID]
+
+
+#################################################################
+# Boolean mask and column indices of the dates in a year/season #
+#################################################################
+def season_subset(dates, ClimateType):
+
+      # Notes:
+      # ClimateType can be "Year" (all dates), "DJF", "MAM", "JJA" or "SON".
+      calendar = parse_dates(dates)
+      key = (calendar["ID"], ClimateType)
+      if key not in SeasonIndex_memory:
+            if ClimateType == "Year":
+                  mask = np.ones(len(calendar["Month"]), dtype=bool)
+            else:
+                  mask = np.isin(calendar["Month"], Season_Months[ClimateType])
+            SeasonIndex_memory[key] = (mask, np.where(mask)[0])
+      return SeasonIndex_memory[key]
+
+
+def season_mask(dates, ClimateType):
+      return season_subset(dates, ClimateType)[0]
+
+
+def season_index(dates, ClimateType):
+      return season_subset(dates, ClimateType)[1]
\ No newline at end of file
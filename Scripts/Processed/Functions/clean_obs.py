@@ -0,0 +1,107 @@
+import numpy as np
+from Functions.obs_store import read_obs_store
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# clean_obs.py contains the functions to store and read the clean STVL's point rainfall observations for all the considered 
+# coefficients used to make comparable CPC's gridded rainfall values with STVL's point rainfall observations (Coeff_Grid2Point).
+# Instead of saving one copy of the clean observations for each coefficient, the raw observations are saved only once together 
+# with a compact array of flags, where the bit j of each value is set when the observation is rejected when considering the 
+# coefficient Coeff_Grid2Point_list[j]. The clean observations for a given coefficient are then materialised only when needed,
+# and only for the block of stations being processed.
+#######################################################################################################################
+
+
+##########################################################################################
+# Compute the flags for the rejected observations for all the considered coefficients #
+##########################################################################################
+def compute_reject_flags(stvl_obs, cpc_obs, stvl_lats, Coeff_Grid2Point_list):
+
+      NumCoeff = len(Coeff_Grid2Point_list)
+      dtype_flags = np.min_scalar_type(2**NumCoeff - 1)
+      reject_all = dtype_flags.type(2**NumCoeff - 1)
+      reject = np.zeros(stvl_obs.shape, dtype=dtype_flags)
+
+      # Automatic corrections using CPC dataset with different coefficients to compare gridded rainfall values with point rainfall observations
+      for ind_Coeff in range(NumCoeff):
+            Coeff_Grid2Point = Coeff_Grid2Point_list[ind_Coeff]
+            print(" - Automatic corrections using CPC dataset (coefficient to compare gridded rainfall values with point rainfall observations = " + str(Coeff_Grid2Point) + ")")
+            cpc_obs_point = cpc_obs * Coeff_Grid2Point
+            reject[np.less(cpc_obs_point,stvl_obs)] |= dtype_flags.type(1 << ind_Coeff)
+
+      # Manual corrections of rainfall values that are known to be wrong (independent from the considered coefficient)
+      #    - those less than 0 mm
+      #     - those equal to 989.0 mm outside the tropics (their major frequency is accepted in the tropics because there is no other way in synop reports to report rainfall totals higher than 1000 mm/6h and such high rainfall totals can be possible in the tropics)
+      #     - those in the category between 999.1 and 999.9 because are likely to indicate very small rainfall amounts if the way of reporting synop rainfall < 1mm for 6 hourly was adopted also for the 24-hourly
+      #     - those greater than the world record of 1825 mm/24h in La Reunion on 7-8 January 1966 
+      print(" - Manual corrections of rainfall values that are known to be wrong")
+      print("     - Eliminating negative rainfall values")
+      reject[stvl_obs < 0] = reject_all
+
+      print("     - Eliminating rainfall values equal to 989.0 mm outside the tropics because it is not likely to observe rainfall > 1000 mm/6h in the extra tropics")
+      extra_tropics = ((stvl_lats > 30.0) | (stvl_lats < -30.0))
+      reject[(stvl_obs == 989.0) & extra_tropics[:,np.newaxis]] = reject_all
+
+      print("     - Eliminating rainfall values between 999.1 and 999.9 because they are likely to represent instead rainfall totals <= 1 mm/24h")
+      reject[(stvl_obs >= 999.1) & (stvl_obs <= 999.9)] = reject_all
+
+      print("     - Eliminating rainfall values greater than the world record of 1825 mm/24h")
+      reject[stvl_obs > 1825.0] = reject_all
+
+      return reject
+
+
+########################################################################
+# Read the (clean) rainfall observations and the correspondent metadata #
+########################################################################
+def read_obs(DirIN, Coeff_Grid2Point=None):
+
+      # Notes:
+      # If Coeff_Grid2Point is None, the observations are read as they are stored in DirIN (e.g. for the raw STVL or the CPC observations).
+      # Otherwise, DirIN contains the raw observations and the flags for the rejected observations, and the clean observations for the 
+      # considered coefficient are materialised setting to NaN the rejected observations.
+
+      # The observations are returned as a read-only memory-mapped array when they do not need to be cleaned. To read the clean observations
+      # one block of stations at a time (without materialising all of them in memory), use read_obs_flags and read_obs_block.
+
+      stnids, lats, lons, dates, obs, reject, RejectFlag = read_obs_flags(DirIN, Coeff_Grid2Point)
+      if reject is not None:
+            obs = read_obs_block(obs, reject, RejectFlag, slice(None))
+      return stnids, lats, lons, dates, obs
+
+
+##################################################################################
+# Read the raw rainfall observations and the flags for the rejected observations #
+##################################################################################
+def read_obs_flags(DirIN, Coeff_Grid2Point=None):
+
+      # Notes:
+      # The observations and the flags are returned as read-only memory-mapped arrays. If Coeff_Grid2Point is None, the flags are returned as None.
+      # RejectFlag (integer number) is the bit set in the flags for the observations rejected when considering the coefficient Coeff_Grid2Point.
+      stnids, lats, lons, dates, obs = read_obs_store(DirIN)
+      reject = None
+      RejectFlag = 0
+      if Coeff_Grid2Point is not None:
+            Coeff_Grid2Point_list = list(np.load(DirIN + "/Coeff_Grid2Point.npy"))
+            RejectFlag = 1 << Coeff_Grid2Point_list.index(Coeff_Grid2Point)
+            reject = np.load(DirIN + "/reject.npy", mmap_mode="r")
+      return stnids, lats, lons, dates, obs, reject, RejectFlag
+
+
+########################################################
+# Read the (clean) observations of a block of stations #
+########################################################
+def read_obs_block(obs, reject, RejectFlag, ind_stns, ind_days=None):
+
+      # Notes:
+      # ind_stns (slice or 1-d array) indicates the stations (rows) in the block, and ind_days (1-d array) the days (columns) to read. If ind_days
+      # is None, all the days are read. Only the rows of the block are read from the memory-mapped arrays.
+      obs_block = np.asarray(obs[ind_stns])
+      if ind_days is not None:
+            obs_block = obs_block[:, ind_days]
+      if reject is not None:
+            reject_block = np.asarray(reject[ind_stns])
+            if ind_days is not None:
+                  reject_block = reject_block[:, ind_days]
+            obs_block = np.where((reject_block & RejectFlag) != 0, np.nan, obs_block).astype(obs.dtype, copy=False)
+      return obs_block
\ No newline at end of file
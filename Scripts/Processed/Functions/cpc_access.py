@@ -0,0 +1,88 @@
+from datetime import datetime
+import numpy as np
+import netCDF4 as nc
+from Functions.nearest_gridpoint import nearest_gridpoint
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# cpc_access.py contains the functions to read the gridded rainfall values from the "CPC Global Unified Gauge-Based 
+# Analysis of Daily Precipitation" dataset (one netcdf file per year) at a set of rain stations. The indices of the
+# nearest CPC grid-points to the stations are computed in the original CPC layout (longitudes from 0 to 360), so the
+# fields do not need to be re-ordered. Each yearly file is opened once, only the days and the band of latitudes 
+# containing the stations are read, and the values at the stations are gathered directly as an array with dimensions
+# (days x stations). The missing values are then replaced with NaN on such (small) array.
+#######################################################################################################################
+
+# Reference date/time for the "time" variable (provided by its "units" parameter, in cumulative hours)
+CPC_StartTime = datetime(1900,1,1,0,0)
+
+# Grid definitions already read in the current run
+CPCGrid_memory = {}
+
+
+#########################################
+# Name of the CPC file for a given year #
+#########################################
+def file_cpc(DirIN, Year):
+      return DirIN + "/precip." + str(Year) + ".nc"
+
+
+################################
+# Read the CPC grid definition #
+################################
+def read_cpc_grid(FileIN):
+
+      # Note: the function returns the latitudes and the longitudes of the grid (in the original CPC format, from 0 to 360), and the missing value.
+      if FileIN not in CPCGrid_memory:
+            with nc.Dataset(FileIN) as cpc:
+                  CPCGrid_memory[FileIN] = (np.array(cpc["lat"][:]), np.array(cpc["lon"][:]), cpc["precip"].missing_value)
+      return CPCGrid_memory[FileIN]
+
+
+######################################################
+# Compute the indices of the nearest CPC grid-points #
+######################################################
+def nearest_cpc_gridpoint(cpc_lats, cpc_lons, stn_lats, stn_lons):
+
+      # Note: the indices refer to the flattened (lat, lon) fields in the original CPC layout (see Functions/nearest_gridpoint.py for the search).
+      grid_lats, grid_lons = np.meshgrid(cpc_lats, cpc_lons, indexing="ij")
+      return nearest_gridpoint(grid_lats.ravel(), grid_lons.ravel(), stn_lats, stn_lons)[0]
+
+
+###############################################################
+# Read the CPC rainfall values at the stations for given days #
+###############################################################
+def read_cpc_stations(FileIN, Dates, ind_gp, NumDays_chunk=31):
+
+      # Notes:
+      # Dates (list of datetime objects) contains the days to read, in the CPC convention (i.e. the accumulation period is indicated by its 
+      # beginning). ind_gp contains the indices of the nearest grid-points to the stations (as computed by nearest_cpc_gridpoint).
+      # The function returns a float32 array with dimensions (days x stations), with NaN for the missing values and for the days not in the file.
+      cpc_lats, cpc_lons, MissingValue = read_cpc_grid(FileIN)
+      ind_lat = ind_gp // len(cpc_lons)
+      ind_lon = ind_gp % len(cpc_lons)
+      cpc_obs = np.full((len(Dates), len(ind_gp)), np.nan, dtype=np.float32)
+      if len(ind_gp) == 0:
+            return cpc_obs
+      ind_latS = np.min(ind_lat)
+      ind_latF = np.max(ind_lat) + 1
+
+      with nc.Dataset(FileIN) as cpc:
+            
+            # Finding the days in the file
+            Times = {float(Time): ind for ind, Time in enumerate(np.array(cpc["time"][:]))}
+            ind_days = np.array([Times.get(float((TheDate - CPC_StartTime).days * 24), -1) for TheDate in Dates], dtype=np.int64)
+            
+            # Reading chunks of consecutive days, only for the band of latitudes containing the stations
+            precip = cpc["precip"]
+            precip.set_auto_mask(False)
+            ind_found = np.where(ind_days >= 0)[0]
+            for ind_start in range(0, len(ind_found), NumDays_chunk):
+                  ind_chunk = ind_found[ind_start:ind_start+NumDays_chunk]
+                  ind_dayS = np.min(ind_days[ind_chunk])
+                  ind_dayF = np.max(ind_days[ind_chunk]) + 1
+                  block = precip[ind_dayS:ind_dayF, ind_latS:ind_latF, :]
+                  cpc_obs[ind_chunk,:] = block[ind_days[ind_chunk,np.newaxis] - ind_dayS, ind_lat[np.newaxis,:] - ind_latS, ind_lon[np.newaxis,:]]
+
+      cpc_obs[cpc_obs == np.float32(MissingValue)] = np.nan
+      return cpc_obs
\ No newline at end of file
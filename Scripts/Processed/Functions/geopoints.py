@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# geopoints.py contains the functions to read and write ASCII geopoint files in NCOLS format (as written by Metview)
+# without using Metview. A geopoint is stored as a numpy structured array with the fields stnid, latitude, longitude,
+# level, date (YYYYMMDD), time (HHMM) and value, so all the columns are available after a single pass over the file.
+# The data section of the files is parsed with the C engine of pandas.
+#######################################################################################################################
+
+# Value used in geopoints to indicate missing values
+Geo_MissingValue = 3.0E+38
+
+# Coordinate columns in the geopoints (and their alternative names)
+Geo_Columns = ["stnid", "latitude", "longitude", "level", "date", "time", "value"]
+Geo_ColumnsAliases = {"lat": "latitude", "lon": "longitude", "long": "longitude"}
+
+
+#############################################
+# Create a geopoint from its single columns #
+#############################################
+def create_geo(stnids, lats, lons, levels, dates, times, values):
+
+      # Notes:
+      # The station ids are stored as fixed-length strings, long enough to contain the longest id.
+      stnids = np.asarray(stnids, dtype=str)
+      LenStnids = max(1, np.max(np.char.str_len(stnids), initial=0))
+      dtype_geo = [("stnid", "U" + str(LenStnids)), ("latitude", "f8"), ("longitude", "f8"), ("level", "f8"), ("date", "i8"), ("time", "i8"), ("value", "f8")]
+      geo = np.empty(stnids.size, dtype=dtype_geo)
+      geo["stnid"] = stnids
+      geo["latitude"] = lats
+      geo["longitude"] = lons
+      geo["level"] = levels
+      geo["date"] = dates
+      geo["time"] = times
+      geo["value"] = values
+      return geo
+
+
+######################################
+# Read the header of a geopoint file #
+######################################
+def read_geo_header(FileIN):
+
+      # Notes:
+      # The function returns the names of the columns and the number of lines before the data section.
+      # Besides the NCOLS format, the traditional (lat/lon/level/date/time/value) and XYV (lon/lat/value) formats can be read.
+      Format = "TRADITIONAL"
+      Columns = None
+      NumLines_header = 0
+      with open(FileIN) as f:
+            for line in f:
+                  NumLines_header = NumLines_header + 1
+                  line = line.strip()
+                  if line.startswith("#FORMAT"):
+                        Format = line.split()[1]
+                  elif line == "#COLUMNS":
+                        Columns = [Geo_ColumnsAliases.get(c, c) for c in next(f).split()]
+                        NumLines_header = NumLines_header + 1
+                  elif line == "#DATA":
+                        break
+      if Format == "TRADITIONAL":
+            Columns = ["latitude", "longitude", "level", "date", "time", "value"]
+      elif Format == "XYV":
+            Columns = ["longitude", "latitude", "value"]
+      elif (Format != "NCOLS") or (Columns is None):
+            raise ValueError("Geopoint format not supported (" + Format + "): " + FileIN)
+      return Columns, NumLines_header
+
+
+########################
+# Read a geopoint file #
+########################
+def read_geo(FileIN, RemoveMissing=False):
+
+      # Notes:
+      # The missing values are removed from the geopoint when RemoveMissing is True (as with Metview's remove_missing_values).
+      # When the file contains more than one value column, only the first one is read.
+      Columns, NumLines_header = read_geo_header(FileIN)
+      Columns_value = [c for c in Columns if c not in Geo_Columns[0:-1]]
+      if len(Columns_value) != 0:
+            Columns = [c if c != Columns_value[0] else "value" for c in Columns]
+      data = pd.read_csv(FileIN, sep=r"\s+", skiprows=NumLines_header, header=None, names=Columns, dtype={"stnid": str}, engine="c")
+      NumPoints = len(data)
+      column = lambda c, default: data[c].to_numpy() if c in data else np.full(NumPoints, default)
+      geo = create_geo(column("stnid", ""), column("latitude", np.nan), column("longitude", np.nan), column("level", 0), column("date", 0), column("time", 0), column("value", np.nan))
+      if RemoveMissing:
+            geo = remove_missing_values(geo)
+      return geo
+
+
+#######################################
+# Count the points in a geopoint file #
+#######################################
+def count_geo(FileIN):
+
+      NumLines_header = read_geo_header(FileIN)[1]
+      with open(FileIN) as f:
+            NumLines = sum(1 for line in f if line.strip() != "")
+      return NumLines - NumLines_header
+
+
+#############################################
+# Remove the missing values from a geopoint #
+#############################################
+def remove_missing_values(geo):
+      return geo[(geo["value"] != Geo_MissingValue) & ~np.isnan(geo["value"])]
+
+
+######################################
+# Merge a list of geopoints into one #
+######################################
+def merge_geo(geo_list):
+
+      # Note: the station ids are converted to the longest length among the geopoints before concatenating them.
+      geo_list = [geo for geo in geo_list if geo is not None]
+      if len(geo_list) == 0:
+            return create_geo([], [], [], [], [], [], [])
+      LenStnids = max([geo.dtype["stnid"].itemsize // 4 for geo in geo_list])
+      dtype_geo = geo_list[0].dtype.descr
+      dtype_geo[0] = ("stnid", "U" + str(LenStnids))
+      return np.concatenate([geo.astype(dtype_geo) for geo in geo_list])
+
+
+#########################
+# Write a geopoint file #
+#########################
+def write_geo(FileOUT, geo):
+
+      with open(FileOUT, "w") as f:
+            f.write("#GEO\n#FORMAT NCOLS\n#COLUMNS\n" + "\t".join(Geo_Columns) + "\n#DATA\n")
+            pd.DataFrame({c: geo[c] for c in Geo_Columns}).to_csv(f, sep="\t", header=False, index=False, lineterminator="\n")
\ No newline at end of file
@@ -0,0 +1,58 @@
+import numpy as np
+from Functions.nearest_gridpoint import Grid_Keys, gridpoint_index, nearest_gridpoint_values
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# grib_decode.py contains the functions to read the values of the fields in a grib file (edition 1 or 2) at the nearest
+# grid-points to a list of stations. The fields can be decoded with Metview (which loads the full fieldset) or directly
+# with eccodes, one message at the time. With eccodes, the coordinates of the grid-points are decoded only the first time
+# a grid is met (and only if the indices of the nearest grid-points are not already cached), the values of each message
+# are decoded into a single array, and only the values at the stations are kept before the message is released.
+#######################################################################################################################
+
+# Backends available to decode the grib files
+Decode_Backends = ["metview", "eccodes"]
+
+
+#####################################################################################
+# Decode the values at the nearest grid-points for each message in a file (eccodes) #
+#####################################################################################
+def read_grib_stations_eccodes(FileIN, stn_lats, stn_lons, DirCache):
+
+      # Notes:
+      # The grid-points whose values are missing (when the message has a bitmap) are set to NaN.
+      import eccodes
+
+      values_stns = []
+      with open(FileIN, "rb") as f:
+            while True:
+                  gid = eccodes.codes_grib_new_from_file(f)
+                  if gid is None:
+                        break
+                  try:
+                        GridDef = [eccodes.codes_get(gid, Key) if eccodes.codes_is_defined(gid, Key) else "" for Key in Grid_Keys]
+                        grid_coords = lambda: (eccodes.codes_get_array(gid, "latitudes"), eccodes.codes_get_array(gid, "longitudes"))
+                        ind_gp = gridpoint_index(GridDef, grid_coords, stn_lats, stn_lons, DirCache)
+                        values = eccodes.codes_get_values(gid)[ind_gp]
+                        if eccodes.codes_get(gid, "bitmapPresent"):
+                              values = np.where(values == eccodes.codes_get(gid, "missingValue"), np.nan, values)
+                        values_stns.append(values)
+                  finally:
+                        eccodes.codes_release(gid)
+      return values_stns[0] if len(values_stns) == 1 else np.array(values_stns)
+
+
+#########################################################################
+# Decode the values at the nearest grid-points for each field in a file #
+#########################################################################
+def read_grib_stations(FileIN, stn_lats, stn_lons, DirCache, Backend="metview"):
+
+      # Notes:
+      # Backend (string) is one of the backends in Decode_Backends. Both backends return the values with dimensions (stations) for a file with a
+      # single field, or (fields, stations) for a file with more than one field (e.g. ensemble members).
+      if Backend == "metview":
+            import metview as mv
+            return np.asarray(nearest_gridpoint_values(mv.read(FileIN), stn_lats, stn_lons, DirCache), dtype=np.float64)
+      elif Backend == "eccodes":
+            return np.asarray(read_grib_stations_eccodes(FileIN, stn_lats, stn_lons, DirCache), dtype=np.float64)
+      raise ValueError("Backend to decode the grib files not supported (" + str(Backend) + "). Available backends: " + ", ".join(Decode_Backends))
\ No newline at end of file
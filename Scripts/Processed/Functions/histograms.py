@@ -0,0 +1,182 @@
+import os
+from os.path import exists
+import numpy as np
+from Functions.percentiles import percentiles_counts
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# histograms.py contains the functions to store the rainfall values of each station (e.g. the observations or the
+# modelled realizations over a single year) as a histogram, and to compute the distribution of percentiles over a whole
+# period by summing the histograms of the years it covers. The histogram of a station contains only its distinct valid
+# values (in increasing order) and how many times each of them occurs, so it is exact for any value (i.e. the values do
+# not need to be rounded to a given resolution), and it is much smaller than the values themselves when the values are
+# rounded (e.g. to 0.1 mm). The histograms of all the stations are stored as one sparse array (values, counts, and the
+# offsets of the values of each station), together with the number of realizations (including the missing ones) they
+# were built from. The percentiles computed from the summed histograms are the same (bit by bit) as the ones computed by
+# sorting all the values over the period, so a period can be extended (or changed) without reading again its values.
+# The histograms can store the size and the modification time of the file with the values they were built from, so they
+# are used only while that file is unchanged (e.g. not after the values were saved again without their histograms).
+#######################################################################################################################
+
+
+######################################################
+# Build the histograms of the values of each station #
+######################################################
+def histograms_stations(data, NumStns_block=10000):
+
+      # Notes:
+      # data (2-d array, stations x realizations) can contain NaNs, which are not counted. It can be memory-mapped, as only one block of stations
+      # is read into memory at a time.
+      # Negative zeros are counted (and returned) as zeros.
+      # The function returns a dictionary with the values of all the stations (with the same dtype as data), their counts, the offsets of the
+      # values of each station (i.e. the values of station i are values[Offsets[i]:Offsets[i+1]]) and the number of realizations.
+      NumStns = data.shape[0]
+      values_list = []
+      counts_list = []
+      NumValues = np.zeros(NumStns, dtype=np.int64)
+      for ind_start in range(0, NumStns, NumStns_block):
+            data_sorted = np.sort(np.asarray(data[ind_start:(ind_start + NumStns_block)]), axis=1)
+            NumValid = np.sum(~np.isnan(data_sorted), axis=1)
+
+            # Finding the first occurrence of each distinct valid value of each station, and how many times it occurs
+            first = ~np.isnan(data_sorted)
+            first[:, 1:] &= data_sorted[:, 1:] != data_sorted[:, :-1]
+            # Note: a block with no valid values (e.g. a season with no realizations) gives no values and no counts.
+            rows, cols = np.nonzero(first)
+            ends = cols.copy()
+            if len(rows) != 0:
+                  ends[:-1] = cols[1:]
+                  last_stn = np.append(rows[1:] != rows[:-1], True)
+                  ends[last_stn] = NumValid[rows[last_stn]]
+            values_list.append(data_sorted[rows, cols])
+            counts_list.append((ends - cols).astype(np.int32))
+            NumValues[ind_start:(ind_start + NumStns_block)] = np.bincount(rows, minlength=data_sorted.shape[0])
+
+      values = np.concatenate(values_list) if NumStns != 0 else np.array([], dtype=data.dtype)
+      values[values == 0] = 0
+      counts = np.concatenate(counts_list) if NumStns != 0 else np.array([], dtype=np.int32)
+      Offsets = np.concatenate(([0], np.cumsum(NumValues))).astype(np.int64)
+      return {"values": values, "counts": counts, "Offsets": Offsets, "NumR": data.shape[1]}
+
+
+##########################################
+# Write/read the histograms of a dataset #
+##########################################
+def write_histograms(FileOUT, hist, stnids=None, FileSource=None):
+
+      # Notes:
+      # stnids (1-d array) contains the ids of the stations (rows) the histograms were built for, so they can be summed with the histograms
+      # built for a different list of stations (e.g. for a different period).
+      # FileSource (string) is the file with the values the histograms were built from. It must be already saved (and closed), as its size and
+      # modification time are stored with the histograms (see histograms_current).
+      DirOUT = os.path.dirname(FileOUT)
+      if not exists(DirOUT):
+            os.makedirs(DirOUT)
+      extra = {} if stnids is None else {"stnids": np.asarray(stnids)}
+      if FileSource is not None:
+            extra["Source"] = file_signature(FileSource)
+      with open(FileOUT + ".tmp", "wb") as f:
+            np.savez(f, values=hist["values"], counts=hist["counts"], Offsets=hist["Offsets"], NumR=hist["NumR"], **extra)
+      os.replace(FileOUT + ".tmp", FileOUT)
+
+
+def read_histograms(FileIN):
+
+      # Note: the station ids are returned in the dictionary (as "stnids") only if they were written with the histograms.
+      with np.load(FileIN) as data:
+            hist = {"values": data["values"], "counts": data["counts"], "Offsets": data["Offsets"], "NumR": int(data["NumR"])}
+            if "stnids" in data:
+                  hist["stnids"] = data["stnids"]
+      return hist
+
+
+########################################################################
+# Check that the histograms were built from the current file of values #
+########################################################################
+def file_signature(FileIN):
+      stat = os.stat(FileIN)
+      return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def histograms_current(FileHist, FileSource):
+
+      # Note: the function returns False when the histograms or the file with the values do not exist, when the histograms were written without
+      # the signature of the file with the values, or when such file was written again (or changed) after the histograms were built.
+      if not (exists(FileHist) and exists(FileSource)):
+            return False
+      with np.load(FileHist) as data:
+            if "Source" not in data:
+                  return False
+            return np.array_equal(data["Source"], file_signature(FileSource))
+
+
+###########################################################
+# Map the stations of a histogram onto a list of stations #
+###########################################################
+def histogram_rows(stnids_hist, stnids):
+
+      # Notes:
+      # stnids (1-d array) must be sorted (as the unique station ids). The function returns, for each station in the histogram, its row in
+      # stnids (or -1 if it is not in stnids).
+      stnids_hist = np.asarray(stnids_hist)
+      rows = np.searchsorted(stnids, stnids_hist)
+      found = rows < len(stnids)
+      found[found] = stnids[rows[found]] == stnids_hist[found]
+      return np.where(found, rows, -1)
+
+
+##########################################
+# Sum the histograms of several datasets #
+##########################################
+def merge_histograms(hist_list, rows_list=None, NumStns=None):
+
+      # Notes:
+      # rows_list (list of 1-d arrays) contains, for each histogram, the row of each of its stations in the merged histograms (-1 for the stations
+      # to drop). If None, the histograms must have the same stations (rows) in the same order. NumStns (integer number) is the number of stations
+      # in the merged histograms (by default, the number of stations in the first histogram).
+      # The values of each station are sorted (and the counts of the same values summed) in a single pass over all the histograms, and the
+      # number of realizations of the merged histograms is the sum of the ones of each histogram.
+      if rows_list is None:
+            rows_list = [np.arange(len(hist["Offsets"]) - 1) for hist in hist_list]
+      if NumStns is None:
+            NumStns = len(hist_list[0]["Offsets"]) - 1
+      stns = np.concatenate([np.repeat(rows, np.diff(hist["Offsets"])) for hist, rows in zip(hist_list, rows_list)])
+      values = np.concatenate([hist["values"] for hist in hist_list])
+      counts = np.concatenate([hist["counts"] for hist in hist_list]).astype(np.int64)
+      keep = stns >= 0
+      stns, values, counts = stns[keep], values[keep], counts[keep]
+
+      ind_sort = np.lexsort((values, stns))
+      stns, values, counts = stns[ind_sort], values[ind_sort], counts[ind_sort]
+      first = np.ones(len(stns), dtype=bool)
+      first[1:] = (stns[1:] != stns[:-1]) | (values[1:] != values[:-1])
+      ind_first = np.where(first)[0]
+      counts = np.add.reduceat(counts, ind_first) if len(ind_first) != 0 else counts
+      Offsets = np.concatenate(([0], np.cumsum(np.bincount(stns[ind_first], minlength=NumStns)))).astype(np.int64)
+      return {"values": values[ind_first], "counts": counts, "Offsets": Offsets, "NumR": sum(hist["NumR"] for hist in hist_list)}
+
+
+##############################################################################
+# Number of valid values and distribution of percentiles from the histograms #
+##############################################################################
+def histogram_totals(hist):
+
+      # Note: the function returns the number of valid (i.e. not NaN) values of each station.
+      cum_counts = np.concatenate(([0], np.cumsum(hist["counts"], dtype=np.int64)))
+      return cum_counts[hist["Offsets"][1:]] - cum_counts[hist["Offsets"][:-1]]
+
+
+def percentiles_histograms(hist, percs, ind_stns=None, AddMinMax=True):
+
+      # Notes:
+      # ind_stns (1-d array) indicates the stations (rows) to consider. If None, all stations are considered.
+      # The result is the same as the one returned by percentiles_stations (with the same arguments) for all the values the histograms were built
+      # from, i.e. it has dimensions (percentiles, stations).
+      Offsets = hist["Offsets"]
+      if ind_stns is None:
+            return percentiles_counts(hist["values"], hist["counts"], Offsets, percs, AddMinMax)
+      ind_stns = np.asarray(ind_stns, dtype=np.int64)
+      NumValues = Offsets[ind_stns + 1] - Offsets[ind_stns]
+      Offsets_stns = np.concatenate(([0], np.cumsum(NumValues))).astype(np.int64)
+      ind_values = np.repeat(Offsets[ind_stns] - Offsets_stns[:-1], NumValues) + np.arange(Offsets_stns[-1])
+      return percentiles_counts(hist["values"][ind_values], hist["counts"][ind_values], Offsets_stns, percs, AddMinMax)
\ No newline at end of file
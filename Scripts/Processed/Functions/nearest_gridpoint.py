@@ -0,0 +1,213 @@
+import os
+from os.path import exists
+import hashlib
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# nearest_gridpoint.py contains the functions to compute, store and re-use the indices of the nearest grid-points to a 
+# set of rain stations. The indices are stored on disk in a cache file whose name depends on the grid definition and on 
+# the considered set of stations, so the geometric search is done only once for each grid and each set of stations. 
+# Extracting the values at the stations then becomes a simple indexing of the array of decoded grid-point values.
+# For global grids made of rows of constant latitude with equally spaced longitudes (i.e. regular lat/lon grids and
+# reduced Gaussian/octahedral grids), the nearest grid-points are computed analytically: for each station, only the grid-point
+# with the nearest longitude in the few rows around the latitude of the station is considered. The differences in
+# longitude are computed on the circle, so the dateline and the poles are handled correctly. For other grids, the 
+# distances to all the grid-points are computed.
+#######################################################################################################################
+
+# Mean radius of the Earth (in km)
+Earth_Radius = 6371.0
+
+# Keys (in GRIB) that define a grid. The first two keys (grid type and number of grid-points) are also used in the names of the cache files.
+# Note: md5GridSection is the checksum of the whole grid section, so it also differs for grids with the same type and size but a different area, 
+# rotation or resolution (the other keys identify the grid when it is not available).
+Grid_Keys = ["gridType", "numberOfDataPoints", "md5GridSection", "Ni", "Nj", "N", "latitudeOfFirstGridPointInDegrees", "longitudeOfFirstGridPointInDegrees", 
+             "latitudeOfLastGridPointInDegrees", "longitudeOfLastGridPointInDegrees", "latitudeOfSouthernPoleInDegrees", "longitudeOfSouthernPoleInDegrees"]
+
+# Grid definitions and indices already read/computed in the current run (to avoid reading the cache file for every field)
+GridID_memory = {}
+IndexGP_memory = {}
+
+
+#######################################
+# Compute the hash of a set of arrays #
+#######################################
+def hash_arrays(*arrays):
+
+      h = hashlib.sha1()
+      for a in arrays:
+            a = np.ascontiguousarray(a, dtype=np.float64)
+            h.update(str(a.shape).encode())
+            h.update(a.tobytes())
+      return h.hexdigest()[0:16]
+
+
+##########################################
+# Compute the great-circle distance (km) #
+##########################################
+def great_circle_distance(lats1, lons1, lats2, lons2):
+
+      lats1, lons1, lats2, lons2 = [np.radians(np.asarray(a, dtype=np.float64)) for a in (lats1, lons1, lats2, lons2)]
+      a = np.sin((lats2 - lats1) / 2)**2 + np.cos(lats1) * np.cos(lats2) * np.sin((lons2 - lons1) / 2)**2
+      return 2 * Earth_Radius * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+#################################################################################
+# Compute the indices of the nearest grid-points with the great-circle distance #
+#################################################################################
+def compute_nearest_gridpoint(grid_lats, grid_lons, stn_lats, stn_lons, NumStns_chunk=32):
+
+      # Converting the coordinates to unit vectors. The nearest grid-point (in great-circle distance) is the one with the largest scalar product.
+      grid_lats = np.radians(np.asarray(grid_lats, dtype=np.float64))
+      grid_lons = np.radians(np.asarray(grid_lons, dtype=np.float64))
+      stn_lats = np.radians(np.asarray(stn_lats, dtype=np.float64))
+      stn_lons = np.radians(np.asarray(stn_lons, dtype=np.float64))
+      grid_xyz = np.column_stack((np.cos(grid_lats) * np.cos(grid_lons), np.cos(grid_lats) * np.sin(grid_lons), np.sin(grid_lats)))
+      stn_xyz = np.column_stack((np.cos(stn_lats) * np.cos(stn_lons), np.cos(stn_lats) * np.sin(stn_lons), np.sin(stn_lats)))
+
+      # Searching the nearest grid-points for chunks of stations to limit the memory used
+      ind_gp = np.empty(len(stn_lats), dtype=np.int64)
+      for ind_start in range(0, len(stn_lats), NumStns_chunk):
+            ind_end = ind_start + NumStns_chunk
+            ind_gp[ind_start:ind_end] = np.argmax(stn_xyz[ind_start:ind_end,:] @ grid_xyz.T, axis=1)
+      return ind_gp
+
+
+###############################
+# Describe the rows of a grid #
+###############################
+def grid_rows(grid_lats, grid_lons, Tolerance=1e-4):
+
+      # Notes:
+      # The grid-points must be ordered by rows of constant latitude (as in GRIB for global regular lat/lon and reduced Gaussian grids), with the
+      # latitudes of the rows sorted, and the longitudes in each row must be equally spaced over the whole globe. The function returns None when it 
+      # is not the case (e.g. for grids over a sub-area, where the nearest grid-point to a station outside the area can be in a distant row).
+      # Rows with a single grid-point are accepted only at the poles.
+      grid_lats = np.asarray(grid_lats, dtype=np.float64)
+      grid_lons = np.asarray(grid_lons, dtype=np.float64) % 360
+      if grid_lats.size == 0:
+            return None
+      RowStart = np.concatenate(([0], np.where(np.diff(grid_lats) != 0)[0] + 1))
+      RowNum = np.diff(np.append(RowStart, grid_lats.size))
+      row_lats = grid_lats[RowStart]
+      if not (np.all(np.diff(row_lats) < 0) or np.all(np.diff(row_lats) > 0)) or np.any((RowNum == 1) & (np.abs(row_lats) != 90)):
+            return None
+
+      # Checking that the longitudes in each row are equally spaced over the whole globe
+      lon0 = grid_lons[RowStart]
+      dlon = 360.0 / RowNum
+      row = np.repeat(np.arange(RowStart.size), RowNum)
+      k = np.arange(grid_lons.size) - RowStart[row]
+      dlons = (grid_lons - lon0[row] - k * dlon[row] + 180) % 360 - 180
+      if np.any(np.abs(dlons) > Tolerance):
+            return None
+
+      ind_sort = np.argsort(row_lats)
+      return {"lats": grid_lats, "lons": grid_lons, "RowStart": RowStart, "RowNum": RowNum, "lon0": lon0, "dlon": dlon, "row_lats_sorted": row_lats[ind_sort], "ind_sort": ind_sort}
+
+
+###################################################################
+# Compute the nearest grid-points analytically from the grid rows #
+###################################################################
+def compute_nearest_gridpoint_rows(rows, stn_lats, stn_lons, NumRows_search=2):
+
+      # Notes:
+      # For each station, the grid-point with the nearest longitude is found analytically in the NumRows_search rows on each side of the station's 
+      # latitude, and the nearest of these grid-points is selected.
+      # The function returns the indices of the nearest grid-points and their distances (in km).
+      stn_lats = np.asarray(stn_lats, dtype=np.float64)
+      stn_lons = np.asarray(stn_lons, dtype=np.float64) % 360
+      NumRows = rows["RowStart"].size
+      pos = np.searchsorted(rows["row_lats_sorted"], stn_lats)
+      ind_gp = np.full(stn_lats.size, -1, dtype=np.int64)
+      dist_gp = np.full(stn_lats.size, np.inf)
+      for offset in range(-NumRows_search, NumRows_search):
+            pos_row = pos + offset
+            valid = (pos_row >= 0) & (pos_row < NumRows)
+            r = rows["ind_sort"][np.clip(pos_row, 0, NumRows - 1)]
+            dl = (stn_lons - rows["lon0"][r]) % 360
+            k = np.rint(dl / rows["dlon"][r]).astype(np.int64) % rows["RowNum"][r]
+            ind = rows["RowStart"][r] + k
+            dist = great_circle_distance(stn_lats, stn_lons, rows["lats"][ind], rows["lons"][ind])
+            better = valid & (dist < dist_gp)
+            ind_gp[better] = ind[better]
+            dist_gp[better] = dist[better]
+      return ind_gp, dist_gp
+
+
+#####################################################################
+# Compute the nearest grid-points (and their distances) to stations #
+#####################################################################
+def nearest_gridpoint(grid_lats, grid_lons, stn_lats, stn_lons):
+
+      # Note: the grid-points are searched analytically for global grids made of rows with equally spaced longitudes, and among all the grid-points otherwise.
+      rows = grid_rows(grid_lats, grid_lons)
+      if rows is not None:
+            return compute_nearest_gridpoint_rows(rows, stn_lats, stn_lons)
+      ind_gp = compute_nearest_gridpoint(grid_lats, grid_lons, stn_lats, stn_lons)
+      return ind_gp, great_circle_distance(stn_lats, stn_lons, np.asarray(grid_lats)[ind_gp], np.asarray(grid_lons)[ind_gp])
+
+
+######################################################################
+# Read (or compute and store) the indices of the nearest grid-points #
+######################################################################
+def nearest_gridpoint_index(GridID, stn_lats, stn_lons, DirCache, compute_index):
+
+      # Notes:
+      # GridID (string) identifies the grid definition (e.g. the hash of the grid-point coordinates).
+      # compute_index is a function with no arguments that returns the indices of the nearest grid-points to the stations. It is called only 
+      # when the indices are not already stored in the cache.
+
+      StnsID = hash_arrays(stn_lats, stn_lons)
+      if (GridID, StnsID) in IndexGP_memory:
+            return IndexGP_memory[(GridID, StnsID)]
+
+      # Note: the cache can be shared by several processes (e.g. one per year), so each process writes the indices to its own temporary file and
+      # then renames it, and the cache file is never read while it is being written.
+      FileCache = DirCache + "/NearestGP_" + GridID + "_" + StnsID + ".npy"
+      if exists(FileCache):
+            ind_gp = np.load(FileCache)
+      else:
+            ind_gp = np.asarray(compute_index(), dtype=np.int64)
+            os.makedirs(DirCache, exist_ok=True)
+            FileCache_temp = FileCache + "." + str(os.getpid()) + ".tmp"
+            with open(FileCache_temp, "wb") as f:
+                  np.save(f, ind_gp)
+            os.replace(FileCache_temp, FileCache)
+
+      IndexGP_memory[(GridID, StnsID)] = ind_gp
+      return ind_gp
+
+
+#######################################################################
+# Read (or compute) the indices of the nearest grid-points for a grid #
+#######################################################################
+def gridpoint_index(GridDef, grid_coords, stn_lats, stn_lons, DirCache):
+
+      # Notes:
+      # GridDef (list of strings) contains the values of the keys in Grid_Keys for the grid (with an empty string for the keys that are not defined).
+      # grid_coords is a function with no arguments that returns the latitudes and the longitudes of the grid-points. It is called only the first 
+      # time a grid with a given definition is met, and the grid is then identified with its type, its size and the hash of its coordinates 
+      # (e.g. "reduced_gg_654400_<hash>").
+      GridKey = tuple(str(v) for v in GridDef)
+      if GridKey not in GridID_memory:
+            grid_lats, grid_lons = grid_coords()
+            GridID_memory[GridKey] = (GridKey[0] + "_" + GridKey[1] + "_" + hash_arrays(grid_lats, grid_lons), grid_lats, grid_lons)
+      GridID, grid_lats, grid_lons = GridID_memory[GridKey]
+      return nearest_gridpoint_index(GridID, stn_lats, stn_lons, DirCache, lambda: nearest_gridpoint(grid_lats, grid_lons, stn_lats, stn_lons)[0])
+
+
+###############################################################
+# Extract the values of a fieldset at the nearest grid-points #
+###############################################################
+def nearest_gridpoint_values(fs, stn_lats, stn_lons, DirCache):
+
+      # Notes:
+      # The result has the same shape as the one returned by mv.nearest_gridpoint, i.e. (stations) for a single field or (fields, stations) for 
+      # a fieldset with more than one field.
+      import metview as mv
+
+      GridDef = mv.grib_get(fs[0], Grid_Keys)[0]
+      ind_gp = gridpoint_index(GridDef, lambda: (mv.latitudes(fs[0]), mv.longitudes(fs[0])), stn_lats, stn_lons, DirCache)
+      return mv.values(fs)[..., ind_gp]
\ No newline at end of file
@@ -0,0 +1,167 @@
+import os
+from os.path import exists
+import numpy as np
+from Functions.geopoints import Geo_Columns, create_geo, read_geo, merge_geo, remove_missing_values
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# obs_archive.py contains the functions to store and read the rainfall observations of a dataset as one archive file per
+# year, instead of one geopoint file per valid date/time (i.e. <DirIN>/<Dataset>/<YYYYMMDD>/tp<Acc>_obs_<YYYYMMDDHH>.geo).
+# The archive (<DirIN>/<Dataset>/tp<Acc>_obs_<YYYY>.npz) contains the columns of all the geopoints in the year, sorted by
+# valid date/time, and an index with the valid dates/times (YYYYMMDDHH) that have observations and the offsets of their
+# rows. The observations for a given date/time are then read with a look-up in the index, without checking the existence
+# of (and opening) one file per date/time. When the archive does not exist, the single geopoint files are read instead.
+#######################################################################################################################
+
+# Archives already read in the current run (the oldest ones are dropped when more than MaxArchives_memory are read)
+Archive_memory = {}
+MaxArchives_memory = 16
+
+
+##################################################
+# Names of the archive and of the geopoint files #
+##################################################
+def file_archive(DirIN, Dataset, Year, Acc):
+      return DirIN + "/" + Dataset + "/tp" + str(Acc) + "_obs_" + str(Year) + ".npz"
+
+
+def file_geo(DirIN, Dataset, TheDateTime, Acc):
+      return DirIN + "/" + Dataset + "/" + TheDateTime.strftime("%Y%m%d") + "/tp" + str(Acc) + "_obs_" + TheDateTime.strftime("%Y%m%d%H") + ".geo"
+
+
+####################
+# Write an archive #
+####################
+def write_archive(FileOUT, Slots, geo_list, Append=True, Window=None):
+
+      # Notes:
+      # Slots (list of integers, in YYYYMMDDHH format) contains the valid dates/times of the geopoints in geo_list.
+      # If Append is True and the archive already exists, the new valid dates/times are added to the ones already in the archive (and
+      # they replace the ones already in the archive for the same valid dates/times).
+      # Window (list of two integers, in YYYYMMDDHH format) contains the first and the last valid dates/times that were recomputed. If given, the
+      # valid dates/times already in the archive within the window are dropped even when they are not in Slots (e.g. the observations that are
+      # no longer unique), and only the ones outside the window are kept.
+      Slots = list(Slots)
+      geo_list = list(geo_list)
+      if Append and exists(FileOUT):
+            archive = read_archive(FileOUT)
+            for ind in range(len(archive["Slots"])):
+                  if (Window is not None) and (Window[0] <= archive["Slots"][ind] <= Window[1]):
+                        continue
+                  if archive["Slots"][ind] not in Slots:
+                        Slots.append(int(archive["Slots"][ind]))
+                        geo_list.append(archive["geo"][archive["Offsets"][ind]:archive["Offsets"][ind+1]])
+
+      ind_sort = np.argsort(np.array(Slots, dtype=np.int64), kind="stable")
+      Slots = np.array(Slots, dtype=np.int64)[ind_sort]
+      geo_list = [geo_list[ind] for ind in ind_sort]
+      Offsets = np.concatenate(([0], np.cumsum([len(geo) for geo in geo_list]))).astype(np.int64)
+      geo = merge_geo(geo_list)
+
+      DirOUT = os.path.dirname(FileOUT)
+      if not exists(DirOUT):
+            os.makedirs(DirOUT)
+      with open(FileOUT + ".tmp", "wb") as f:
+            np.savez(f, Slots=Slots, Offsets=Offsets, **{c: geo[c] for c in Geo_Columns})
+      os.replace(FileOUT + ".tmp", FileOUT)
+      Archive_memory.pop(FileOUT, None)
+
+
+###################
+# Read an archive #
+###################
+def read_archive(FileIN):
+
+      if Archive_memory.get(FileIN) is None:
+            Archive_memory.pop(FileIN, None)
+            if len(Archive_memory) >= MaxArchives_memory:
+                  Archive_memory.pop(next(iter(Archive_memory)))
+            with np.load(FileIN) as data:
+                  geo = create_geo(*[data[c] for c in Geo_Columns])
+                  Archive_memory[FileIN] = {"Slots": data["Slots"], "Offsets": data["Offsets"], "geo": geo}
+      return Archive_memory[FileIN]
+
+
+############################################################
+# Read the observations of a dataset for a given date/time #
+############################################################
+def read_obs_slot(DirIN, Dataset, TheDateTime, Acc, RemoveMissing=False):
+
+      # Notes:
+      # The function returns None when there are no observations for the given date/time.
+      # The archives that do not exist are also recorded in memory (as None), so their existence is checked only once.
+      FileIN = file_archive(DirIN, Dataset, TheDateTime.year, Acc)
+      if (FileIN not in Archive_memory) and (not exists(FileIN)):
+            Archive_memory[FileIN] = None
+      if Archive_memory.get(FileIN, True) is not None:
+            archive = read_archive(FileIN)
+            Slot = int(TheDateTime.strftime("%Y%m%d%H"))
+            ind = np.searchsorted(archive["Slots"], Slot)
+            if (ind == len(archive["Slots"])) or (archive["Slots"][ind] != Slot):
+                  return None
+            geo = archive["geo"][archive["Offsets"][ind]:archive["Offsets"][ind+1]]
+      else:
+            FileIN = file_geo(DirIN, Dataset, TheDateTime, Acc)
+            if not exists(FileIN):
+                  return None
+            geo = read_geo(FileIN)
+
+      if RemoveMissing:
+            geo = remove_missing_values(geo)
+      return geo
+
+
+###########################################################################
+# Build the archive of a dataset for a given year from the geopoint files #
+###########################################################################
+def ingest_year(DirIN, Dataset, Year, Acc, DirOUT):
+
+      # Notes:
+      # The directories of the days in the year are listed only once (instead of checking the existence of one file per date/time).
+      # The function returns the number of valid dates/times stored in the archive.
+      DirIN_Dataset = DirIN + "/" + Dataset
+      if not exists(DirIN_Dataset):
+            return 0
+      Slots = []
+      geo_list = []
+      Days = sorted([d for d in os.listdir(DirIN_Dataset) if d.startswith(str(Year)) and os.path.isdir(DirIN_Dataset + "/" + d)])
+      for Day in Days:
+            for FileName in sorted(os.listdir(DirIN_Dataset + "/" + Day)):
+                  Prefix = "tp" + str(Acc) + "_obs_"
+                  if FileName.startswith(Prefix) and FileName.endswith(".geo") and FileName[len(Prefix):-4].isdigit():
+                        Slots.append(int(FileName[len(Prefix):-4]))
+                        geo_list.append(read_geo(DirIN_Dataset + "/" + Day + "/" + FileName))
+      if len(Slots) != 0:
+            write_archive(file_archive(DirOUT, Dataset, Year, Acc), Slots, geo_list, Append=False)
+      return len(Slots)
+
+#############################################################
+# Read the observations of a dataset for all times in a day #
+#############################################################
+def read_obs_day(DirIN, Dataset, TheDate, Acc, RemoveMissing=False):
+
+      # Notes:
+      # The function returns a dictionary with the hours in the day (0 to 23) that have observations as keys, and their geopoints as values.
+      # With an archive, the valid dates/times in the day are contiguous in the index, so they are found with a single look-up. Without an
+      # archive, the directory of the day is listed only once (instead of checking the existence of one file per hour).
+      Day = int(TheDate.strftime("%Y%m%d"))
+      geo_day = {}
+      FileIN = file_archive(DirIN, Dataset, TheDate.year, Acc)
+      if (FileIN not in Archive_memory) and (not exists(FileIN)):
+            Archive_memory[FileIN] = None
+      if Archive_memory.get(FileIN, True) is not None:
+            archive = read_archive(FileIN)
+            indS, indF = np.searchsorted(archive["Slots"], [Day * 100, Day * 100 + 24])
+            for ind in range(indS, indF):
+                  geo_day[int(archive["Slots"][ind] % 100)] = archive["geo"][archive["Offsets"][ind]:archive["Offsets"][ind+1]]
+      else:
+            DirIN_Day = DirIN + "/" + Dataset + "/" + str(Day)
+            Prefix = "tp" + str(Acc) + "_obs_" + str(Day)
+            FileNames = os.listdir(DirIN_Day) if exists(DirIN_Day) else []
+            for FileName in sorted(FileNames):
+                  if FileName.startswith(Prefix) and FileName.endswith(".geo") and FileName[len(Prefix):-4].isdigit():
+                        geo_day[int(FileName[len(Prefix):-4])] = read_geo(DirIN_Day + "/" + FileName)
+
+      if RemoveMissing:
+            geo_day = {Hour: remove_missing_values(geo_day[Hour]) for Hour in geo_day}
+      return geo_day
\ No newline at end of file
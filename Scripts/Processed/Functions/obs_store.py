@@ -0,0 +1,52 @@
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# obs_store.py contains the functions to write and read the aligned rainfall observations (stations x days) as a store on
+# disk. The store is a directory containing the metadata (stn_ids.npy, stn_lats.npy, stn_lons.npy, dates.npy) and the
+# observations (obs.npy) as a float32 array where NaN indicates missing observations. The observations are stored in
+# station-major order and are read as a memory-mapped array, so each stage only touches the slices it needs: the rows
+# of a block of stations are contiguous on disk, and seasonal subsets of days are then selected within each block.
+#######################################################################################################################
+
+dtype_obs = np.float32
+
+
+##########################################################
+# Create the store for the aligned rainfall observations #
+##########################################################
+def create_obs_store(DirOUT, stnids, lats, lons, dates, NumStns_block=10000):
+
+      # Notes:
+      # The observations are preallocated on disk and initialized with NaNs (one block of stations at a time to limit the memory used).
+      # The function returns the memory-mapped array, which can then be filled by slices.
+      np.save(DirOUT + "/stn_ids.npy", stnids)
+      np.save(DirOUT + "/stn_lats.npy", lats)
+      np.save(DirOUT + "/stn_lons.npy", lons)
+      np.save(DirOUT + "/dates.npy", dates)
+      obs = open_obs_array(DirOUT + "/obs.npy", (len(stnids), len(dates)), NumStns_block)
+      return obs
+
+
+##################################################################
+# Create a memory-mapped array for aligned rainfall observations #
+##################################################################
+def open_obs_array(FileOUT, shape, NumStns_block=10000):
+
+      obs = np.lib.format.open_memmap(FileOUT, mode="w+", dtype=dtype_obs, shape=shape)
+      for ind_start in range(0, shape[0], NumStns_block):
+            obs[ind_start:ind_start+NumStns_block,:] = np.nan
+      return obs
+
+
+#########################################################################
+# Read the aligned rainfall observations and the correspondent metadata #
+#########################################################################
+def read_obs_store(DirIN, mmap_mode="r"):
+
+      stnids = np.load(DirIN + "/stn_ids.npy")
+      lats = np.load(DirIN + "/stn_lats.npy")
+      lons = np.load(DirIN + "/stn_lons.npy")
+      dates = np.load(DirIN + "/dates.npy")
+      obs = np.load(DirIN + "/obs.npy", mmap_mode=mmap_mode)
+      return stnids, lats, lons, dates, obs
\ No newline at end of file
@@ -0,0 +1,240 @@
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# percentiles.py contains the functions to compute, for each station, the distribution of percentiles of a set of rainfall 
+# values (using the method of linear interpolation), processing the stations in blocks so the memory used stays within a 
+# given budget. The values for each block of stations are sorted only once, and all the requested percentiles are read 
+# off the sorted values. The results are the same (bit by bit) as the ones computed with np.nanpercentile.
+# When the values are rounded to a given resolution (e.g. 0.1 mm), the percentiles can also be computed without sorting:
+# the values are encoded as integer multiples of the resolution, the histogram of the values of each station is built 
+# with np.bincount, and the values on each side of each percentile are read off the cumulative counts. This takes a time
+# linear with the number of values (and almost independent of the number of percentiles), and the results are the same
+# as the ones obtained by sorting. The values read off the cumulative counts can also come from histograms that were
+# built beforehand (e.g. summing the histograms of single years, see histograms.py).
+# The percentiles computed for each forecasting system (with the highest percentiles set on the basis of how many
+# realizations the system provides) are also defined here, so the climatologies at stations and over the global grids
+# are computed for the same percentiles.
+#######################################################################################################################
+
+# Highest percentiles (above the 99th) computed for the year and seasonal climatologies of each forecasting system
+PercExtra_Systems = {
+      "HRES_46r1": ([99.5, 99.8, 99.9, 99.95], [99.5, 99.8]),
+      "Reforecasts_46r1": ([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995], [99.5, 99.8, 99.9, 99.95, 99.98]),
+      "ERA5_ShortRange": ([99.5, 99.8, 99.9, 99.95, 99.98], [99.5, 99.8, 99.9]),
+      "ERA5_EDA_ShortRange": ([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998], [99.5, 99.8, 99.9, 99.95, 99.98, 99.99]),
+      "ERA5_LongRange": ([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998], [99.5, 99.8, 99.9, 99.95, 99.98, 99.99]),
+      "ERA5_EDA_LongRange": ([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998], [99.5, 99.8, 99.9, 99.95, 99.98, 99.99]),
+      "ERA5_ecPoint/Grid_BC_VALS": ([99.5, 99.8, 99.9, 99.95, 99.98], [99.5, 99.8, 99.9]),
+      "ERA5_ecPoint/Pt_BC_PERC": ([99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999, 99.9995, 99.9998], [99.5, 99.8, 99.9, 99.95, 99.98, 99.99, 99.995, 99.998, 99.999])
+      }
+
+# Resolution of the rainfall values (in mm) and maximum number of bins in the histograms used to compute the percentiles by counting
+Counts_Resolution = 0.1
+MaxNumBins_Counts = 2**20
+
+
+######################################################################
+# Compute the distribution of percentiles for a block of stations #
+######################################################################
+def percentiles_block(data, percs, AddMinMax=True):
+
+      # Notes:
+      # data (2-d array, stations x realizations) can contain NaNs, which are ignored (as in np.nanpercentile).
+      # If AddMinMax is True, the minimum and the maximum values for each station are added to the realizations so they are not assigned to 
+      # the 0th and 100th percentile (as done with np.column_stack((min, data, max)) before calling np.nanpercentile).
+      # Sorting the values puts the NaNs at the end of each row, so the valid values for a station with n valid realizations are the first n 
+      # columns of the sorted block. Stations with the same number of valid values are processed together, and the percentiles are computed 
+      # with np.percentile on the sorted valid values, so the interpolation is exactly the same as the one in np.nanpercentile.
+      
+      data_sorted = np.sort(data, axis=1)
+      NumValid = np.sum(~np.isnan(data_sorted), axis=1)
+      percs = np.asarray(percs)
+      
+      # Stations with no valid values get NaN percentiles
+      dtype = np.percentile(np.zeros((1,1), dtype=data.dtype), percs, axis=1).dtype
+      climate = np.empty(percs.shape + (data.shape[0],), dtype=dtype) * np.nan
+      for n in np.unique(NumValid[NumValid > 0]):
+            ind_stns = np.where(NumValid == n)[0]
+            data_valid = data_sorted[ind_stns, 0:n]
+            if AddMinMax:
+                  data_valid = np.concatenate((data_valid[:, 0:1], data_valid, data_valid[:, (n-1):n]), axis=1)
+            climate[..., ind_stns] = np.percentile(data_valid, percs, axis=1)
+      
+      return climate
+
+
+###################################################################
+# Encode the values of a block as multiples of a given resolution #
+###################################################################
+def encode_values(data, Resolution=Counts_Resolution):
+
+      # Notes:
+      # The function returns the codes of the values (i.e. the bins of the histograms) and the value corresponding to each code. The NaNs are
+      # assigned to an extra bin after the ones of the valid values (whose value is NaN). None is returned when the values are not all multiples 
+      # of the resolution (i.e. when different values would share the same code), when they are not finite, or when they span too many bins.
+      # The codes increase with the values, so the order of the bins is the order of the sorted values. Negative zeros (e.g. from rounding 
+      # small negative values) share the bin of zero, and they are returned as zeros.
+      # For 16-bit values (e.g. the rainfall realizations stored as float16), the values are encoded only once for each bit pattern in the data,
+      # and the codes of the data are then looked up from their bit patterns.
+      if data.dtype.itemsize == 2:
+            data = np.ascontiguousarray(data)
+            patterns = np.bincount(data.view(np.uint16).ravel(), minlength=2**16) > 0
+            encoded = encode_values(np.arange(2**16, dtype=np.uint16)[patterns].view(data.dtype).astype(np.float32), Resolution)
+            if encoded is None:
+                  return None
+            codes_patterns = np.zeros(2**16, dtype=np.intp)
+            codes_patterns[patterns] = encoded[0]
+            return codes_patterns[data.view(np.uint16)], encoded[1].astype(data.dtype)
+
+      dtype_codes = np.float64 if data.dtype.itemsize > 4 else np.float32
+      codes = np.rint(data.astype(dtype_codes) / dtype_codes(Resolution))
+      valid = ~np.isnan(codes)
+      CodeMin = np.min(codes, where=valid, initial=np.inf)
+      CodeMax = np.max(codes, where=valid, initial=-np.inf)
+      if not np.any(valid):
+            CodeMin, CodeMax = 0, -1
+      elif (not np.isfinite(CodeMin)) or (not np.isfinite(CodeMax)) or (CodeMax - CodeMin + 1 > MaxNumBins_Counts):
+            return None
+      NumBins = int(CodeMax - CodeMin) + 1
+      codes -= CodeMin
+      codes[~valid] = NumBins
+      codes = codes.astype(np.intp)
+      values = np.zeros(NumBins + 1, dtype=data.dtype)
+      values[codes] = data
+      values[values == 0] = 0
+      values[NumBins] = np.nan
+      if not np.array_equal(values[codes], data, equal_nan=True):
+            return None
+      return codes, values
+
+
+########################################################################################
+# Compute the distribution of percentiles from the sorted distinct values (and counts) #
+########################################################################################
+def percentiles_counts(values, counts, Offsets, percs, AddMinMax=True):
+
+      # Notes:
+      # values (1-d array) contains the distinct valid values of each station in increasing order, and counts (1-d array) how many times each
+      # of them occurs. The values of station i are values[Offsets[i]:Offsets[i+1]] (i.e. Offsets has one element more than the stations).
+      # Stations with no values get NaN percentiles. The other arguments and the result are the same as in percentiles_block.
+      # The virtual index of each percentile, its neighbouring ranks and the linear interpolation between the values at those ranks are 
+      # computed as in np.percentile (method="linear"), so the results are the same as the ones obtained by sorting all the realizations.
+      Offsets = np.asarray(Offsets, dtype=np.int64)
+      NumStns = len(Offsets) - 1
+      percs = np.asarray(percs)
+      quantiles = np.true_divide(percs, 100).reshape(-1, 1)
+      dtype = np.percentile(np.zeros((1,1), dtype=values.dtype), percs, axis=1).dtype
+      climate = np.full((quantiles.shape[0], NumStns), np.nan, dtype=dtype)
+      ind_stns = np.where(Offsets[1:] > Offsets[:-1])[0]
+      if len(ind_stns) == 0:
+            return climate.reshape(percs.shape + (NumStns,))
+
+      # Adding the minimum and the maximum values of each station to its realizations
+      counts = np.array(counts, dtype=np.int64)
+      if AddMinMax:
+            counts[Offsets[ind_stns]] += 1
+            counts[Offsets[ind_stns + 1] - 1] += 1
+
+      # Finding the ranks (in the sorted values of each station) on each side of the percentiles, and their values
+      # Note: the cumulative counts run over all the stations, so the ranks of all the stations are found with a single search in one 
+      # increasing array, after shifting them by the total counts of the previous stations.
+      cum_counts = np.cumsum(counts)
+      offsets = np.concatenate(([0], cum_counts))[Offsets[ind_stns]]
+      NumR = cum_counts[Offsets[ind_stns + 1] - 1] - offsets
+      virtual_indexes = (NumR - 1) * quantiles
+      previous_indexes = np.minimum(np.floor(virtual_indexes), NumR - 1).astype(np.int64)
+      next_indexes = np.minimum(previous_indexes + 1, NumR - 1)
+      gamma = virtual_indexes - np.floor(virtual_indexes)
+      previous = values[np.searchsorted(cum_counts, previous_indexes + offsets, side="right")]
+      next = values[np.searchsorted(cum_counts, next_indexes + offsets, side="right")]
+
+      # Interpolating linearly between the values on each side of the percentiles (as in np.percentile)
+      diff_next_previous = next - previous
+      climate_stns = previous + diff_next_previous * gamma
+      np.subtract(next, diff_next_previous * (1 - gamma), out=climate_stns, where=gamma >= 0.5)
+      climate[:, ind_stns] = climate_stns
+
+      return climate.reshape(percs.shape + (NumStns,))
+
+
+###############################################################################
+# Compute the distribution of percentiles for a block of stations by counting #
+###############################################################################
+def percentiles_block_counts(data, percs, AddMinMax=True):
+
+      # Notes:
+      # The arguments and the result are the same as in percentiles_block. When the values in the block are not all multiples of Counts_Resolution, 
+      # the percentiles are computed by sorting (with percentiles_block).
+      # The histograms are built for batches of stations, so they do not take more memory than the block itself. The non-empty bins of each
+      # station (which are already in increasing order of value) are then passed to percentiles_counts.
+      encoded = encode_values(data)
+      if encoded is None:
+            return percentiles_block(data, percs, AddMinMax)
+      codes, values = encoded
+      NumStns = data.shape[0]
+      NumBins = len(values)
+      percs = np.asarray(percs)
+
+      dtype = np.percentile(np.zeros((1,1), dtype=data.dtype), percs, axis=1).dtype
+      climate = np.full((percs.size, NumStns), np.nan, dtype=dtype)
+      NumStns_batch = max(1, data.size // NumBins)
+      for ind_start in range(0, NumStns, NumStns_batch):
+            
+            # Building the histograms of the values of each station in the batch (the last bin, which counts the NaNs, is then dropped)
+            codes_batch = codes[ind_start:(ind_start + NumStns_batch)]
+            NumStns_b = codes_batch.shape[0]
+            counts = np.bincount((codes_batch + (np.arange(NumStns_b) * NumBins).reshape(-1, 1)).ravel(), minlength=NumStns_b * NumBins)
+            counts = counts.reshape(NumStns_b, NumBins)[:, 0:(NumBins - 1)]
+            
+            # Computing the percentiles from the non-empty bins of each station
+            rows, bins = np.nonzero(counts)
+            Offsets = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=NumStns_b))))
+            climate[:, ind_start:(ind_start + NumStns_b)] = percentiles_counts(values[bins], counts[rows, bins], Offsets, percs.ravel(), AddMinMax)
+
+      return climate.reshape(percs.shape + (NumStns,))
+
+
+##########################################################################
+# Compute the distribution of percentiles for all stations, block by block #
+##########################################################################
+def percentiles_stations(data_list, percs, ind_stns=None, AddMinMax=True, MaxMemory_GB=4, Method="sort"):
+
+      # Notes:
+      # data_list (list of 2-d arrays, stations x realizations) contains the realizations to be joined along the columns (e.g. one array per year). 
+      # The arrays can be memory-mapped (np.load(..., mmap_mode="r")), so only the rows of the block being processed are read into memory.
+      # ind_stns (1-d array) indicates the stations (rows) to consider. If None, all stations are considered.
+      # MaxMemory_GB (number, in GB) is the approximate maximum memory used to store each block of stations (the block and its sorted copy).
+      # Method (string) indicates whether the percentiles are computed by sorting the values ("sort") or by counting them ("counts", for values
+      # rounded to Counts_Resolution). Both methods give the same results.
+      # The result has the same shape as the one returned by np.nanpercentile(data, percs, axis=1), i.e. (percentiles, stations).
+
+      if ind_stns is None:
+            ind_stns = np.arange(data_list[0].shape[0])
+      ind_stns = np.asarray(ind_stns)
+      NumStns = len(ind_stns)
+      NumR = sum(data.shape[1] for data in data_list) + 2
+      ItemSize = np.result_type(*[data.dtype for data in data_list]).itemsize
+      NumStns_block = max(1, int((MaxMemory_GB * 1024**3) / (3 * NumR * ItemSize)))
+
+      percentiles_method = percentiles_block_counts if Method == "counts" else percentiles_block
+      dtype = np.percentile(np.zeros((1,1), dtype=np.result_type(*[data.dtype for data in data_list])), percs, axis=1).dtype
+      climate = np.empty(np.shape(percs) + (NumStns,), dtype=dtype)
+      for ind_start in range(0, NumStns, NumStns_block):
+            ind_block = ind_stns[ind_start:(ind_start + NumStns_block)]
+            data_block = np.concatenate([np.asarray(data[ind_block, :]) for data in data_list], axis=1)
+            climate[..., ind_start:(ind_start + len(ind_block))] = percentiles_method(data_block, percs, AddMinMax)
+      
+      return climate
+
+
+########################################################################
+# Percentiles to compute for the climatologies of a forecasting system #
+########################################################################
+def percentiles_system(SystemFC):
+
+      # Note: the function returns the percentiles for the year and for the seasonal climatologies (i.e. PercYear, PercSeason).
+      PercExtra_Year, PercExtra_Season = PercExtra_Systems[SystemFC]
+      PercYear = np.concatenate([np.arange(0,100), np.array(PercExtra_Year)])
+      PercSeason = np.concatenate([np.arange(0,100), np.array(PercExtra_Season)])
+      return PercYear, PercSeason
\ No newline at end of file
@@ -0,0 +1,220 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# pipeline.py contains the functions to run the chain of processing scripts as a graph of tasks. Each stage declares
+# the script to run, the arguments for each of its tasks (e.g. one task per year), the stages it depends on, and its
+# inputs/outputs. Each task is identified by a fingerprint computed from the content of the script (and of the shared
+# functions), its arguments, its inputs and the outputs of the stages it depends on. A task is run only when its
+# fingerprint changed since the last successful run (or when any of its outputs is missing or was changed), and the
+# tasks whose dependencies are completed are run in parallel on the local cores.
+# Note: the content of the files is hashed only once, and it is re-hashed only when the size or the modification time of
+# the file change. The fingerprints and the file hashes are stored in a state file (in json format).
+#######################################################################################################################
+
+# Lock to update the file hashes from the parallel tasks
+FileHash_lock = threading.Lock()
+
+
+##############################
+# Compute the hash of a file #
+##############################
+def hash_file(FileIN, FileHash_memory):
+
+      stat = os.stat(FileIN)
+      sign = [stat.st_size, stat.st_mtime_ns]
+      with FileHash_lock:
+            memo = FileHash_memory.get(FileIN)
+      if (memo is not None) and (memo[0:2] == sign):
+            return memo[2]
+
+      h = hashlib.sha1()
+      with open(FileIN, "rb") as f:
+            for block in iter(lambda: f.read(2**24), b""):
+                  h.update(block)
+      with FileHash_lock:
+            FileHash_memory[FileIN] = sign + [h.hexdigest()]
+      return h.hexdigest()
+
+
+###################################################################
+# List the files in a list of paths (files, directories or globs) #
+###################################################################
+def list_files(Paths):
+
+      Files = []
+      for Path in Paths:
+            for p in sorted(glob.glob(Path, recursive=True)):
+                  if os.path.isdir(p):
+                        for root, dirs, files in os.walk(p):
+                              dirs.sort()
+                              Files = Files + [os.path.join(root, f) for f in sorted(files)]
+                  else:
+                        Files.append(p)
+      return Files
+
+
+############################################################
+# Check that each path in a list matches at least one file #
+############################################################
+def paths_complete(Paths):
+
+      # Note: a path that matches only empty directories is considered missing.
+      return all(len(list_files([Path])) != 0 for Path in Paths)
+
+
+#######################################
+# Compute the hash of a list of paths #
+#######################################
+def hash_paths(Paths, FileHash_memory):
+
+      h = hashlib.sha1()
+      for FileIN in list_files(Paths):
+            h.update(FileIN.encode())
+            h.update(hash_file(FileIN, FileHash_memory).encode())
+      return h.hexdigest()
+
+
+###########################################
+# Build the list of tasks from the stages #
+###########################################
+def build_tasks(Pipeline, Git_repo, DirScripts):
+
+      # Notes:
+      # Each stage is a dictionary with the keys:
+      #     - "Stage" (string): name of the stage.
+      #     - "Script" (string): name of the script to run (in DirScripts). If None, the tasks of the stage are not run and their outputs are used as they are.
+      #     - "Args" (list of lists): arguments to pass to the script for each task of the stage (e.g. [[2000], [2001], ...] to run one task per year).
+      #     - "Depends" (list of strings): names of the stages the stage depends on. A task runs only when all the tasks of these stages are completed.
+      #     - "Inputs" (list of strings): paths (files, directories or globs, relative to Git_repo) of the inputs not produced by other stages (e.g. raw data).
+      #     - "Outputs" (list of strings): paths (files, directories or globs, relative to Git_repo) of the outputs of each task.
+      # The paths in "Inputs" and "Outputs" can contain the arguments of the task as {0}, {1}, etc.
+      Tasks = {}
+      TaskIDs_stage = {}
+      for Stage in Pipeline:
+            TaskIDs_stage[Stage["Stage"]] = []
+            for Args in Stage.get("Args", [[]]):
+                  Args = [str(a) for a in Args]
+                  TaskID = "_".join([Stage["Stage"]] + Args)
+                  Tasks[TaskID] = {
+                        "ID": TaskID,
+                        "Script": (DirScripts + "/" + Stage["Script"]) if Stage["Script"] is not None else None,
+                        "Args": Args,
+                        "Depends": [TaskID_dep for Stage_dep in Stage.get("Depends", []) for TaskID_dep in TaskIDs_stage[Stage_dep]],
+                        "Inputs": [Git_repo + "/" + Path.format(*Args) for Path in Stage.get("Inputs", [])],
+                        "Outputs": [Git_repo + "/" + Path.format(*Args) for Path in Stage.get("Outputs", [])]
+                        }
+                  TaskIDs_stage[Stage["Stage"]].append(TaskID)
+      return Tasks
+
+
+########################################
+# Read/write the state of the pipeline #
+########################################
+def read_state(FileState):
+      if os.path.exists(FileState):
+            with open(FileState) as f:
+                  return json.load(f)
+      return {"Files": {}, "Tasks": {}}
+
+
+def write_state(State, FileState):
+      with FileHash_lock:
+            with open(FileState + ".tmp", "w") as f:
+                  json.dump(State, f, indent=1, sort_keys=True)
+      os.replace(FileState + ".tmp", FileState)
+
+
+##############
+# Run a task #
+##############
+def run_task(Task, Hash_Depends, Hash_Code, State, DirLog, Force):
+
+      # Using the outputs as they are for the tasks that are not run
+      if Task["Script"] is None:
+            return "Kept", None, hash_paths(Task["Outputs"], State["Files"])
+
+      # Computing the fingerprint of the task
+      h = hashlib.sha1()
+      h.update(hash_file(Task["Script"], State["Files"]).encode())
+      h.update(Hash_Code.encode())
+      h.update(json.dumps(Task["Args"]).encode())
+      h.update(hash_paths(Task["Inputs"], State["Files"]).encode())
+      for TaskID_dep in Task["Depends"]:
+            h.update(Hash_Depends[TaskID_dep].encode())
+      Fingerprint = h.hexdigest()
+
+      # Skipping the task if it was already run with the same fingerprint and its outputs are still there, unchanged
+      # Note: each output path must match at least one file, and the hash of the outputs must be the one saved after the last run (the files are
+      # re-hashed only if their size or modification time changed).
+      State_task = State["Tasks"].get(Task["ID"])
+      if (not Force) and (State_task is not None) and (State_task["Fingerprint"] == Fingerprint) and paths_complete(Task["Outputs"]):
+            if hash_paths(Task["Outputs"], State["Files"]) == State_task["Outputs"]:
+                  return "Skipped", Fingerprint, State_task["Outputs"]
+
+      # Running the task from the directory of the script (so the shared functions can be imported)
+      FileLog = DirLog + "/" + Task["ID"].replace("/", "_") + ".log"
+      with open(FileLog, "w") as log:
+            p = subprocess.run([sys.executable, os.path.basename(Task["Script"])] + Task["Args"], cwd=os.path.dirname(Task["Script"]), stdout=log, stderr=subprocess.STDOUT)
+      if p.returncode != 0:
+            return "Failed", Fingerprint, None
+      return "Run", Fingerprint, hash_paths(Task["Outputs"], State["Files"])
+
+
+####################
+# Run the pipeline #
+####################
+def run_pipeline(Pipeline, Git_repo, DirScripts, DirLog, FileState, NumWorkers=None, Force=False):
+
+      # Notes:
+      # Force (boolean) runs all the tasks even if their fingerprint did not change.
+      # The tasks whose dependencies failed are not run. The state is written after each task, so an interrupted run can be resumed.
+      if not os.path.exists(DirLog):
+            os.makedirs(DirLog)
+      Tasks = build_tasks(Pipeline, Git_repo, DirScripts)
+      State = read_state(FileState)
+      Hash_Code = hash_paths([DirScripts + "/Functions/*.py"], State["Files"])
+
+      Hash_Depends = {}
+      Status = {}
+      Pending = list(Tasks)
+      Running = {}
+      with ThreadPoolExecutor(max_workers=NumWorkers or os.cpu_count()) as pool:
+            while Pending or Running:
+
+                  # Submitting the tasks whose dependencies are completed
+                  for TaskID in list(Pending):
+                        Task = Tasks[TaskID]
+                        if any(Status.get(TaskID_dep) in ["Failed", "Blocked"] for TaskID_dep in Task["Depends"]):
+                              Pending.remove(TaskID)
+                              Status[TaskID] = "Blocked"
+                              print(" - " + TaskID + ": not run because some of its dependencies failed")
+                        elif all(TaskID_dep in Hash_Depends for TaskID_dep in Task["Depends"]):
+                              Pending.remove(TaskID)
+                              Running[pool.submit(run_task, Task, Hash_Depends, Hash_Code, State, DirLog, Force)] = TaskID
+                  if not Running:
+                        continue
+
+                  # Collecting the completed tasks
+                  Done = wait(Running, return_when=FIRST_COMPLETED)[0]
+                  for future in Done:
+                        TaskID = Running.pop(future)
+                        Status[TaskID], Fingerprint, Hash_Outputs = future.result()
+                        print(" - " + TaskID + ": " + Status[TaskID])
+                        if Status[TaskID] == "Kept":
+                              Hash_Depends[TaskID] = Hash_Outputs
+                        elif Status[TaskID] != "Failed":
+                              Hash_Depends[TaskID] = Hash_Outputs
+                              State["Tasks"][TaskID] = {"Fingerprint": Fingerprint, "Outputs": Hash_Outputs}
+                        else:
+                              State["Tasks"].pop(TaskID, None)
+                        write_state(State, FileState)
+
+      return Status
\ No newline at end of file
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from Functions.nearest_gridpoint import Earth_Radius, hash_arrays, great_circle_distance
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# spatial_index.py contains the functions to build a spatial index for a set of points (e.g. rain stations) and to query
+# it for the points in a region (lat/lon box or spherical cap) or for the nearest point to a set of locations. The index
+# is a KD-tree (scipy.spatial.cKDTree) built on the points converted to 3-d unit vectors, so the distances in the tree
+# (chords) increase with the great-circle distances, and the queries are not affected by the dateline or by the poles.
+# The index for a given set of points is built only once in each run.
+#######################################################################################################################
+
+# Indexes already built in the current run (for each set of points)
+SpatialIndex_memory = {}
+
+
+##########################################
+# Convert lat/lon coordinates to vectors #
+##########################################
+def unit_vectors(lats, lons):
+      lats = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)))
+      lons = np.radians(np.atleast_1d(np.asarray(lons, dtype=np.float64)))
+      return np.column_stack((np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)))
+
+
+###########################
+# Build the spatial index #
+###########################
+def spatial_index(lats, lons):
+
+      # Note: the longitudes are considered in the range [-180, 180).
+      PointsID = hash_arrays(lats, lons)
+      if PointsID in SpatialIndex_memory:
+            return SpatialIndex_memory[PointsID]
+
+      lats = np.asarray(lats, dtype=np.float64)
+      lons = (np.asarray(lons, dtype=np.float64) + 180) % 360 - 180
+      index = {"lats": lats, "lons": lons, "tree": cKDTree(unit_vectors(lats, lons))}
+      SpatialIndex_memory[PointsID] = index
+      return index
+
+
+######################################
+# Select the points in a lat/lon box #
+######################################
+def select_area(index, area):
+
+      # Notes:
+      # area (list of numbers) defines the box as [South, West, North, East] (as in Metview). When West > East, the box crosses the dateline.
+      # The function returns the indices of the points in the box, in increasing order.
+      # A lat/lon box is not a region of the tree (i.e. a ball), so the points are selected with a single vectorised comparison over all of them.
+      South, West, North, East = area
+      Span = 360.0 if (East - West) >= 360 else (East - West) % 360
+      dlons = (index["lons"] - West) % 360
+      inside = (index["lats"] >= South) & (index["lats"] <= North) & (dlons <= Span)
+      return np.where(inside)[0]
+
+
+#####################################################
+# Select the points within a distance of a location #
+#####################################################
+def select_radius(index, lat, lon, Radius_km):
+
+      # Note: the points within the chord corresponding to the given distance are searched in the tree, and then only the points within the given
+      # great-circle distance are kept (so the result does not depend on the rounding of the chord).
+      Chord = 2 * np.sin(min(np.pi, Radius_km / Earth_Radius) / 2)
+      ind = np.array(sorted(index["tree"].query_ball_point(unit_vectors(lat, lon)[0], Chord * (1 + 1e-9))), dtype=np.int64)
+      return ind[great_circle_distance(lat, lon, index["lats"][ind], index["lons"][ind]) <= Radius_km]
+
+
+###################################################################
+# Find the nearest point (and its distance) to a set of locations #
+###################################################################
+def nearest_point(index, lats, lons):
+
+      # Note: the function returns the indices of the nearest points and their distances (in km).
+      lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+      lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+      if index["lats"].size == 0:
+            return np.full(lats.size, -1, dtype=np.int64), np.full(lats.size, np.nan)
+      ind_nearest = index["tree"].query(unit_vectors(lats, lons))[1].astype(np.int64)
+      return ind_nearest, great_circle_distance(lats, lons, index["lats"][ind_nearest], index["lons"][ind_nearest])
\ No newline at end of file
@@ -0,0 +1,137 @@
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# station_registry.py contains the functions to build the registry of the unique stations present in a stream of
+# observations (e.g. day by day over a year, or year by year over a period). The registry contains, sorted by station id,
+# the lat/lon and the level (elevation) where each station was first seen (i.e. its canonical coordinates, used to align
+# the observations), the lat/lon where it was last seen, the first/last date in which it was seen, the number of times it
+# was seen, and a flag for the stations whose coordinates changed over the stream (i.e. moved stations).
+# The registry is updated with each new batch of observations (without keeping all the observations in memory), so its
+# size depends only on the number of unique stations. The registries of consecutive batches (e.g. years) are merged with
+# the same function, so the registry for the whole period does not need to read the observations again.
+#######################################################################################################################
+
+# Fields in a registry (and names of the files in which they are saved)
+Registry_Fields = ["stnids", "lats", "lons", "levels", "lats_last", "lons_last", "dates_first", "dates_last", "counts", "moved"]
+
+# Minimum change in the coordinates of a station (in degrees) to consider the station as moved
+Moved_Tolerance = 0.01
+
+
+############################
+# Create an empty registry #
+############################
+def create_registry():
+      return {
+            "stnids": np.array([], dtype="U1"),
+            "lats": np.array([]), "lons": np.array([]), "levels": np.array([]),
+            "lats_last": np.array([]), "lons_last": np.array([]),
+            "dates_first": np.array([], dtype=np.int64), "dates_last": np.array([], dtype=np.int64),
+            "counts": np.array([], dtype=np.int64),
+            "moved": np.array([], dtype=bool)
+            }
+
+
+###########################################
+# Check if two sets of coordinates differ #
+###########################################
+def coordinates_differ(lats1, lons1, lats2, lons2):
+
+      # Note: the difference in longitude is computed on the circle (e.g. -180 and 180 are the same longitude).
+      dlons = (np.asarray(lons1) - np.asarray(lons2) + 180) % 360 - 180
+      return (np.abs(np.asarray(lats1) - np.asarray(lats2)) > Moved_Tolerance) | (np.abs(dlons) > Moved_Tolerance)
+
+
+##############################################
+# Update a registry with a batch of stations #
+##############################################
+def update_registry(registry, batch):
+
+      # Notes:
+      # batch (dictionary) contains the arrays "stnids", "lats" and "lons" of the stations in the batch, and optionally "levels" and "dates" (in
+      # YYYYMMDD format, as an array or as a single date for the whole batch). When the batch is itself a registry (e.g. the registry of the 
+      # following year), it also contains the fields "lats_last", "lons_last", "dates_last", "counts" and "moved", and "dates" contains its first dates.
+      # The stations in the batch are considered in the order they are given. If a station appears more than once in the batch, its first
+      # lat/lon/level/date are the ones in its first occurrence, and its last lat/lon/date the ones in its last occurrence.
+      stnids = np.asarray(batch["stnids"], dtype=str)
+      NumRows = stnids.size
+      if NumRows == 0:
+            return registry
+      field = lambda Name, Default, dtype: np.broadcast_to(np.asarray(batch[Name] if batch.get(Name) is not None else Default, dtype=dtype), (NumRows,))
+      lats = field("lats", np.nan, np.float64)
+      lons = field("lons", np.nan, np.float64)
+      levels = field("levels", np.nan, np.float64)
+      dates = field("dates", 0, np.int64)
+      lats_last = field("lats_last", lats, np.float64)
+      lons_last = field("lons_last", lons, np.float64)
+      dates_last = field("dates_last", dates, np.int64)
+      counts = field("counts", 1, np.int64)
+      moved = field("moved", False, bool)
+
+      # Reducing the batch to its unique stations
+      stnids_batch, ind_first, inverse = np.unique(stnids, return_index=True, return_inverse=True)
+      inverse = inverse.ravel()
+      ind_last = NumRows - 1 - np.unique(stnids[::-1], return_index=True)[1]
+      counts_batch = np.bincount(inverse, weights=counts, minlength=stnids_batch.size).astype(np.int64)
+
+      # Updating the last position/date and the counts of the stations already in the registry
+      pos = np.searchsorted(registry["stnids"], stnids_batch)
+      found = pos < registry["stnids"].size
+      found[found] = registry["stnids"][pos[found]] == stnids_batch[found]
+      registry["lats_last"][pos[found]] = lats_last[ind_last[found]]
+      registry["lons_last"][pos[found]] = lons_last[ind_last[found]]
+      registry["dates_last"][pos[found]] = dates_last[ind_last[found]]
+      registry["counts"][pos[found]] = registry["counts"][pos[found]] + counts_batch[found]
+
+      # Inserting the new stations (keeping the registry sorted by station id)
+      new = ~found
+      if np.any(new):
+            pos_new = pos[new]
+            ind_first_new = ind_first[new]
+            ind_last_new = ind_last[new]
+            dtype_stnids = np.promote_types(registry["stnids"].dtype, stnids_batch.dtype)
+            registry["stnids"] = np.insert(registry["stnids"].astype(dtype_stnids), pos_new, stnids_batch[new])
+            registry["lats"] = np.insert(registry["lats"], pos_new, lats[ind_first_new])
+            registry["lons"] = np.insert(registry["lons"], pos_new, lons[ind_first_new])
+            registry["levels"] = np.insert(registry["levels"], pos_new, levels[ind_first_new])
+            registry["lats_last"] = np.insert(registry["lats_last"], pos_new, lats_last[ind_last_new])
+            registry["lons_last"] = np.insert(registry["lons_last"], pos_new, lons_last[ind_last_new])
+            registry["dates_first"] = np.insert(registry["dates_first"], pos_new, dates[ind_first_new])
+            registry["dates_last"] = np.insert(registry["dates_last"], pos_new, dates_last[ind_last_new])
+            registry["counts"] = np.insert(registry["counts"], pos_new, counts_batch[new])
+            registry["moved"] = np.insert(registry["moved"], pos_new, False)
+
+      # Flagging the stations seen in the batch with coordinates different from their canonical ones (or already flagged in the batch)
+      pos_rows = np.searchsorted(registry["stnids"], stnids)
+      differ = coordinates_differ(lats, lons, registry["lats"][pos_rows], registry["lons"][pos_rows])
+      differ = differ | coordinates_differ(lats_last, lons_last, registry["lats"][pos_rows], registry["lons"][pos_rows]) | moved
+      registry["moved"][pos_rows[differ]] = True
+      return registry
+
+
+##########################################
+# Merge a list of consecutive registries #
+##########################################
+def merge_registries(registry_list):
+
+      # Note: the registries must be given in chronological order (the canonical coordinates are taken from the first registry in which a station
+      # is seen, and the last coordinates from the last one).
+      registry = create_registry()
+      for registry_batch in registry_list:
+            registry = update_registry(registry, dict(registry_batch, dates=registry_batch["dates_first"]))
+      return registry
+
+
+########################
+# Save/read a registry #
+########################
+def save_registry(DirOUT, registry, Suffix=""):
+
+      # Note: each field is saved in the file "<DirOUT>/<field>_unique<Suffix>.npy" (e.g. stnids_unique_2000.npy for Suffix="_2000").
+      for Field in Registry_Fields:
+            np.save(DirOUT + "/" + Field + "_unique" + Suffix + ".npy", registry[Field])
+
+
+def read_registry(DirIN, Suffix=""):
+      return {Field: np.load(DirIN + "/" + Field + "_unique" + Suffix + ".npy") for Field in Registry_Fields}
\ No newline at end of file
@@ -0,0 +1,65 @@
+from Functions.nearest_gridpoint import hash_arrays
+from Functions.grib_decode import read_grib_stations
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# step_accumulator.py contains the functions to compute rainfall totals over an accumulation window from forecast files
+# that contain the rainfall accumulated over single steps (e.g. hourly steps for ERA5 short-range forecasts). Each step 
+# file is decoded only once, and only its values at the stations are kept (not the full field). The total over the 
+# window is then the sum of the values at the stations for the steps in the window. The values of the steps shared by
+# consecutive windows are kept in memory, so they are not decoded again, and the ones that are not in the current window
+# anymore are dropped (so only the steps of one window are kept in memory). The same applies to the rainfall totals
+# computed as the difference between two steps of a forecast (e.g. the end step of a window is the start step of the next).
+#######################################################################################################################
+
+# Values at the stations for the steps in the current window
+StepValues_memory = {}
+
+
+################################################
+# Read the values at the stations for one step #
+################################################
+def read_step_values(FileIN, stn_lats, stn_lons, DirCache, Backend="metview"):
+
+      # Notes:
+      # The result has dimensions (stations) for a single field or (fields, stations) for a file with more than one field (e.g. ensemble members).
+      # Backend (string) indicates how the grib files are decoded (see grib_decode.py).
+      Key = (FileIN, hash_arrays(stn_lats, stn_lons))
+      if Key not in StepValues_memory:
+            StepValues_memory[Key] = read_grib_stations(FileIN, stn_lats, stn_lons, DirCache, Backend)
+      return StepValues_memory[Key]
+
+
+#############################################
+# Keep in memory only the steps in a window #
+#############################################
+def keep_steps(Files):
+      for Key in [Key for Key in StepValues_memory if Key[0] not in Files]:
+            del StepValues_memory[Key]
+
+
+#################################################################
+# Compute the total at the stations over an accumulation window #
+#################################################################
+def accumulate_steps(Files, stn_lats, stn_lons, DirCache, Backend="metview"):
+
+      # Notes:
+      # Files (list of strings) contains the step files in the accumulation window. The steps are summed in the order they are given (as when
+      # summing the full fields), so the totals are the same as the ones extracted from the sum of the full fields.
+      keep_steps(Files)
+      tp = 0
+      for FileIN in Files:
+            tp = tp + read_step_values(FileIN, stn_lats, stn_lons, DirCache, Backend)
+      return tp
+
+
+#####################################################################
+# Compute the total at the stations between two steps of a forecast #
+#####################################################################
+def difference_steps(FileIN_1, FileIN_2, stn_lats, stn_lons, DirCache, Backend="metview"):
+
+      # Notes:
+      # FileIN_1 and FileIN_2 (strings) contain the rainfall accumulated from the start of the forecast to the start and to the end of the window.
+      # The values are extracted at the stations before taking the difference, which gives the same totals as the difference of the full fields.
+      keep_steps([FileIN_1, FileIN_2])
+      return read_step_values(FileIN_2, stn_lats, stn_lons, DirCache, Backend) - read_step_values(FileIN_1, stn_lats, stn_lons, DirCache, Backend)
\ No newline at end of file
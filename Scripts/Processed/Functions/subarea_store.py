@@ -0,0 +1,146 @@
+import os
+from os.path import exists
+from datetime import datetime, timedelta
+import json
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# subarea_store.py contains the functions to write and read the rainfall realizations of global fields split into
+# sub-areas (i.e. ranges of consecutive grid-boxes). Each sub-area is stored in its own array on disk (tp_SA<NNN>.npy),
+# with dimensions (realizations x grid-boxes), preallocated for all the realizations in the considered period. Each
+# global field is then read only once, and its slices are written as the next row of each sub-area array (so the
+# writes are sequential appends). The realizations of a sub-area are then read from contiguous storage, without
+# decoding again the global fields. A header (SA_header.json) records the number of grid-boxes in the global fields,
+# the exact range of global indices of each sub-area, and the number of realizations, so the sub-areas can be mapped
+# back to the global fields. The sub-areas cover all the grid-boxes in the global fields.
+# The rainfall realizations of the forecasts are chunked into sub-areas one year at a time (<DirOUT>/<System_FC>/<Year>), so 
+# the realizations over a period are read by joining the rows of the sub-areas of the years it covers.
+#######################################################################################################################
+
+dtype_tp = np.float32
+
+
+##########################################
+# Split the global fields into sub-areas #
+##########################################
+def subarea_ranges(NumGB_G, NumSA):
+
+      # Notes:
+      # The function returns the indices (start, end) of the grid-boxes of each sub-area in the global fields, with the end excluded (as in 
+      # tp_G[start:end]). The sizes of the sub-areas differ at most by one grid-box, so all the grid-boxes are covered (also when NumGB_G is not 
+      # a multiple of NumSA).
+      bounds = (np.arange(NumSA+1, dtype=np.int64) * NumGB_G) // NumSA
+      return [(int(bounds[ind]), int(bounds[ind+1])) for ind in range(NumSA)]
+
+
+###################################
+# Name of the array of a sub-area #
+###################################
+def file_subarea(DirIN, ind_SA):
+      return DirIN + "/tp_SA" + f"{ind_SA:03d}" + ".npy"
+
+
+######################################################
+# Create the (memory-mapped) arrays of the sub-areas #
+######################################################
+def create_subarea_stores(DirOUT, SA_ranges, NumR):
+
+      # Notes:
+      # SA_ranges (list of tuples) contains the indices (start, end) of the grid-boxes of each sub-area in the global fields, with the end excluded
+      # (as in tp_G[start:end]). The sub-areas are numbered from 1, in the order they are given.
+      # The arrays are not initialized, so each row must be written (with NaNs when the global field is not available).
+      if not exists(DirOUT):
+            os.makedirs(DirOUT)
+      write_subarea_header(DirOUT, SA_ranges, NumR)
+      stores = []
+      for ind_SA in range(1, len(SA_ranges)+1):
+            NumGB_SA = SA_ranges[ind_SA-1][1] - SA_ranges[ind_SA-1][0]
+            stores.append(np.lib.format.open_memmap(file_subarea(DirOUT, ind_SA), mode="w+", dtype=dtype_tp, shape=(NumR, NumGB_SA)))
+      return stores
+
+
+#############################################################
+# Write the slices of a global field in the sub-area arrays #
+#############################################################
+def write_subareas(stores, SA_ranges, indR, tp_G):
+
+      # Note: if tp_G is None (i.e. the global field is not available), the row is filled with NaNs.
+      if (tp_G is not None) and (len(tp_G) != SA_ranges[-1][1]):
+            raise ValueError("The global field has " + str(len(tp_G)) + " grid-boxes, but the sub-areas cover " + str(SA_ranges[-1][1]) + " grid-boxes")
+      for ind_SA in range(len(SA_ranges)):
+            if tp_G is None:
+                  stores[ind_SA][indR,:] = np.nan
+            else:
+                  stores[ind_SA][indR,:] = tp_G[SA_ranges[ind_SA][0]:SA_ranges[ind_SA][1]]
+
+
+##########################################
+# Write/read the header of the sub-areas #
+##########################################
+def write_subarea_header(DirOUT, SA_ranges, NumR):
+      with open(DirOUT + "/SA_header.json", "w") as f:
+            json.dump({"NumGB_G": SA_ranges[-1][1], "NumSA": len(SA_ranges), "NumR": NumR, "SA_ranges": SA_ranges}, f)
+
+
+def read_subarea_header(DirIN):
+
+      # Note: the function returns the indices (start, end) of the grid-boxes of each sub-area in the global fields, and the number of realizations.
+      with open(DirIN + "/SA_header.json") as f:
+            header = json.load(f)
+      return [tuple(SA_range) for SA_range in header["SA_ranges"]], header["NumR"]
+
+
+#######################################
+# Read the realizations of a sub-area #
+#######################################
+def read_subarea(DirIN, ind_SA, mmap_mode="r"):
+      return np.load(file_subarea(DirIN, ind_SA), mmap_mode=mmap_mode)
+
+
+#########################################################
+# Name of the grib file of a global forecast for a step #
+#########################################################
+def file_fc(DirIN, BaseDateTime, Step):
+      return DirIN + "/" + BaseDateTime.strftime("%Y") + "/" + BaseDateTime.strftime("%Y%m%d%H") + "/tp_" + BaseDateTime.strftime("%Y%m%d") + "_" + BaseDateTime.strftime("%H") + "_" + f"{Step:03d}" + ".grib"
+
+
+############################################################################
+# Chunk the rainfall realizations of the global forecasts for a given year #
+############################################################################
+def chunk_year(Year, DirIN, DirOUT, SA_ranges, StepS, StepF, Acc, read_values):
+
+      # Notes:
+      # DirIN (string) contains the global forecasts of a forecasting system (<DirIN>/<YYYY>/<YYYYMMDDHH>/tp_<YYYYMMDD>_<HH>_<SSS>.grib), and DirOUT
+      # (string) the sub-areas for the given year. read_values is a function that returns the values of the global field in a grib file (e.g. 
+      # lambda FileIN: mv.values(mv.read(FileIN))).
+      # The realizations are stored day by day (for the forecasts with base time 00 UTC), and step by step within each day. The rainfall 
+      # accumulated up to the end of a step is also the one accumulated up to the start of the following step, so each grib file is read only 
+      # once. When a forecast is missing, the realizations are set to NaN.
+      BaseDateTimeS = datetime(Year,1,1,0)
+      BaseDateTimeF = datetime(Year,12,31,0)
+      NumR = int( ( ( BaseDateTimeF - BaseDateTimeS ).days + 1 ) * ( (StepF - StepS) / Acc) )
+      stores = create_subarea_stores(DirOUT, SA_ranges, NumR)
+
+      indR = 0
+      BaseDateTime = BaseDateTimeS
+      while BaseDateTime <= BaseDateTimeF:
+            print(" - " + BaseDateTime.strftime("%Y%m%d"))
+            tp2 = None
+            for Step1 in range (StepS, StepF - Acc + 1, Acc):
+                  Step2 = Step1 + Acc
+                  FileIN1 = file_fc(DirIN, BaseDateTime, Step1)
+                  FileIN2 = file_fc(DirIN, BaseDateTime, Step2)
+                  tp1 = tp2 if tp2 is not None else (read_values(FileIN1) if exists(FileIN1) else None)
+                  tp2 = read_values(FileIN2) if exists(FileIN2) else None
+                  if (tp1 is not None) and (tp2 is not None):
+                        write_subareas(stores, SA_ranges, indR, np.around((tp2 - tp1) * 1000, decimals=2))
+                  else:
+                        print("   WARNING! Missing forecasts for (t+" + str(Step1) + ",t+" + str(Step2) + "). The realizations are set to NaN.")
+                        write_subareas(stores, SA_ranges, indR, None)
+                  indR += 1
+            BaseDateTime += timedelta(days=1)
+
+      for store in stores:
+            store.flush()
+      return NumR
\ No newline at end of file
@@ -0,0 +1,27 @@
+import numpy as np
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# unique_obs.py contains the functions to select, from the observations of an extra dataset/time, the stations that were
+# not already considered in the reference dataset/time or in the previous extra datasets/times. The ids of the stations
+# already considered are kept in a set, so each new station is checked with a single look-up, and the rows of the unique
+# stations are selected with one boolean mask instead of searching each station in the list of the extra stations.
+#######################################################################################################################
+
+
+#########################################################################
+# Select the rows of the stations not already considered in a given set #
+#########################################################################
+def select_unique_stations(stnids_extra, stnids_seen):
+
+      # Notes:
+      # stnids_seen (set) contains the ids of the stations already considered, and it is updated with the ids of the selected stations.
+      # The function returns the indices of the rows in stnids_extra for the stations not in stnids_seen, sorted by station id. When a station 
+      # appears more than once in stnids_extra, its first occurrence is selected.
+      stnids_extra = np.asarray(stnids_extra)
+      if stnids_extra.size == 0:
+            return np.array([], dtype=int)
+      stnids_sorted, ind_first = np.unique(stnids_extra, return_index=True)
+      new = np.fromiter((stnid not in stnids_seen for stnid in stnids_sorted.tolist()), dtype=bool, count=stnids_sorted.size)
+      stnids_seen.update(stnids_sorted[new].tolist())
+      return ind_first[new]
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+from os.path import exists
+import sys
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# year_driver.py contains the functions to run a processing script that can be split by year (i.e. that takes the year
+# to process as its first argument) over a range of years, using a pool of processes. Each year is run in its own
+# process, with a limit on the memory it can allocate. The years that fail are re-submitted a given number of times,
+# and a completion marker is written for each year that completes, so an interrupted batch resumes from the years that
+# were not completed. The scripts split by year are the stages 01, 02, 03, 05 and 10 in Scripts/Processed, and the
+# chunker of the global forecasts (External_Resources/12_Compute_Chunk_FC.py). Each script is run from its own directory.
+#######################################################################################################################
+
+
+###########################################
+# Limit the memory allocated by a process #
+###########################################
+def limit_memory(MaxMemory_GB):
+
+      # Note: the limit is set on the data segment (heap and anonymous memory), so memory-mapped files are not counted.
+      if MaxMemory_GB is not None:
+            limit = int(MaxMemory_GB * 1024**3)
+            resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+#################################
+# Run a script for a given year #
+#################################
+def run_year(Script, Year, MaxMemory_GB, FileLog):
+
+      with open(FileLog, "a") as log:
+            log.write("\n##### " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + " - Running " + os.path.basename(Script) + " " + str(Year) + "\n")
+            log.flush()
+            p = subprocess.run([sys.executable, os.path.basename(Script), str(Year)], cwd=os.path.dirname(os.path.abspath(Script)), stdout=log, stderr=subprocess.STDOUT, preexec_fn=lambda: limit_memory(MaxMemory_GB))
+      return p.returncode
+
+
+##################################################
+# Run a script over a range of years in parallel #
+##################################################
+def run_years(Script, Years, DirMarkers, NumWorkers=None, MaxMemory_GB=None, NumRetries=2, Force=False):
+
+      # Notes:
+      # The completion marker for a given year is the file "<DirMarkers>/<script name>_<year>.done", and the log of the script for a given
+      # year is the file "<DirMarkers>/<script name>_<year>.log". If Force is True, the years are run even if they were already completed.
+      # The function returns the list of the years that could not be completed.
+      if not exists(DirMarkers):
+            os.makedirs(DirMarkers)
+      NameScript = os.path.splitext(os.path.basename(Script))[0]
+      FileMarker = lambda Year: DirMarkers + "/" + NameScript + "_" + str(Year) + ".done"
+      FileLog = lambda Year: DirMarkers + "/" + NameScript + "_" + str(Year) + ".log"
+
+      # Selecting the years that were not completed yet
+      Years_todo = [Year for Year in Years if Force or not exists(FileMarker(Year))]
+      for Year in Years:
+            if Year not in Years_todo:
+                  print(" - " + str(Year) + ": already completed")
+
+      # Running the years in parallel, re-submitting the ones that fail
+      Attempts = {Year: 0 for Year in Years_todo}
+      Years_failed = []
+      with ProcessPoolExecutor(max_workers=NumWorkers, mp_context=multiprocessing.get_context("fork")) as pool:
+            Running = {pool.submit(run_year, Script, Year, MaxMemory_GB, FileLog(Year)): Year for Year in Years_todo}
+            while Running:
+                  Done = wait(Running, return_when=FIRST_COMPLETED)[0]
+                  for future in Done:
+                        Year = Running.pop(future)
+                        Attempts[Year] = Attempts[Year] + 1
+                        if future.result() == 0:
+                              with open(FileMarker(Year), "w") as f:
+                                    f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n")
+                              print(" - " + str(Year) + ": completed")
+                        elif Attempts[Year] <= NumRetries:
+                              print(" - " + str(Year) + ": failed (attempt " + str(Attempts[Year]) + "). Re-submitting...")
+                              Running[pool.submit(run_year, Script, Year, MaxMemory_GB, FileLog(Year))] = Year
+                        else:
+                              print(" - " + str(Year) + ": failed (attempt " + str(Attempts[Year]) + "). See " + FileLog(Year))
+                              Years_failed.append(Year)
+
+      return sorted(Years_failed)
\ No newline at end of file
@@ -0,0 +1,44 @@
+import sys
+from Functions.obs_archive import ingest_year
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# Ingest_OBS_Archive.py packs the geopoint files with the rainfall observations of each dataset (one file per valid
+# date/time, in <DirIN>/<Dataset>/<YYYYMMDD>/tp<Acc>_obs_<YYYYMMDDHH>.geo) into one archive file per dataset and year
+# (<DirOUT>/<Dataset>/tp<Acc>_obs_<YYYY>.npz), with an index of the valid dates/times that have observations. The stages
+# that read the observations (01, 02 and Plot_TempDistr_OBS.py) read directly from the archives when they exist.
+# The script needs to be run only once for each dataset and year (a year can also be given as argument, e.g. when running 
+# the script with Run_Years.py).
+
+# DESCRIPTION OF INPUT PARAMETERS
+# YearS (number, in YYYY format): start year to consider.
+# YearF (number, in YYYY format): final year to consider.
+# Acc (number, in hours): rainfall accumulation period.
+# Dataset_list (list of strings): names of the datasets to consider.
+# Git_repo (string): path of local github repository
+# DirIN (string): relative path for the input directory containing the geopoint files
+# DirOUT (string): relative path for the output directory containing the archives. It should be the same as DirIN so the archives are found by the stages that read the observations.
+
+# INPUT PARAMETERS
+YearS = 2000
+YearF = 2020
+Acc = 24
+Dataset_list = ["synop", "hdobs", "bom", "india", "efas", "vnm", "ukceda"]
+Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
+DirIN = "Data/Raw/OBS"
+DirOUT = "Data/Raw/OBS"
+#######################################################################################################################
+
+
+# Considering a single year (when given as argument)
+if len(sys.argv) > 1:
+      YearS = int(sys.argv[1])
+      YearF = YearS
+
+# Packing the geopoint files for each dataset and year
+for Dataset in Dataset_list:
+      print(" ")
+      print("Packing the observations for " + Dataset + " in year...")
+      for Year in range(YearS, YearF+1):
+            NumSlots = ingest_year(Git_repo + "/" + DirIN, Dataset, Year, Acc, Git_repo + "/" + DirOUT)
+            print(" - " + str(Year) + ": " + str(NumSlots) + " valid dates/times")
\ No newline at end of file
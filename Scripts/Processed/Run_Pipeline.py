@@ -0,0 +1,69 @@
+import os
+import sys
+from Functions.pipeline import run_pipeline
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# Run_Pipeline.py runs the chain of processing scripts (01 to 12) as a graph of tasks. A task is run only when the
+# content of its script (or of the shared functions), its arguments, its inputs or the outputs of the stages it depends
+# on changed since its last successful run. The independent tasks (e.g. the tasks for different years in stages 03, 05
+# and 10) are run in parallel on the local cores.
+# Note: the input parameters of each stage are still set in each script, so changing them changes the content of the
+# script and re-runs the stage (and the stages that depend on its outputs, if they changed).
+
+# DESCRIPTION OF INPUT PARAMETERS
+# YearS (number, in YYYY format): start year to consider for the stages that are run for each year.
+# YearF (number, in YYYY format): final year to consider for the stages that are run for each year.
+# NumWorkers (integer number): maximum number of tasks to run in parallel (None to consider all the local cores).
+# Force (boolean): if True, all the tasks are run even if their inputs did not change.
+# Stages_list (list of strings): stages to run. If None, all the stages in the pipeline are run.
+# Git_repo (string): path of local github repository
+# DirLog (string): relative path for the directory containing the logs of each task
+# FileState (string): relative path for the file containing the state of the pipeline
+
+# INPUT PARAMETERS
+YearS = 2000
+YearF = 2019
+NumWorkers = None
+Force = False
+Stages_list = None
+Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
+DirLog = "Data/Processed/LogPipeline"
+FileState = "Data/Processed/Pipeline_State.json"
+#######################################################################################################################
+
+
+# Defining the stages of the pipeline
+Years = [[Year] for Year in range(YearS, YearF+1)]
+Pipeline = [
+      {"Stage": "01", "Script": "01_Compute_UniqueOBS_FromReference_ExtraDatasets_ExtraTimes.py", "Inputs": ["Data/Raw/OBS"], "Outputs": ["Data/Processed/01_UniqueOBS_*"]},
+      {"Stage": "02", "Script": "02_Compute_Combine_UniqueOBS.py", "Depends": ["01"], "Outputs": ["Data/Processed/02_Combined_UniqueOBS_24h"]},
+      {"Stage": "03", "Script": "03_Compute_UniqueStnids_Year.py", "Args": Years, "Depends": ["02"], "Outputs": ["Data/Processed/03_UniqueStnids_Year_24h/*_unique_{0}.npy"]},
+      {"Stage": "04", "Script": "04_Compute_CombineYears_UniqueStnids.py", "Depends": ["03"], "Outputs": ["Data/Processed/04_UniqueStnids_24h_*"]},
+      {"Stage": "05", "Script": "05_Compute_AlignOBS_Year.py", "Args": Years, "Depends": ["02", "04"], "Outputs": ["Data/Processed/05_AlignedOBS_Year_24h/{0}.npy", "Data/Processed/05_AlignedOBS_Year_24h/hist_*_{0}.npz"]},
+      {"Stage": "06", "Script": "06_Compute_CombineYears_AlignedOBS.py", "Depends": ["04", "05"], "Outputs": ["Data/Processed/06_AlignedOBS_rawSTVL_24h_*"]},
+      {"Stage": "07", "Script": "07_Compute_ExtractCPC_AlignedOBS.py", "Depends": ["06"], "Inputs": ["Data/Raw/OBS/CPC_24h"], "Outputs": ["Data/Processed/07_AlignedOBS_gridCPC_24h_*"]},
+      {"Stage": "08", "Script": "08_Compute_CleanSTVL.py", "Depends": ["06", "07"], "Outputs": ["Data/Processed/08_AlignedOBS_cleanSTVL_24h_*"]},
+      {"Stage": "09", "Script": "09_Compute_Climate_OBS.py", "Depends": ["04", "05", "06", "07", "08"], "Outputs": ["Data/Processed/09_Climate_OBS"]},
+      {"Stage": "10", "Script": "10_Extract_Rainfall_atOBS.py", "Args": Years, "Depends": ["09"], "Inputs": ["Data/Raw/FC/**/{0}"], "Outputs": ["Data/Processed/10_Rainfall/**/tp_*_{0}.npy", "Data/Processed/10_Rainfall/**/hist_*_{0}.npz"]},
+      {"Stage": "11", "Script": "11_Compute_Climate_FC_atOBS.py", "Depends": ["09", "10"], "Outputs": ["Data/Processed/11_Climate_FC"]},
+      {"Stage": "12", "Script": "12_Compute_Anderson_Darling_Statistic.py", "Depends": ["09", "11"], "Outputs": ["Data/Processed/12_StatisticAD"]}
+      ]
+
+# Selecting the stages to run
+# Note: the stages that are not selected are not run, and the stages that depend on them use their outputs as they are.
+if Stages_list is not None:
+      Pipeline = [Stage if Stage["Stage"] in Stages_list else dict(Stage, Script=None) for Stage in Pipeline]
+
+# Running the pipeline
+print(" ")
+print("Running the pipeline. Tasks:")
+DirScripts = os.path.dirname(os.path.abspath(__file__))
+Status = run_pipeline(Pipeline, Git_repo, DirScripts, Git_repo + "/" + DirLog, Git_repo + "/" + FileState, NumWorkers, Force)
+
+# Reporting the tasks that failed
+Failed = [TaskID for TaskID in Status if Status[TaskID] in ["Failed", "Blocked"]]
+if len(Failed) != 0:
+      print(" ")
+      print("WARNING! Some tasks did not complete (see the logs in " + Git_repo + "/" + DirLog + "): " + ", ".join(Failed))
+      sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import sys
+import os
+from os.path import exists
+from Functions.year_driver import run_years
+
+#######################################################################################################################
+# CODE DESCRIPTION
+# Run_Years.py runs a processing script that can be split by year (01, 02, 03, 05 and 10 in Scripts/Processed, and
+# 12_Compute_Chunk_FC.py in External_Resources) over a range of years, using a pool of processes on the local cores.
+# Each year runs in its own process with a limit on the memory it can allocate. The years that fail are re-submitted,
+# and a completion marker is written for each completed year, so an interrupted batch can be resumed by running the
+# same command again.
+# Usage: python3 Run_Years.py <script> <YearS> <YearF> (e.g. python3 Run_Years.py 05_Compute_AlignOBS_Year.py 2000 2019)
+# The scripts in External_Resources can be given by their name only (e.g. python3 Run_Years.py 12_Compute_Chunk_FC.py 2000 2019).
+
+# DESCRIPTION OF INPUT PARAMETERS
+# Script (string): name of the script to run. It must take the year to process as its first argument.
+# DirExternal (string): path of the directory containing the external scripts (External_Resources), where the script is looked for when it is not found as given.
+# YearS (number, in YYYY format): start year to consider.
+# YearF (number, in YYYY format): final year to consider.
+# NumWorkers (integer number): number of years to run in parallel (None to consider all the local cores).
+# MaxMemory_GB (number, in GB): maximum memory that can be allocated when running each year (None for no limit).
+# NumRetries (integer number): number of times a year that fails is re-submitted.
+# Force (boolean): if True, the years are run even if they were already completed.
+# Git_repo (string): path of local github repository
+# DirMarkers (string): relative path for the directory containing the completion markers and the logs for each year
+
+# INPUT PARAMETERS
+Script = sys.argv[1]
+YearS = int(sys.argv[2])
+YearF = int(sys.argv[3])
+NumWorkers = 4
+MaxMemory_GB = 64
+NumRetries = 2
+Force = False
+Git_repo = "/ec/vol/ecpoint/mofp/PhD/Papers2Write/PointRain_Climate"
+DirMarkers = "Data/Processed/LogYears"
+DirExternal = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "External_Resources"))
+#######################################################################################################################
+
+
+# Looking for the script in the external scripts when it is not found as given
+if (not exists(Script)) and exists(DirExternal + "/" + Script):
+      Script = DirExternal + "/" + Script
+
+print(" ")
+print("Running " + Script + " for the years between " + str(YearS) + " and " + str(YearF) + ":")
+Years_failed = run_years(Script, list(range(YearS, YearF+1)), Git_repo + "/" + DirMarkers, NumWorkers, MaxMemory_GB, NumRetries, Force)
+
+if len(Years_failed) != 0:
+      print(" ")
+      print("WARNING! The following years could not be completed: " + ", ".join([str(Year) for Year in Years_failed]))
+      sys.exit(1)
\ No newline at end of file